@@ -218,12 +218,15 @@ SQLBuffer	sql;
 
 /**
  * Insert data into a table
+ *
+ * The payload is either a JSON object, the row to insert, or
+ * an array of JSON objects, rows having the same columns that
+ * are inserted by a single statement.
  */
 int Connection::insert(const std::string& table, const std::string& data)
 {
 SQLBuffer	sql;
 Document	document;
-SQLBuffer	values;
 int		col = 0;
  
 	if (document.Parse(data.c_str()).HasParseError())
@@ -231,69 +234,165 @@ int		col = 0;
 		raiseError("insert", "Failed to parse JSON payload\n");
 		return -1;
 	}
+	if (document.IsArray() && document.Size() == 0)
+	{
+		raiseError("insert", "The array of rows to insert is empty");
+		return -1;
+	}
+	const Value& columns = document.IsArray() ? document[0] : document;
+	if (!columns.IsObject())
+	{
+		raiseError("insert", "The rows to insert must be JSON objects");
+		return -1;
+	}
  	sql.append("INSERT INTO foglamp.");
 	sql.append(table);
 	sql.append(" (");
-	for (Value::ConstMemberIterator itr = document.MemberBegin();
-		itr != document.MemberEnd(); ++itr)
+	for (Value::ConstMemberIterator itr = columns.MemberBegin();
+		itr != columns.MemberEnd(); ++itr)
 	{
 		if (col)
 			sql.append(", ");
 		sql.append(itr->name.GetString());
- 
-		if (col)
-			values.append(", ");
-		if (itr->value.IsString())
-		{
-			const char *str = itr->value.GetString();
-			// Check if the string is a function
-			string s (str);
-  			regex e ("[a-zA-Z][a-zA-Z0-9_]*\\(.*\\)");
-  			if (regex_match (s,e))
-			{
-				values.append(str);
-			}
-			else
-			{
-				values.append('\'');
-				values.append(escape(str));
-				values.append('\'');
-			}
-		}
-		else if (itr->value.IsDouble())
-			values.append(itr->value.GetDouble());
-		else if (itr->value.IsNumber())
-			values.append(itr->value.GetInt());
-		else if (itr->value.IsObject())
+		col++;
+	}
+	sql.append(") values ");
+	if (document.IsArray())
+	{
+		for (Value::ConstValueIterator itr = document.Begin(); itr != document.End(); ++itr)
 		{
-			StringBuffer buffer;
-			Writer<StringBuffer> writer(buffer);
-			itr->value.Accept(writer);
-			values.append('\'');
-			values.append(escape(buffer.GetString()));
-			values.append('\'');
+			if (itr != document.Begin())
+				sql.append(", ");
+			if (!insertValues(*itr, columns, sql))
+				return -1;
 		}
-		col++;
 	}
-	sql.append(") values (");
-	const char *vals = values.coalesce();
-	sql.append(vals);
-	delete[] vals;
-	sql.append(");");
+	else if (!insertValues(document, columns, sql))
+	{
+		return -1;
+	}
+	sql.append(';');
 
 	const char *query = sql.coalesce();
 	PGresult *res = PQexec(dbConnection, query);
 	delete[] query;
 	if (PQresultStatus(res) == PGRES_COMMAND_OK)
 	{
+		int rows = atoi(PQcmdTuples(res));
 		PQclear(res);
-		return atoi(PQcmdTuples(res));
+		return rows;
 	}
  	raiseError("insert", PQerrorMessage(dbConnection));
 	PQclear(res);
 	return -1;
 }
 
+/**
+ * Append the values of a row to insert, in the order of the
+ * columns of the statement
+ *
+ * @param row		The row to insert
+ * @param columns	The row defining the columns of the statement
+ * @param sql		The SQL statement being built
+ * @return bool		False if the row does not have the columns of the statement
+ */
+bool Connection::insertValues(const Value& row, const Value& columns, SQLBuffer& sql)
+{
+int		col = 0;
+
+	if (!row.IsObject() || row.MemberCount() != columns.MemberCount())
+	{
+		raiseError("insert", "All the rows to insert must have the same columns");
+		return false;
+	}
+	sql.append('(');
+	for (Value::ConstMemberIterator column = columns.MemberBegin();
+		column != columns.MemberEnd(); ++column)
+	{
+		Value::ConstMemberIterator itr = row.FindMember(column->name);
+		if (itr == row.MemberEnd())
+		{
+			raiseError("insert", "All the rows to insert must have the same columns");
+			return false;
+		}
+		if (col)
+			sql.append(", ");
+		appendValue(itr->value, sql);
+		col++;
+	}
+	sql.append(')');
+	return true;
+}
+
+/**
+ * Append a JSON number to a statement, integers are written with
+ * their full width rather than truncated to 32 bits
+ *
+ * @param value		The JSON number
+ * @param sql		The SQL statement being built
+ */
+void Connection::appendNumber(const Value& value, SQLBuffer& sql)
+{
+	if (value.IsInt())
+		sql.append(value.GetInt());
+	else if (value.IsUint())
+		sql.append(value.GetUint());
+	else if (value.IsInt64())
+		sql.append((long)value.GetInt64());
+	else if (value.IsUint64())
+		sql.append((unsigned long)value.GetUint64());
+	else
+		sql.append(value.GetDouble());
+}
+
+/**
+ * Append the value of a column to an insert or update statement,
+ * according to the type of the JSON value
+ *
+ * Integers are written with their full width, so that bigint
+ * columns are not truncated to 32 bits. Strings that look like
+ * a function call are written unquoted, objects and arrays are
+ * written as JSON text.
+ *
+ * @param value		The JSON value of the column
+ * @param sql		The SQL statement being built
+ */
+void Connection::appendValue(const Value& value, SQLBuffer& sql)
+{
+	if (value.IsString())
+	{
+		const char *str = value.GetString();
+		// Check if the string is a function
+		string s (str);
+		regex e ("[a-zA-Z][a-zA-Z0-9_]*\\(.*\\)");
+		if (regex_match (s,e))
+		{
+			sql.append(str);
+		}
+		else
+		{
+			sql.append('\'');
+			sql.append(escape(str));
+			sql.append('\'');
+		}
+	}
+	else if (value.IsNumber())
+		appendNumber(value, sql);
+	else if (value.IsBool())
+		sql.append(value.GetBool() ? "true" : "false");
+	else if (value.IsNull())
+		sql.append("NULL");
+	else
+	{
+		StringBuffer buffer;
+		Writer<StringBuffer> writer(buffer);
+		value.Accept(writer);
+		sql.append('\'');
+		sql.append(escape(buffer.GetString()));
+		sql.append('\'');
+	}
+}
+
 /**
  * Perform an update against a common table
  *
@@ -327,37 +426,7 @@ int		col = 0;
 				}
 				sql.append(itr->name.GetString());
 				sql.append(" = ");
-	 
-				if (itr->value.IsString())
-				{
-					const char *str = itr->value.GetString();
-					// Check if the string is a function
-					string s (str);
-					regex e ("[a-zA-Z][a-zA-Z0-9_]*\\(.*\\)");
-					if (regex_match (s,e))
-					{
-						sql.append(str);
-					}
-					else
-					{
-						sql.append('\'');
-						sql.append(escape(str));
-						sql.append('\'');
-					}
-				}
-				else if (itr->value.IsDouble())
-					sql.append(itr->value.GetDouble());
-				else if (itr->value.IsNumber())
-					sql.append(itr->value.GetInt());
-				else if (itr->value.IsObject())
-				{
-					StringBuffer buffer;
-					Writer<StringBuffer> writer(buffer);
-					itr->value.Accept(writer);
-					sql.append('\'');
-					sql.append(escape(buffer.GetString()));
-					sql.append('\'');
-				}
+				appendValue(itr->value, sql);
 				col++;
 			}
 		}
@@ -420,10 +489,8 @@ int		col = 0;
 						sql.append('\'');
 					}
 				}
-				else if (value.IsDouble())
-					sql.append(value.GetDouble());
 				else if (value.IsNumber())
-					sql.append(value.GetInt());
+					appendNumber(value, sql);
 				else if (value.IsObject())
 				{
 					StringBuffer buffer;
@@ -519,10 +586,8 @@ int		col = 0;
 						sql.append("\"'");
 					}
 				}
-				else if (value.IsDouble())
-					sql.append(value.GetDouble());
 				else if (value.IsNumber())
-					sql.append(value.GetInt());
+					appendNumber(value, sql);
 				else if (value.IsObject())
 				{
 					StringBuffer buffer;
@@ -632,6 +697,10 @@ SQLBuffer	sql;
 
 /**
  * Append a set of readings to the readings table
+ *
+ * The asset_summary table is updated in the same statement with the number of
+ * readings appended for each asset and the most recent of them, so that the
+ * readings count of the assets does not need a scan of the readings table.
  */
 int Connection::appendReadings(const char *readings)
 {
@@ -646,7 +715,7 @@ int		row = 0;
 		return -1;
 	}
 
-	sql.append("INSERT INTO foglamp.readings ( asset_code, read_key, reading, user_ts ) VALUES ");
+	sql.append("WITH appended AS (INSERT INTO foglamp.readings ( asset_code, read_key, reading, user_ts ) VALUES ");
 
     if (!doc.HasMember("readings"))
     {
@@ -708,15 +777,27 @@ int		row = 0;
 
 		sql.append(')');
 	}
-	sql.append(';');
+	sql.append(" RETURNING id, asset_code, reading, user_ts), ");
+	// One row per asset: the number of readings appended, the oldest timestamp and the most recent reading
+	sql.append("summary AS (INSERT INTO foglamp.asset_summary ( asset_code, readings, first_ts, last_ts, last_id, last_reading ) ");
+	sql.append("SELECT DISTINCT ON (asset_code) asset_code, count(*) OVER asset, min(user_ts) OVER asset, user_ts, id, reading ");
+	sql.append("FROM appended WINDOW asset AS (PARTITION BY asset_code) ORDER BY asset_code, user_ts DESC, id DESC ");
+	sql.append("ON CONFLICT (asset_code) DO UPDATE SET ");
+	sql.append("readings = asset_summary.readings + EXCLUDED.readings, ");
+	sql.append("first_ts = LEAST(asset_summary.first_ts, EXCLUDED.first_ts), ");
+	sql.append("last_ts = GREATEST(asset_summary.last_ts, EXCLUDED.last_ts), ");
+	sql.append("last_id = CASE WHEN EXCLUDED.last_ts >= asset_summary.last_ts THEN EXCLUDED.last_id ELSE asset_summary.last_id END, ");
+	sql.append("last_reading = CASE WHEN EXCLUDED.last_ts >= asset_summary.last_ts THEN EXCLUDED.last_reading ELSE asset_summary.last_reading END) ");
+	sql.append("SELECT count(*) FROM appended;");
 
 	const char *query = sql.coalesce();
 	PGresult *res = PQexec(dbConnection, query);
 	delete[] query;
-	if (PQresultStatus(res) == PGRES_COMMAND_OK)
+	if (PQresultStatus(res) == PGRES_TUPLES_OK)
 	{
+		int appended = atoi(PQgetvalue(res, 0, 0));
 		PQclear(res);
-		return atoi(PQcmdTuples(res));
+		return appended;
 	}
  	raiseError("appendReadings", PQerrorMessage(dbConnection));
 	PQclear(res);
@@ -724,14 +805,21 @@ int		row = 0;
 }
 
 /**
- * Fetch a block of readings from the reading table
+ * Fetch a block of readings from the reading table, in id order, starting from the given id.
+ * Only the columns needed to send the readings are returned, the user_ts can be returned
+ * already formatted as ISO-8601 UTC so that the callers do not need to convert it.
  */
-bool Connection::fetchReadings(unsigned long id, unsigned int blksize, std::string& resultSet)
+bool Connection::fetchReadings(unsigned long id, unsigned int blksize, bool isoTimestamps, std::string& resultSet)
 {
-char	sqlbuffer[100];
+char	sqlbuffer[300];
 
 	snprintf(sqlbuffer, sizeof(sqlbuffer),
-		"SELECT * FROM foglamp.readings WHERE id >= %ld LIMIT %d;", id, blksize);
+		"SELECT id, asset_code, read_key, reading, %s FROM foglamp.readings "
+		"WHERE id >= %lu ORDER BY id LIMIT %u;",
+		isoTimestamps ?
+			"to_char(user_ts AT TIME ZONE 'UTC', 'YYYY-MM-DD\"T\"HH24:MI:SS.US\"Z\"') AS user_ts" :
+			"user_ts",
+		id, blksize);
 	
 	PGresult *res = PQexec(dbConnection, sqlbuffer);
 	if (PQresultStatus(res) == PGRES_TUPLES_OK)
@@ -747,6 +835,10 @@ char	sqlbuffer[100];
 
 /**
  * Purge readings from the reading table
+ *
+ * The readings removed are subtracted from the counts of the asset_summary table,
+ * the assets without readings are removed from it and the oldest timestamp of the
+ * others is refreshed, the number of readings left is then the sum of the counts.
  */
 unsigned int  Connection::purgeReadings(unsigned long age, unsigned int flags, unsigned long sent, std::string& result)
 {
@@ -762,7 +854,7 @@ long numReadings = 0;
 		 * So set age based on the data we have and continue.
 		 */
 		SQLBuffer oldest;
-		oldest.append("SELECT round(extract(epoch FROM (now() - min(user_ts)))/360) from readings;");
+		oldest.append("SELECT round(extract(epoch FROM (now() - min(first_ts)))/360) from foglamp.asset_summary;");
 		const char *query = oldest.coalesce();
 		PGresult *res = PQexec(dbConnection, query);
 		delete[] query;
@@ -778,31 +870,8 @@ long numReadings = 0;
 			return 0;
 		}
 	}
-	if ((flags & 0x01) == 0)
-	{
-		// Get number of unsent rows we are about to remove
-		SQLBuffer unsentBuffer;
-		unsentBuffer.append("SELECT count(*) FROM foglamp.readings WHERE  user_ts < now() - INTERVAL '");
-		unsentBuffer.append(age);
-		unsentBuffer.append(" hours' AND id > ");
-		unsentBuffer.append(sent);
-		unsentBuffer.append(';');
-		const char *query = unsentBuffer.coalesce();
-		PGresult *res = PQexec(dbConnection, query);
-		delete[] query;
-		if (PQresultStatus(res) == PGRES_TUPLES_OK)
-		{
-			unsentPurged = atol(PQgetvalue(res, 0, 0));
-			PQclear(res);
-		}
-		else
-		{
- 			raiseError("retrieve", PQerrorMessage(dbConnection));
-			PQclear(res);
-		}
-	}
-	
-	sql.append("DELETE FROM foglamp.readings WHERE user_ts < now() - INTERVAL '");
+
+	sql.append("WITH purged AS (DELETE FROM foglamp.readings WHERE user_ts < now() - INTERVAL '");
 	sql.append(age);
 	sql.append(" hours'");
 	if ((flags & 0x01) == 0x01)	// Don't delete unsent rows
@@ -810,17 +879,41 @@ long numReadings = 0;
 		sql.append(" AND id < ");
 		sql.append(sent);
 	}
-	sql.append(';');
+	sql.append(" RETURNING id, asset_code), ");
+	sql.append("summary AS (UPDATE foglamp.asset_summary SET readings = asset_summary.readings - removed.readings ");
+	sql.append("FROM (SELECT asset_code, count(*) AS readings FROM purged GROUP BY asset_code) removed ");
+	sql.append("WHERE asset_summary.asset_code = removed.asset_code) ");
+	// The unsent rows removed, there are none if they are retained
+	sql.append("SELECT count(*), count(*) FILTER (WHERE id > ");
+	sql.append(sent);
+	sql.append(") FROM purged;");
 	const char *query = sql.coalesce();
 	PGresult *res = PQexec(dbConnection, query);
 	delete[] query;
-	if (PQresultStatus(res) != PGRES_COMMAND_OK)
+	if (PQresultStatus(res) != PGRES_TUPLES_OK)
 	{
 		PQclear(res);
  		raiseError("retrieve", PQerrorMessage(dbConnection));
 		return 0;
 	}
-	unsigned int deletedRows = (unsigned int)atoi(PQcmdTuples(res));
+	unsigned int deletedRows = (unsigned int)atoi(PQgetvalue(res, 0, 0));
+	unsentPurged = atol(PQgetvalue(res, 0, 1));
+	PQclear(res);
+
+	// The statements of the purge do not see the rows it removed, the oldest timestamps are refreshed after it
+	SQLBuffer summaryBuffer;
+	summaryBuffer.append("DELETE FROM foglamp.asset_summary WHERE readings <= 0; ");
+	summaryBuffer.append("UPDATE foglamp.asset_summary SET first_ts = (SELECT min(user_ts) FROM foglamp.readings ");
+	summaryBuffer.append("WHERE readings.asset_code = asset_summary.asset_code) WHERE first_ts < now() - INTERVAL '");
+	summaryBuffer.append(age);
+	summaryBuffer.append(" hours';");
+	const char *query2 = summaryBuffer.coalesce();
+	res = PQexec(dbConnection, query2);
+	delete[] query2;
+	if (PQresultStatus(res) != PGRES_COMMAND_OK)
+	{
+ 		raiseError("purge", PQerrorMessage(dbConnection));
+	}
 	PQclear(res);
 
 	SQLBuffer retainedBuffer;
@@ -840,7 +933,7 @@ long numReadings = 0;
 	}
 	PQclear(res);
 
-	res = PQexec(dbConnection, "SELECT count(*) FROM foglamp.readings;");
+	res = PQexec(dbConnection, "SELECT coalesce(sum(readings), 0) FROM foglamp.asset_summary;");
 	if (PQresultStatus(res) == PGRES_TUPLES_OK)
 	{
 		numReadings = atol(PQgetvalue(res, 0, 0));
@@ -1397,9 +1490,9 @@ bool Connection::jsonWhereClause(const Value& whereClause, SQLBuffer& sql)
 	{
 		sql.append(cond);
 		sql.append(' ');
-		if (whereClause["value"].IsInt())
+		if (whereClause["value"].IsNumber())
 		{
-			sql.append(whereClause["value"].GetInt());
+			appendNumber(whereClause["value"], sql);
 		} else if (whereClause["value"].IsString())
 		{
 			sql.append('\'');
@@ -25,7 +25,7 @@ class Connection {
 		int		update(const std::string& table, const std::string& data);
 		int		deleteRows(const std::string& table, const std::string& condition);
 		int		appendReadings(const char *readings);
-		bool		fetchReadings(unsigned long id, unsigned int blksize, std::string& resultSet);
+		bool		fetchReadings(unsigned long id, unsigned int blksize, bool isoTimestamps, std::string& resultSet);
 		unsigned int	purgeReadings(unsigned long age, unsigned int flags, unsigned long sent, std::string& results);
 		long		tableSize(const std::string& table);
 	private:
@@ -36,6 +36,9 @@ class Connection {
 		bool		jsonModifiers(const rapidjson::Value&, SQLBuffer&);
 		bool		jsonAggregates(const rapidjson::Value&, const rapidjson::Value&, SQLBuffer&);
 		bool		returnJson(const rapidjson::Value&, SQLBuffer&);
+		bool		insertValues(const rapidjson::Value& row, const rapidjson::Value& columns, SQLBuffer&);
+		void		appendValue(const rapidjson::Value& value, SQLBuffer&);
+		void		appendNumber(const rapidjson::Value& value, SQLBuffer&);
 		char		*trim(char *str);
 		const char	*escape(const char *);
 		const std::string	escape(const std::string&);
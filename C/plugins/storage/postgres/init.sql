@@ -154,6 +154,13 @@ CREATE SEQUENCE foglamp.roles_id_seq
     MAXVALUE 9223372036854775807
     CACHE 1;
 
+CREATE SEQUENCE foglamp.schedules_version_seq
+    INCREMENT 1
+    START 1
+    MINVALUE 1
+    MAXVALUE 9223372036854775807
+    CACHE 1;
+
 CREATE SEQUENCE foglamp.streams_id_seq
     INCREMENT 1
     START 1
@@ -404,6 +411,67 @@ CREATE INDEX fki_readings_fk1
 CREATE INDEX readings_ix1
     ON foglamp.readings USING btree (read_key);
 
+-- Pages of the readings of an asset, most recent first, see the asset browser
+CREATE INDEX readings_ix2
+    ON foglamp.readings USING btree (asset_code, user_ts, id);
+
+
+-- Asset summary table
+-- One row per asset with readings in the readings table, maintained by the storage
+-- when the readings are appended and purged, so that the count and the latest reading
+-- of the assets are read without a scan of the readings table.
+CREATE TABLE foglamp.asset_summary (
+    asset_code   character varying(50)       NOT NULL,                      -- The asset code of the readings
+    readings     bigint                      NOT NULL DEFAULT 0,            -- The number of readings of the asset
+    first_ts     timestamp(6) with time zone NOT NULL,                      -- The user timestamp of the oldest reading
+    last_ts      timestamp(6) with time zone NOT NULL,                      -- The user timestamp of the most recent reading
+    last_id      bigint                      NOT NULL,                      -- The id of the most recent reading
+    last_reading jsonb                       NOT NULL DEFAULT '{}'::jsonb,  -- The most recent reading
+    CONSTRAINT asset_summary_pkey PRIMARY KEY (asset_code) );
+
+COMMENT ON TABLE foglamp.asset_summary IS
+'Number of readings and latest reading of the assets in the readings table.';
+
+
+-- Rollup tables
+-- The min, max, sum and number of the numeric values of every datapoint of the assets, per minute
+-- and per hour, computed from the readings by the rollup task. They are kept for their own
+-- retention, independent of the purge of the readings.
+CREATE TABLE foglamp.readings_minute (
+    asset_code character varying(50)       NOT NULL,  -- The asset code of the readings
+    datapoint  character varying(255)      NOT NULL,  -- The name of the value in the readings
+    bucket_ts  timestamp(6) with time zone NOT NULL,  -- The start of the minute
+    min        double precision            NOT NULL,
+    max        double precision            NOT NULL,
+    total      double precision            NOT NULL,  -- The sum of the values, the average is total / readings
+    readings   bigint                      NOT NULL,  -- The number of values
+    last_object bigint                     NOT NULL DEFAULT 0,  -- The id of the last reading merged, see the rollup task
+    CONSTRAINT readings_minute_pkey PRIMARY KEY (asset_code, datapoint, bucket_ts) );
+
+CREATE INDEX readings_minute_ix1
+    ON foglamp.readings_minute USING btree (bucket_ts);
+
+CREATE TABLE foglamp.readings_hour (
+    asset_code character varying(50)       NOT NULL,  -- The asset code of the readings
+    datapoint  character varying(255)      NOT NULL,  -- The name of the value in the readings
+    bucket_ts  timestamp(6) with time zone NOT NULL,  -- The start of the hour
+    min        double precision            NOT NULL,
+    max        double precision            NOT NULL,
+    total      double precision            NOT NULL,  -- The sum of the values, the average is total / readings
+    readings   bigint                      NOT NULL,  -- The number of values
+    last_object bigint                     NOT NULL DEFAULT 0,  -- The id of the last reading merged, see the rollup task
+    CONSTRAINT readings_hour_pkey PRIMARY KEY (asset_code, datapoint, bucket_ts) );
+
+CREATE INDEX readings_hour_ix1
+    ON foglamp.readings_hour USING btree (bucket_ts);
+
+-- Position of the rollup task in the readings table
+CREATE TABLE foglamp.rollups (
+    name        character varying(50)       NOT NULL,            -- The name of the rollup
+    last_object bigint                      NOT NULL DEFAULT 0,  -- The id of the last reading rolled up
+    ts          timestamp(6) with time zone NOT NULL DEFAULT now(),  -- The last time the rollup task run
+    CONSTRAINT rollups_pkey PRIMARY KEY (name) );
+
 
 -- Destinations table
 CREATE TABLE foglamp.destinations (
@@ -495,6 +563,10 @@ CREATE TABLE foglamp.statistics_history (
        ts          timestamp(6) with time zone NOT NULL DEFAULT now(),                                        -- Timestamp, updated at every change
        CONSTRAINT statistics_history_pkey PRIMARY KEY (key, history_ts) );
 
+-- Ranges of the statistics history of all the keys, see the statistics API
+CREATE INDEX statistics_history_ix1
+    ON foglamp.statistics_history USING btree (history_ts);
+
 
 
 -- Resources table
@@ -697,12 +769,29 @@ CREATE TABLE foglamp.schedules (
   schedule_day      smallint,                       -- ISO day 1 = Monday, 7 = Sunday
   exclusive         boolean not null default true,  -- true = Only one task can run
                                                     -- at any given time
+  version           bigint                NOT NULL DEFAULT nextval('foglamp.schedules_version_seq'::regclass),
+                                                    -- Version stamp, changed at every insert and update
   CONSTRAINT schedules_pkey PRIMARY KEY (id),
   CONSTRAINT schedules_fk1 FOREIGN KEY (process_name)
   REFERENCES foglamp.scheduled_processes (name) MATCH SIMPLE
              ON UPDATE NO ACTION
              ON DELETE NO ACTION );
 
+CREATE INDEX schedules_ix1
+    ON foglamp.schedules USING btree (version);
+
+-- The scheduler reads the schedules changed since the highest version it knows
+CREATE FUNCTION foglamp.schedules_set_version() RETURNS trigger AS $$
+BEGIN
+    NEW.version := nextval('foglamp.schedules_version_seq'::regclass);
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER schedules_version
+    BEFORE UPDATE ON foglamp.schedules
+    FOR EACH ROW EXECUTE PROCEDURE foglamp.schedules_set_version();
+
 
 
 -- List of tasks
@@ -715,6 +804,11 @@ CREATE TABLE foglamp.tasks (
   reason       character varying(255),                             -- The reason why the task ended
   pid          int                         NOT NULL,               -- Linux process id
   exit_code    int,                                                -- Process exit status code (negative means exited via signal)
+  cpu_time         double precision,                               -- User and system CPU time in seconds
+  max_rss          bigint,                                         -- Peak resident set size in kB
+  read_bytes       bigint,                                         -- Bytes read from the storage devices
+  write_bytes      bigint,                                         -- Bytes written to the storage devices
+  context_switches bigint,                                         -- Voluntary and involuntary context switches
   CONSTRAINT tasks_pkey PRIMARY KEY (id),
   CONSTRAINT tasks_fk1 FOREIGN KEY (process_name)
   REFERENCES foglamp.scheduled_processes (name) MATCH SIMPLE
@@ -887,6 +981,7 @@ insert into foglamp.scheduled_processes ( name, script ) values ( 'CC2650ASYN',
 insert into foglamp.scheduled_processes ( name, script ) values ( 'HTTP_SOUTH', '["services/south"]');
 insert into foglamp.scheduled_processes ( name, script ) values ( 'purge', '["tasks/purge"]' );
 insert into foglamp.scheduled_processes ( name, script ) values ( 'stats collector', '["tasks/statistics"]' );
+insert into foglamp.scheduled_processes ( name, script ) values ( 'rollup', '["tasks/rollup"]' );
 insert into foglamp.scheduled_processes ( name, script ) values ( 'sending process', '["tasks/north", "--stream_id", "1", "--debug_level", "1"]' );
 
 -- FogLAMP statistics into PI
@@ -962,6 +1057,12 @@ schedule_time, schedule_interval, exclusive)
 values ('2176eb68-7303-11e7-8cf7-a6006ad3dba0', 'stats collector', 'stats collector', 3,
 NULL, '00:00:15', true);
 
+-- Run the rollup of the readings every minute
+INSERT INTO foglamp.schedules(id, schedule_name, process_name, schedule_type,
+schedule_time, schedule_interval, exclusive)
+values ('5d7e8e8a-c3cd-11e7-abc4-cec278b6b50a', 'rollup', 'rollup', 3,
+NULL, '00:01:00', true);
+
 -- Run the sending process every 15 seconds
 INSERT INTO foglamp.schedules(id, schedule_name, process_name, schedule_type,
 schedule_time, schedule_interval, exclusive)
@@ -987,6 +1088,9 @@ INSERT INTO foglamp.streams(id,destination_id,description, last_object,ts) VALUE
 -- FogLAMP statistics into PI configuration
 INSERT INTO foglamp.streams (id,destination_id,description, last_object,ts ) VALUES (2,1,'FogLAMP statistics into PI', 0,now());
 
+-- Rollup of the readings per minute and per hour
+INSERT INTO foglamp.rollups ( name, last_object ) VALUES ( 'readings', 0 );
+
 -- HTTP translator configuration
 INSERT INTO foglamp.destinations(id,description, ts) VALUES (2,'HTTP_TR', now());
 INSERT INTO foglamp.streams(id,destination_id,description, last_object,ts) VALUES (3,2,'HTTP translator', 0,now());
@@ -134,14 +134,16 @@ Connection        *connection = manager->allocate();
 
 /**
  * Fetch a block of readings from the readings buffer
+ *
+ * Flags: 0x0001 return the user_ts as ISO-8601 UTC
  */
-char *plugin_reading_fetch(PLUGIN_HANDLE handle, unsigned long id, unsigned int blksize)
+char *plugin_reading_fetch(PLUGIN_HANDLE handle, unsigned long id, unsigned int blksize, unsigned int flags)
 {
 ConnectionManager *manager = (ConnectionManager *)handle;
 Connection        *connection = manager->allocate();
 std::string	  resultSet;
 
-	connection->fetchReadings(id, blksize, resultSet);
+	connection->fetchReadings(id, blksize, (flags & 0x0001) != 0, resultSet);
 	manager->release(connection);
 	return strdup(resultSet.c_str());
 }
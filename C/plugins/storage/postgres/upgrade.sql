@@ -0,0 +1,225 @@
+----------------------------------------------------------------------
+-- Copyright (c) 2017 OSIsoft, LLC
+--
+-- Licensed under the Apache License, Version 2.0 (the "License");
+-- you may not use this file except in compliance with the License.
+-- You may obtain a copy of the License at
+--
+--     http://www.apache.org/licenses/LICENSE-2.0
+--
+-- Unless required by applicable law or agreed to in writing, software
+-- distributed under the License is distributed on an "AS IS" BASIS,
+-- WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+-- See the License for the specific language governing permissions and
+-- limitations under the License.
+----------------------------------------------------------------------
+
+--
+-- upgrade.sql
+--
+-- PostgreSQL script to bring the FogLAMP persistent Layer of an existing
+-- installation to the structure created by init.sql, without losing its data.
+-- It is executed every time the storage starts, so every statement must
+-- leave the objects that already exist unchanged.
+--
+
+-- NOTE:
+-- This script must be launched with:
+-- psql -U postgres -d foglamp -v ON_ERROR_STOP=1 -f upgrade.sql
+--
+-- It must run on PostgreSQL 9.5, which has no ADD COLUMN IF NOT EXISTS:
+-- the columns are added by DO blocks that check information_schema.columns.
+
+
+-- Disable the NOTICE notes
+SET client_min_messages TO WARNING;
+
+
+-- Resources used by the tasks
+-- User and system CPU time in seconds
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM information_schema.columns
+                   WHERE table_schema = 'foglamp' AND table_name = 'tasks' AND column_name = 'cpu_time') THEN
+        ALTER TABLE foglamp.tasks ADD COLUMN cpu_time double precision;
+    END IF;
+END
+$$;
+
+-- Peak resident set size in kB
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM information_schema.columns
+                   WHERE table_schema = 'foglamp' AND table_name = 'tasks' AND column_name = 'max_rss') THEN
+        ALTER TABLE foglamp.tasks ADD COLUMN max_rss bigint;
+    END IF;
+END
+$$;
+
+-- Bytes read from the storage devices
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM information_schema.columns
+                   WHERE table_schema = 'foglamp' AND table_name = 'tasks' AND column_name = 'read_bytes') THEN
+        ALTER TABLE foglamp.tasks ADD COLUMN read_bytes bigint;
+    END IF;
+END
+$$;
+
+-- Bytes written to the storage devices
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM information_schema.columns
+                   WHERE table_schema = 'foglamp' AND table_name = 'tasks' AND column_name = 'write_bytes') THEN
+        ALTER TABLE foglamp.tasks ADD COLUMN write_bytes bigint;
+    END IF;
+END
+$$;
+
+-- Voluntary and involuntary context switches
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM information_schema.columns
+                   WHERE table_schema = 'foglamp' AND table_name = 'tasks' AND column_name = 'context_switches') THEN
+        ALTER TABLE foglamp.tasks ADD COLUMN context_switches bigint;
+    END IF;
+END
+$$;
+
+
+-- Version stamp of the schedules, changed at every insert and update
+CREATE SEQUENCE IF NOT EXISTS foglamp.schedules_version_seq
+    INCREMENT 1
+    START 1
+    MINVALUE 1
+    MAXVALUE 9223372036854775807
+    CACHE 1;
+
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM information_schema.columns
+                   WHERE table_schema = 'foglamp' AND table_name = 'schedules' AND column_name = 'version') THEN
+        ALTER TABLE foglamp.schedules
+            ADD COLUMN version bigint NOT NULL DEFAULT nextval('foglamp.schedules_version_seq'::regclass);
+    END IF;
+END
+$$;
+
+CREATE INDEX IF NOT EXISTS schedules_ix1
+    ON foglamp.schedules USING btree (version);
+
+CREATE OR REPLACE FUNCTION foglamp.schedules_set_version() RETURNS trigger AS $$
+BEGIN
+    NEW.version := nextval('foglamp.schedules_version_seq'::regclass);
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS schedules_version ON foglamp.schedules;
+CREATE TRIGGER schedules_version
+    BEFORE UPDATE ON foglamp.schedules
+    FOR EACH ROW EXECUTE PROCEDURE foglamp.schedules_set_version();
+
+
+-- Pages of the readings of an asset, most recent first, see the asset browser
+CREATE INDEX IF NOT EXISTS readings_ix2
+    ON foglamp.readings USING btree (asset_code, user_ts, id);
+
+
+-- Asset summary table, see init.sql
+CREATE TABLE IF NOT EXISTS foglamp.asset_summary (
+    asset_code   character varying(50)       NOT NULL,
+    readings     bigint                      NOT NULL DEFAULT 0,
+    first_ts     timestamp(6) with time zone NOT NULL,
+    last_ts      timestamp(6) with time zone NOT NULL,
+    last_id      bigint                      NOT NULL,
+    last_reading jsonb                       NOT NULL DEFAULT '{}'::jsonb,
+    CONSTRAINT asset_summary_pkey PRIMARY KEY (asset_code) );
+
+COMMENT ON TABLE foglamp.asset_summary IS
+'Number of readings and latest reading of the assets in the readings table.';
+
+-- Filled from the readings when the table has just been created, then maintained by the storage
+INSERT INTO foglamp.asset_summary ( asset_code, readings, first_ts, last_ts, last_id, last_reading )
+    SELECT DISTINCT ON (asset_code)
+           asset_code,
+           count(*) OVER (PARTITION BY asset_code),
+           min(user_ts) OVER (PARTITION BY asset_code),
+           user_ts,
+           id,
+           reading
+      FROM foglamp.readings
+     WHERE NOT EXISTS (SELECT 1 FROM foglamp.asset_summary)
+  ORDER BY asset_code, user_ts DESC, id DESC
+ON CONFLICT DO NOTHING;
+
+
+-- Rollup tables, see init.sql
+CREATE TABLE IF NOT EXISTS foglamp.readings_minute (
+    asset_code  character varying(50)       NOT NULL,
+    datapoint   character varying(255)      NOT NULL,
+    bucket_ts   timestamp(6) with time zone NOT NULL,
+    min         double precision            NOT NULL,
+    max         double precision            NOT NULL,
+    total       double precision            NOT NULL,
+    readings    bigint                      NOT NULL,
+    last_object bigint                      NOT NULL DEFAULT 0,
+    CONSTRAINT readings_minute_pkey PRIMARY KEY (asset_code, datapoint, bucket_ts) );
+
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM information_schema.columns
+                   WHERE table_schema = 'foglamp' AND table_name = 'readings_minute' AND column_name = 'last_object') THEN
+        ALTER TABLE foglamp.readings_minute ADD COLUMN last_object bigint NOT NULL DEFAULT 0;
+    END IF;
+END
+$$;
+
+CREATE INDEX IF NOT EXISTS readings_minute_ix1
+    ON foglamp.readings_minute USING btree (bucket_ts);
+
+CREATE TABLE IF NOT EXISTS foglamp.readings_hour (
+    asset_code  character varying(50)       NOT NULL,
+    datapoint   character varying(255)      NOT NULL,
+    bucket_ts   timestamp(6) with time zone NOT NULL,
+    min         double precision            NOT NULL,
+    max         double precision            NOT NULL,
+    total       double precision            NOT NULL,
+    readings    bigint                      NOT NULL,
+    last_object bigint                      NOT NULL DEFAULT 0,
+    CONSTRAINT readings_hour_pkey PRIMARY KEY (asset_code, datapoint, bucket_ts) );
+
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM information_schema.columns
+                   WHERE table_schema = 'foglamp' AND table_name = 'readings_hour' AND column_name = 'last_object') THEN
+        ALTER TABLE foglamp.readings_hour ADD COLUMN last_object bigint NOT NULL DEFAULT 0;
+    END IF;
+END
+$$;
+
+CREATE INDEX IF NOT EXISTS readings_hour_ix1
+    ON foglamp.readings_hour USING btree (bucket_ts);
+
+CREATE TABLE IF NOT EXISTS foglamp.rollups (
+    name        character varying(50)       NOT NULL,
+    last_object bigint                      NOT NULL DEFAULT 0,
+    ts          timestamp(6) with time zone NOT NULL DEFAULT now(),
+    CONSTRAINT rollups_pkey PRIMARY KEY (name) );
+
+INSERT INTO foglamp.rollups ( name, last_object ) VALUES ( 'readings', 0 )
+ON CONFLICT DO NOTHING;
+
+INSERT INTO foglamp.scheduled_processes ( name, script ) VALUES ( 'rollup', '["tasks/rollup"]' )
+ON CONFLICT DO NOTHING;
+
+INSERT INTO foglamp.schedules(id, schedule_name, process_name, schedule_type,
+schedule_time, schedule_interval, exclusive)
+VALUES ('5d7e8e8a-c3cd-11e7-abc4-cec278b6b50a', 'rollup', 'rollup', 3,
+NULL, '00:01:00', true)
+ON CONFLICT DO NOTHING;
+
+
+-- Ranges of the statistics history of all the keys, see the statistics API
+CREATE INDEX IF NOT EXISTS statistics_history_ix1
+    ON foglamp.statistics_history USING btree (history_ts);
@@ -26,6 +26,8 @@ using HttpServer = SimpleWeb::Server<SimpleWeb::HTTP>;
 #define READING_QUERY   	"^/storage/reading/query"
 #define READING_PURGE   	"^/storage/reading/purge"
 
+#define FETCH_TIMESTAMPS_ISO	"iso"
+
 #define PURGE_FLAG_RETAIN	"retain"
 #define PURGE_FLAG_PURGE	"purge"
 
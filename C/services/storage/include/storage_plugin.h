@@ -16,6 +16,7 @@
 
 #define	STORAGE_PURGE_RETAIN	0x0001U
 #define STORAGE_PURGE_SIZE	0x0002U
+#define STORAGE_FETCH_ISO	0x0001U
 
 /**
  * Class that represents a storage plugin.
@@ -39,7 +40,7 @@ public:
 	int		commonUpdate(const std::string& table, const std::string& payload);
 	int		commonDelete(const std::string& table, const std::string& payload);
 	int		readingsAppend(const std::string& payload);
-	char		*readingsFetch(unsigned long id, unsigned int blksize);
+	char		*readingsFetch(unsigned long id, unsigned int blksize, unsigned int flags);
 	char		*readingsRetrieve(const std::string& payload);
 	char		*readingsPurge(unsigned long age, unsigned int flags, unsigned long sent);
 	long		*readingsPurge();
@@ -53,7 +54,7 @@ private:
 	int		(*commonUpdatePtr)(PLUGIN_HANDLE, const char *, const char *);
 	int		(*commonDeletePtr)(PLUGIN_HANDLE, const char *, const char *);
 	int		(*readingsAppendPtr)(PLUGIN_HANDLE, const char *);
-	char		*(*readingsFetchPtr)(PLUGIN_HANDLE, unsigned long id, unsigned int blksize);
+	char		*(*readingsFetchPtr)(PLUGIN_HANDLE, unsigned long id, unsigned int blksize, unsigned int flags);
 	char		*(*readingsRetrievePtr)(PLUGIN_HANDLE, const char *payload);
 	char		*(*readingsPurgePtr)(PLUGIN_HANDLE, unsigned long age, unsigned int flags, unsigned long sent);
 	void		(*releasePtr)(PLUGIN_HANDLE, const char *payload);
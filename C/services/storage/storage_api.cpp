@@ -490,7 +490,8 @@ string  responsePayload;
 }
 
 /**
- * Fetch a block of readings.
+ * Fetch a block of readings, in id order, starting from the reading id given.
+ * The optional query parameter timestamps=iso returns the user_ts as ISO-8601 UTC.
  *
  * @param response	The response stream to send the response on
  * @param request	The HTTP request
@@ -500,6 +501,7 @@ void StorageApi::readingFetch(shared_ptr<HttpServer::Response> response, shared_
 SimpleWeb::CaseInsensitiveMultimap query;
 unsigned long			   id = 0;
 unsigned long			   count = 0;
+unsigned int			   flags = 0;
 string				   responsePayload;
 
 	stats.readingFetch++;
@@ -528,8 +530,20 @@ string				   responsePayload;
 		{
 			count = (unsigned)atol(search->second.c_str());
 		}
+		search = query.find("timestamps");
+		if (search != query.end())
+		{
+			if (search->second.compare(FETCH_TIMESTAMPS_ISO) == 0)
+				flags |= STORAGE_FETCH_ISO;
+			else
+			{
+				string payload = "{ \"error\" : \"Invalid value for query parameter timestamps\" }";
+				respond(response, SimpleWeb::StatusCode::client_error_bad_request, payload);
+				return;
+			}
+		}
 
-		responsePayload = plugin->readingsFetch(id, count);
+		responsePayload = plugin->readingsFetch(id, count, flags);
 
 		respond(response, responsePayload);
 	} catch (exception ex) {
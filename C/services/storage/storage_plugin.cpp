@@ -38,7 +38,7 @@ StoragePlugin::StoragePlugin(PLUGIN_HANDLE handle) : Plugin(handle)
 				manager->resolveSymbol(handle, "plugin_common_delete");
 	readingsAppendPtr = (int (*)(PLUGIN_HANDLE, const char *))
 				manager->resolveSymbol(handle, "plugin_reading_append");
-	readingsFetchPtr = (char * (*)(PLUGIN_HANDLE, unsigned long id, unsigned int blksize))
+	readingsFetchPtr = (char * (*)(PLUGIN_HANDLE, unsigned long id, unsigned int blksize, unsigned int flags))
 				manager->resolveSymbol(handle, "plugin_reading_fetch");
 	readingsRetrievePtr = (char * (*)(PLUGIN_HANDLE, const char *))
 				manager->resolveSymbol(handle, "plugin_reading_retrieve");
@@ -93,9 +93,9 @@ int StoragePlugin::readingsAppend(const string& payload)
 /**
  * Call the readings fetch method in the plugin
  */
-char * StoragePlugin::readingsFetch(unsigned long id, unsigned int blksize)
+char * StoragePlugin::readingsFetch(unsigned long id, unsigned int blksize, unsigned int flags)
 {
-	return this->readingsFetchPtr(instance, id, blksize);
+	return this->readingsFetchPtr(instance, id, blksize, flags);
 }
 
 /**
@@ -404,14 +404,16 @@ class ReadingsStorageClient(StorageClient):
         return json.loads(res, strict=False)
 
     @classmethod
-    def fetch(cls, reading_id, count):
-        """
+    def fetch(cls, reading_id, count, iso_timestamps=False):
+        """ Fetch a block of readings in id order, it returns only the columns id, asset_code, read_key, reading, user_ts
 
         :param reading_id: the first reading ID in the block that is retrieved
         :param count: the number of readings to return, if available
+        :param iso_timestamps: True returns the user_ts as ISO-8601 UTC, e.g. 2017-09-21T14:00:09.025655Z
         :return:
         :Example:
             curl -X  GET http://0.0.0.0:8080/storage/reading?id=2&count=3
+            curl -X  GET http://0.0.0.0:8080/storage/reading?id=2&count=3&timestamps=iso
 
         """
 
@@ -419,6 +421,8 @@ class ReadingsStorageClient(StorageClient):
         # TODO: need to set http / https based on service protocol
 
         get_url = '/storage/reading?id={}&count={}'.format(reading_id, count)
+        if iso_timestamps:
+            get_url += '&timestamps=iso'
 
         conn.request('GET', url=get_url)
         r = conn.getresponse()
@@ -9,6 +9,11 @@
 """
 
 import asyncio
+import datetime
+import gzip
+import re
+import time
+import zlib
 
 from foglamp.common.configuration_manager import ConfigurationManager
 
@@ -40,6 +45,93 @@ MESSAGES_LIST = {
 }
 
 
+# Fixed layout of the timestamps retrieved from the Storage layer, in UTC : 2017-10-11 15:10:51.927191+00
+# the ranges of the fields are checked by the pattern, the days after the 28th are left to the generic
+# conversion as they depend on the month and the year
+_TIMESTAMP_UTC = re.compile(r'(\d{4}-(?:0[1-9]|1[0-2])-(?:0[1-9]|1\d|2[0-8]))'
+                            r'[ T]((?:[01]\d|2[0-3]):[0-5]\d:[0-5]\d)(?:\.(\d{1,6}))?(?:Z|[+-]00(?::?00)?)$')
+
+# Generic layout of the timestamps, having any UTC offset : 2017-10-11 15:10:51.927191+05:30
+_TIMESTAMP_ANY = re.compile(r'(\d{4})-(\d{2})-(\d{2})[ T](\d{2}):(\d{2}):(\d{2})(?:\.(\d{1,6}))?'
+                            r'\s*(?:Z|([+-])(\d{2})(?::?(\d{2}))?)?$')
+
+
+def convert_timestamp(timestamp):
+    """Converts a timestamp retrieved from the Storage layer to ISO 8601 in UTC,
+    Z is the zone designator for the zero UTC offset
+
+    Timestamps in UTC are converted without any parsing of their values, only the ranges of the fields
+    are checked, the other UTC offsets are applied to the date/time.
+
+     Args:
+        timestamp : timestamp to convert, as 2017-10-11 15:10:51.927191+00 or 2017-10-11 15:10:51.9+05:30
+     Returns:
+         Converted timestamp, as 2017-10-11T15:10:51.927191Z
+     Raises:
+        ValueError: the timestamp is not a valid date/time
+     """
+
+    match = _TIMESTAMP_UTC.match(timestamp)
+    if match is not None:
+        date, time_of_day, fraction = match.groups()
+        return "{0}T{1}.{2:0<6}Z".format(date, time_of_day, fraction or "")
+
+    return _convert_timestamp_offset(timestamp)
+
+
+def _convert_timestamp_offset(timestamp):
+    """Converts a timestamp having any UTC offset to ISO 8601 in UTC, see convert_timestamp"""
+
+    match = _TIMESTAMP_ANY.match(timestamp)
+    if match is None:
+        raise ValueError("timestamp |{0}| does not match any supported format".format(timestamp))
+
+    year, month, day, hour, minute, second, fraction, sign, offset_hours, offset_minutes = match.groups()
+    value = datetime.datetime(int(year), int(month), int(day), int(hour), int(minute), int(second),
+                              int("{0:0<6}".format(fraction or "")))
+    if sign is not None:
+        offset = datetime.timedelta(hours=int(offset_hours), minutes=int(offset_minutes or 0))
+        value = value - offset if sign == '+' else value + offset
+
+    return value.strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+
+
+def convert_timestamps(raw_data, key='user_ts'):
+    """Converts the timestamps of a whole data block retrieved from the Storage layer to ISO 8601 in UTC,
+    see convert_timestamp
+
+    Args:
+        raw_data : data block, the timestamps are converted in place
+        key : name of the field containing the timestamp
+    Returns:
+        raw_data
+    Raises:
+        ValueError: a timestamp is not a valid date/time
+    """
+
+    match_utc = _TIMESTAMP_UTC.match
+    # Conversions of the timestamps having an UTC offset, the same timestamp is usually shared by many rows
+    converted = {}
+
+    for row in raw_data:
+        timestamp = row[key]
+        match = match_utc(timestamp)
+        if match is not None:
+            date, time_of_day, fraction = match.groups()
+            row[key] = "{0}T{1}.{2:0<6}Z".format(date, time_of_day, fraction or "")
+        else:
+            try:
+                row[key] = converted[timestamp]
+            except KeyError:
+                row[key] = converted[timestamp] = _convert_timestamp_offset(timestamp)
+
+    return raw_data
+
+
+# Largest integer exactly represented by a float, the bigger ones are evaluated as numbers
+_MAX_FLOAT_INTEGER = 2 ** 53
+
+
 def evaluate_type(value):
     """Evaluates the type in relation to its value
 
@@ -50,6 +142,16 @@ def evaluate_type(value):
      Raises:
      """
 
+    # Handles the most common cases without conversions
+    value_type = type(value)
+    if value_type is int:
+        if -_MAX_FLOAT_INTEGER <= value <= _MAX_FLOAT_INTEGER:
+            return "integer"
+    elif value_type is float:
+        if value - value == 0:
+            # Finite value, the case having .0 as 967.0 is a number as well
+            return "number"
+
     try:
         float(value)
 
@@ -79,33 +181,122 @@ def evaluate_type(value):
 
 
 def identify_unique_asset_codes(raw_data):
-    """Identify unique asset codes in the data block
+    """Identify unique asset codes in the data block, and their datapoints, in a single pass
 
     Args:
         raw_data : data block retrieved from the Storage layer that should be evaluated
     Returns:
-        unique_asset_codes : list of unique codes
+        unique_asset_codes : list of unique codes, asset_data contains all the datapoints
+                             found in the block for the asset, with the first value found
 
     Raises:
     """
 
-    unique_asset_codes = []
+    unique_asset_codes = {}
 
     for row in raw_data:
         asset_code = row['asset_code']
         asset_data = row['reading']
 
-        # Evaluates if the asset_code is already in the list
-        if not any(item["asset_code"] == asset_code for item in unique_asset_codes):
+        item = unique_asset_codes.get(asset_code)
+        if item is None:
+            unique_asset_codes[asset_code] = {
+                "asset_code": asset_code,
+                "asset_data": dict(asset_data)
+            }
+        else:
+            known_data = item["asset_data"]
+            # Adds the datapoints not present in the previous readings of the asset
+            if not known_data.keys() >= asset_data.keys():
+                for datapoint in asset_data:
+                    if datapoint not in known_data:
+                        known_data[datapoint] = asset_data[datapoint]
 
-            unique_asset_codes.append(
-                {
-                    "asset_code": asset_code,
-                    "asset_data": asset_data
-                }
-            )
+    return list(unique_asset_codes.values())
+
+
+class RequestCompression(object):
+    """Compresses the bodies of the requests sent to the destination, keeping the statistics of the compression
+
+    Bodies smaller than the threshold are sent uncompressed, as the saving does not pay the CPU time.
+    """
 
-    return unique_asset_codes
+    METHODS = ("none", "gzip", "deflate")
+    """ Supported compression methods, deflate is the zlib format as defined for the HTTP Content-Encoding """
+
+    def __init__(self, method="none", level=6, threshold=1024):
+        """
+        Args:
+            method : one of METHODS
+            level : compression level, 1 (fastest) - 9 (smallest)
+            threshold : minimum size in bytes of a body to be compressed
+        Raises:
+            ValueError: not supported method or level
+        """
+
+        method = method.lower()
+        if method not in self.METHODS:
+            raise ValueError("compression method |{0}| not supported, valid values {1}".format(
+                method, self.METHODS))
+        if not 1 <= level <= 9:
+            raise ValueError("compression level |{0}| not valid, valid range 1 - 9".format(level))
+
+        self._method = method
+        self._level = level
+        self._threshold = threshold
+        self._requests = 0
+        self._bytes = 0
+        self._compressed_bytes = 0
+        self._seconds = 0.0
+
+    @property
+    def enabled(self):
+        return self._method != "none"
+
+    def compress(self, body):
+        """Compresses a body
+
+        Args:
+            body : body to compress, str or bytes
+        Returns:
+            body : the body to send, as bytes
+            encoding : the compression applied, gzip or deflate, None if the body is not compressed
+        Raises:
+        """
+
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        if not self.enabled or len(body) < self._threshold:
+            return body, None
+
+        start = time.time()
+        if self._method == "gzip":
+            compressed = gzip.compress(body, compresslevel=self._level)
+        else:
+            compressed = zlib.compress(body, self._level)
+        self._seconds += time.time() - start
+        self._requests += 1
+        self._bytes += len(body)
+        self._compressed_bytes += len(compressed)
+
+        return compressed, self._method
+
+    def status(self):
+        """Statistics of the bodies compressed
+
+        Returns:
+            dict having the number of bodies compressed, their size before and after the compression,
+            the compression ratio and the time spent
+        Raises:
+        """
+
+        return {
+            "compressedRequests": self._requests,
+            "uncompressedBytes": self._bytes,
+            "compressedBytes": self._compressed_bytes,
+            "compressionRatio": round(self._bytes / self._compressed_bytes, 2) if self._compressed_bytes else 0,
+            "compressionSeconds": round(self._seconds, 3)
+        }
 
 
 def retrieve_configuration(_storage, _category_name, _default, _category_description):
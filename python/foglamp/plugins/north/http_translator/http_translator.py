@@ -12,6 +12,7 @@ import json
 
 from foglamp.common import logger
 from foglamp.plugins.north.common.common import *
+from foglamp.plugins.north.common.exceptions import HttpTranslatorException
 
 __author__ = "Ashish Jabble"
 __copyright__ = "Copyright (c) 2017 OSIsoft, LLC"
@@ -43,6 +44,31 @@ _DEFAULT_CONFIG = {
         'description': 'how long (x seconds) the plugin should wait for pending tasks to complete or cancel otherwise',
         'type': 'integer',
         'default': '10'
+    },
+    'chunk_size': {
+        'description': 'Max number of readings sent in a single request, a block is split in many requests',
+        'type': 'integer',
+        'default': '500'
+    },
+    'max_concurrency': {
+        'description': 'Max number of concurrent requests',
+        'type': 'integer',
+        'default': '4'
+    },
+    'compression': {
+        'description': 'Compression of the requests bodies: none, gzip or deflate',
+        'type': 'string',
+        'default': 'none'
+    },
+    'compression_level': {
+        'description': 'Compression level, 1 (fastest) - 9 (smallest)',
+        'type': 'integer',
+        'default': '6'
+    },
+    'compression_threshold': {
+        'description': 'Minimum size in bytes of a request body to be compressed',
+        'type': 'integer',
+        'default': '1024'
     }
 }
 
@@ -60,8 +86,8 @@ def plugin_info():
 
 def plugin_init(data):
     global http_translator, config
-    http_translator = HttpTranslatorPlugin()
     config = data
+    http_translator = HttpTranslatorPlugin()
     return config
 
 
@@ -83,6 +109,12 @@ class HttpTranslatorPlugin(object):
     def __init__(self):
         self.event_loop = asyncio.get_event_loop()
         self.tasks = []
+        self.session = None
+        self.chunk_size = max(1, int(config['chunk_size']['value']))
+        self.max_concurrency = max(1, int(config['max_concurrency']['value']))
+        self.compression = RequestCompression(config['compression']['value'],
+                                              int(config['compression_level']['value']),
+                                              int(config['compression_threshold']['value']))
 
     def shutdown(self):
         """  Filter and cancel all pending tasks,
@@ -94,6 +126,11 @@ class HttpTranslatorPlugin(object):
 
         """
         self.event_loop.run_until_complete(self.cancel_tasks())
+        if self.session is not None:
+            self.event_loop.run_until_complete(self.session.close())
+            self.session = None
+        if self.compression.enabled:
+            _LOGGER.info("Compression %s", self.compression.status())
 
     async def cancel_tasks(self):
         # cancel pending tasks
@@ -101,16 +138,13 @@ class HttpTranslatorPlugin(object):
         if len(self.tasks) == 0:
             return
 
-        done, pending = await asyncio.wait(self.tasks)
-
-        if len(pending):
-            # FIXME: (ASK) wait for some fixed time? or Configurable
-            wait_for = config['shutdown_wait_time']['value']
-            pass
+        wait_for = int(config['shutdown_wait_time']['value'])
+        done, pending = await asyncio.wait(self.tasks, timeout=wait_for)
 
         # cancel any pending tasks, the tuple could be empty so it's safe
         for pending_task in pending:
             pending_task.cancel()
+        self.tasks = []
 
     def send_payloads(self, payloads, stream_id):
         is_data_sent = False
@@ -118,43 +152,78 @@ class HttpTranslatorPlugin(object):
         num_sent = 0
         try:
             new_last_object_id, num_sent = self.event_loop.run_until_complete(self._send_payloads(payloads))
-            is_data_sent = True
+            is_data_sent = num_sent > 0
+            if self.compression.enabled:
+                _LOGGER.debug("Compression %s", self.compression.status())
         except Exception as ex:
             _LOGGER.exception("Data could not be sent, %s", str(ex))
 
         return is_data_sent, new_last_object_id, num_sent
 
     async def _send_payloads(self, payloads):
-        """ send a list of block payloads """
-        num_count = 0
+        """ send a list of block payloads
+
+        The block is split in chunks, sent concurrently, the readings of a chunk are grouped by asset.
+
+        :return: the id of the last reading and the number of readings of the chunks sent,
+                 considering only the chunks preceding the first failed one
+        """
+        if self.session is None:
+            # The session and its connections are reused for all the blocks
+            connector = aiohttp.TCPConnector(limit=self.max_concurrency)
+            self.session = aiohttp.ClientSession(connector=connector)
+
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        chunks = [payloads[start:start + self.chunk_size] for start in range(0, len(payloads), self.chunk_size)]
+        self.tasks = [asyncio.ensure_future(self._send_chunk(chunk, semaphore))
+                      for chunk in chunks]
+        try:
+            results = await asyncio.gather(*self.tasks, return_exceptions=True)
+        finally:
+            self.tasks = []
+
         last_id = None
-        async with aiohttp.ClientSession() as session:
-            payload_to_be_send = list()
-            for payload in payloads:
-                num_count += 1
-                last_id = payload['id']
-                p = {"asset_code": payload['asset_code'],
-                     "readings": [{
-                         "read_key": payload['read_key'],
-                         "user_ts": payload['user_ts'],
-                         "reading": payload['reading']
-                     }]}
-                payload_to_be_send.append(p)
-            task = asyncio.ensure_future(self._send(payload_to_be_send, session))
-            self.tasks.append(task)  # create list of tasks
-            await asyncio.gather(*self.tasks)  # gather task responses
+        num_count = 0
+        for chunk, result in zip(chunks, results):
+            if isinstance(result, Exception):
+                _LOGGER.error("Data could not be sent after the id %s, %s", last_id, str(result))
+                break
+            last_id = chunk[-1]['id']
+            num_count += len(chunk)
         return last_id, num_count
 
+    async def _send_chunk(self, chunk, semaphore):
+        """ Send a chunk of readings, grouped by asset """
+        payload_to_be_send = dict()
+        for payload in chunk:
+            asset_code = payload['asset_code']
+            reading = {
+                "read_key": payload['read_key'],
+                "user_ts": payload['user_ts'],
+                "reading": payload['reading']
+            }
+            try:
+                payload_to_be_send[asset_code]["readings"].append(reading)
+            except KeyError:
+                payload_to_be_send[asset_code] = {"asset_code": asset_code, "readings": [reading]}
+        async with semaphore:
+            return await self._send(list(payload_to_be_send.values()), self.session)
+
     async def _send(self, payload, session):
         """ Send the payload, using ClientSession """
         url = config['url']['value']
         headers = {'content-type': 'application/json'}
-        async with session.post(url, data=json.dumps(payload), headers=headers) as resp:
+        body, encoding = self.compression.compress(json.dumps(payload))
+        if encoding is not None:
+            headers['content-encoding'] = encoding
+        async with session.post(url, data=body, headers=headers) as resp:
             result = await resp.text()
             status_code = resp.status
             if status_code in range(400, 500):
                 _LOGGER.error("Bad request error code: %d, reason: %s", status_code, resp.reason)
             if status_code in range(500, 600):
                 _LOGGER.error("Server error code: %d, reason: %s", status_code, resp.reason)
+            if status_code >= 400:
+                raise HttpTranslatorException("Data not accepted, error code: {}".format(status_code))
 
             return result
@@ -16,6 +16,7 @@ import resource
 import datetime
 import time
 import json
+import concurrent.futures
 import requests
 import logging
 import urllib3
@@ -45,6 +46,17 @@ _config = {}
 _config_from_manager = {}
 # Forces the recreation of PIServer objects when the first error occurs
 _recreate_omf_objects = True
+# Cache of the OMF types already created, as (type_id, asset_code),
+# loaded from the Storage layer at the first use and kept aligned with the omf_created_objects table
+_omf_created_types = set()
+# Configuration key of the cached OMF types, None = cache to be loaded
+_omf_created_types_key = None
+# Keep-alive HTTP session to the PICROMF, its connections are reused across the requests and the blocks
+_session = None  # type: requests.Session
+# Executor used to send the independent OMF messages concurrently
+_executor = None  # type: concurrent.futures.ThreadPoolExecutor
+# Compression of the OMF messages
+_compression = plugin_common.RequestCompression()
 
 # Messages used for Information, Warning and Error notice
 _MESSAGES_LIST = {
@@ -52,6 +64,7 @@ _MESSAGES_LIST = {
     "i000000": "information.",
     # Warning / Error messages
     "e000000": "general error.",
+    "e000001": "the sending of the block stopped after the row id |{0}| - error details |{1}|",
 }
 # Configuration related to the OMF Translator
 _CONFIG_CATEGORY_DESCRIPTION = 'Configuration of OMF Translator plugin'
@@ -86,6 +99,38 @@ _CONFIG_DEFAULT_OMF = {
         "type": "integer",
         "default": "30"
     },
+    "OMFMaxConcurrency": {
+        "description": "Max number of concurrent requests to the OMF PI Connector Relay",
+        "type": "integer",
+        "default": "4"
+    },
+    "OMFMaxMessageBytes": {
+        "description": "Max size in bytes of an OMF data message, "
+                       "a block of readings is sent to the OMF PI Connector Relay using many messages if needed",
+        "type": "integer",
+        "default": "1048576"
+    },
+    "OMFCompression": {
+        "description": "Compression of the OMF messages sent to the OMF PI Connector Relay, none or gzip",
+        "type": "string",
+        "default": "none"
+    },
+    "OMFCompressionLevel": {
+        "description": "Compression level of the OMF messages, 1 (fastest) - 9 (smallest)",
+        "type": "integer",
+        "default": "6"
+    },
+    "OMFCompressionThreshold": {
+        "description": "Minimum size in bytes of an OMF message to be compressed",
+        "type": "integer",
+        "default": "1024"
+    },
+    "OMFDataGrouped": {
+        "description": "Groups the readings of the same container into a single OMF data message, "
+                       "False sends a container for every reading as required by older PI Connector Relays",
+        "type": "boolean",
+        "default": "True"
+    },
     "StaticData": {
         "description": "Static data to include in each sensor reading sent to OMF.",
         "type": "JSON",
@@ -193,6 +238,7 @@ def plugin_info():
         'version': "1.0.0",
         'type': "translator",
         'interface': "1.0",
+        'timestamps': "iso",
         'config': _CONFIG_DEFAULT_OMF
     }
 
@@ -209,6 +255,10 @@ def plugin_init(data):
     global _config_omf_types_from_manager
     global _logger
     global _recreate_omf_objects
+    global _omf_created_types_key
+    global _session
+    global _executor
+    global _compression
 
     try:
         # note : _module_name is used as __name__ refers to the Sending Process
@@ -227,6 +277,12 @@ def plugin_init(data):
     _config['OMFMaxRetry'] = int(data['OMFMaxRetry']['value'])
     _config['OMFRetrySleepTime'] = int(data['OMFRetrySleepTime']['value'])
     _config['OMFHttpTimeout'] = int(data['OMFHttpTimeout']['value'])
+    _config['OMFMaxConcurrency'] = max(1, int(data['OMFMaxConcurrency']['value']))
+    _config['OMFMaxMessageBytes'] = int(data['OMFMaxMessageBytes']['value'])
+    _config['OMFCompression'] = data['OMFCompression']['value'].lower()
+    _config['OMFCompressionLevel'] = int(data['OMFCompressionLevel']['value'])
+    _config['OMFCompressionThreshold'] = int(data['OMFCompressionThreshold']['value'])
+    _config['OMFDataGrouped'] = True if data['OMFDataGrouped']['value'].upper() == 'TRUE' else False
     _config['StaticData'] = ast.literal_eval(data['StaticData']['value'])
     # TODO: compare instance fetching via inspect vs as param passing
     # import inspect
@@ -249,7 +305,19 @@ def plugin_init(data):
 
     _logger.debug("{0} - URL {1}".format("plugin_init", _config['URL']))
     try:
+        # OMF supports only the gzip compression
+        if _config['OMFCompression'] not in ("none", "gzip"):
+            raise ValueError("OMFCompression |{0}| not supported, valid values none, gzip"
+                             .format(_config['OMFCompression']))
+        _compression = plugin_common.RequestCompression(_config['OMFCompression'],
+                                                        _config['OMFCompressionLevel'],
+                                                        _config['OMFCompressionThreshold'])
         _recreate_omf_objects = True
+        # Loads the cache of the OMF types already created
+        _omf_created_types_key = None
+        OmfTranslatorPlugin(_config['sending_process_instance'])._omf_types_already_created(
+                                                                        _config['_CONFIG_CATEGORY_NAME'],
+                                                                        _config_omf_types['type-id']['value'])
     except Exception as ex:
         _logger.error(plugin_common.MESSAGES_LIST["e000011"].format(ex))
         raise plugin_exceptions.PluginInitializeFailed(ex)
@@ -257,8 +325,29 @@ def plugin_init(data):
     # Avoids the warning message - InsecureRequestWarning
     urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
+    # Keeps a pool of connections to the PICROMF, a connection for each concurrent request
+    _close_session()
+    _session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=_config['OMFMaxConcurrency'])
+    _session.mount('https://', adapter)
+    _session.mount('http://', adapter)
+    _executor = concurrent.futures.ThreadPoolExecutor(max_workers=_config['OMFMaxConcurrency'])
+
     return _config
 
+
+def _close_session():
+    """ Releases the connections to the PICROMF and the executor of the concurrent requests """
+    global _session
+    global _executor
+
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
+    if _session is not None:
+        _session.close()
+        _session = None
+
 @_performance_log
 def plugin_send(data, raw_data, stream_id):
     """ Translates and sends to the destination system the data provided by the Sending Process
@@ -276,28 +365,25 @@ def plugin_send(data, raw_data, stream_id):
     
     global _recreate_omf_objects
 
-    is_data_sent = False
     config_category_name = data['_CONFIG_CATEGORY_NAME']
-    data_to_send = []
     type_id = _config_omf_types['type-id']['value']
 
     omf_tranlator = OmfTranslatorPlugin(data['sending_process_instance'])
 
     try:
-        is_data_available, new_position, num_sent = omf_tranlator._transform_in_memory_data(data_to_send, raw_data)
-        if is_data_available:
-            omf_tranlator._create_omf_objects(raw_data, config_category_name, type_id)
-            try:
-                omf_tranlator._send_in_memory_data_to_picromf("Data", data_to_send)
-            except Exception as ex:
-                # Forces the recreation of PIServer's objects on the first error occurred
-                if _recreate_omf_objects:
-                    omf_tranlator._deleted_omf_types_already_created(config_category_name, type_id)
-                    _recreate_omf_objects = False
-                    _logger.debug("{0} - Forces objects recreation ".format("plugin_send"))
-                raise ex
-            else:
-                is_data_sent = True
+        try:
+            is_data_sent, new_position, num_sent = omf_tranlator._send_in_memory_data_chunks(raw_data,
+                                                                                              config_category_name,
+                                                                                              type_id)
+            if _compression.enabled:
+                _logger.debug("{0} - compression |{1}| ".format("plugin_send", _compression.status()))
+        except Exception as ex:
+            # Forces the recreation of PIServer's objects on the first error occurred
+            if _recreate_omf_objects:
+                omf_tranlator._deleted_omf_types_already_created(config_category_name, type_id)
+                _recreate_omf_objects = False
+                _logger.debug("{0} - Forces objects recreation ".format("plugin_send"))
+            raise ex
     except Exception as ex:
         _logger.exception(plugin_common.MESSAGES_LIST["e000031"].format(ex))
         raise
@@ -311,6 +397,9 @@ def plugin_shutdown(data):
     """
     try:
         _logger.debug("{0} - plugin_shutdown".format(_MODULE_NAME))
+        if _compression.enabled:
+            _logger.info("{0} - compression |{1}| ".format(_MODULE_NAME, _compression.status()))
+        _close_session()
     except Exception as ex:
         _logger.error(plugin_common.MESSAGES_LIST["e000013"].format(ex))
         raise
@@ -334,11 +423,36 @@ class OmfTranslatorPlugin(object):
          Raises:
          Todo:
          """
+        global _omf_created_types_key
+
+        # Invalidates the cache, it will be reloaded at the next use
+        _omf_created_types_key = None
+        _omf_created_types.clear()
         payload = payload_builder.PayloadBuilder() \
             .WHERE(['configuration_key', '=', config_category_name]) \
             .AND_WHERE(['type_id', '=', type_id]) \
             .payload()
         self._sending_process_instance._storage.delete_from_tbl("omf_created_objects", payload)
+
+    def _omf_types_already_created(self, config_category_name, type_id):
+        """ Returns the cache of the OMF types already created, it is loaded from the Storage layer
+            at the first use and when the type id changes
+         Args:
+            config_category_name: used to identify OMF objects already created
+            type_id:              used to identify OMF objects already created
+         Returns:
+            Set of (type_id, asset_code) already defined into the PI Server
+         Raises:
+         Todo:
+         """
+        global _omf_created_types_key
+
+        if _omf_created_types_key != (config_category_name, type_id):
+            asset_codes = self._retrieve_omf_types_already_created(config_category_name, type_id)
+            _omf_created_types.clear()
+            _omf_created_types.update((type_id, asset_code) for asset_code in asset_codes)
+            _omf_created_types_key = (config_category_name, type_id)
+        return _omf_created_types
     
     def _retrieve_omf_types_already_created(self, configuration_key, type_id):
         """ Retrieves the list of OMF types already defined/sent to the PICROMF
@@ -380,6 +494,8 @@ class OmfTranslatorPlugin(object):
                     type_id=type_id)\
             .payload()
         self._sending_process_instance._storage.insert_into_tbl("omf_created_objects", payload)
+        if _omf_created_types_key == (configuration_key, type_id):
+            _omf_created_types.add((type_id, asset_code))
     
     def _generate_omf_asset_id(self, asset_code):
         """ Generates an asset id usable by AF/PI Server from an asset code stored into the Storage layer
@@ -565,37 +681,113 @@ class OmfTranslatorPlugin(object):
         Raises:
         Todo:
         """
-        asset_codes_to_evaluate = plugin_common.identify_unique_asset_codes(raw_data)
-        asset_codes_already_created = self._retrieve_omf_types_already_created(config_category_name, type_id)
+        asset_codes_already_created = self._omf_types_already_created(config_category_name, type_id)
+        # Only the readings of the new OMF types are evaluated, usually none after the first blocks
+        new_rows = [row for row in raw_data if (type_id, row['asset_code']) not in asset_codes_already_created]
+        if not new_rows:
+            return
+        asset_codes_to_evaluate = plugin_common.identify_unique_asset_codes(new_rows)
+        # The OMF objects of the different assets are independent, they are created concurrently
+        futures = {}
         for item in asset_codes_to_evaluate:
-            asset_code = item["asset_code"]
-            # Evaluates if it is a new OMF type
-            if not any(tmp_item == asset_code for tmp_item in asset_codes_already_created):
-                asset_code_omf_type = ""
-                try:
-                    asset_code_omf_type = copy.deepcopy(_config_omf_types[asset_code]["value"])
-                except KeyError:
-                    configuration_based = False
-                else:
-                    configuration_based = True
-                if configuration_based:
-                    _logger.debug("creates type - configuration based - asset |{0}| ".format(asset_code))
-                    self._create_omf_objects_configuration_based(asset_code, asset_code_omf_type)
-                else:
-                    # handling - Automatic OMF Type Mapping
-                    _logger.debug("creates type - automatic handling - asset |{0}| ".format(asset_code))
-                    self._create_omf_objects_automatic(item)
-                self._flag_created_omf_type(config_category_name, type_id, asset_code)
+            futures[_executor.submit(self._create_omf_objects_asset, item)] = item["asset_code"]
+        error = None
+        for future in concurrent.futures.as_completed(futures):
+            asset_code = futures[future]
+            try:
+                future.result()
+            except Exception as ex:
+                if error is None:
+                    error = ex
             else:
-                _logger.debug("asset already created - asset |{0}| ".format(asset_code))
+                # The Storage layer is updated only by the current thread
+                self._flag_created_omf_type(config_category_name, type_id, asset_code)
+        if error is not None:
+            raise error
+
+    def _create_omf_objects_asset(self, item):
+        """ Creates the OMF objects of an asset, using either the Configuration Based or the Automatic OMF Type Mapping
+        Args:
+            item : asset's information as identified in the data block, having also a sample value for the asset
+        Returns:
+        Raises:
+        Todo:
+        """
+        asset_code = item["asset_code"]
+        asset_code_omf_type = ""
+        try:
+            asset_code_omf_type = copy.deepcopy(_config_omf_types[asset_code]["value"])
+        except KeyError:
+            configuration_based = False
+        else:
+            configuration_based = True
+        if configuration_based:
+            _logger.debug("creates type - configuration based - asset |{0}| ".format(asset_code))
+            self._create_omf_objects_configuration_based(asset_code, asset_code_omf_type)
+        else:
+            # handling - Automatic OMF Type Mapping
+            _logger.debug("creates type - automatic handling - asset |{0}| ".format(asset_code))
+            self._create_omf_objects_automatic(item)
     
+    def _send_in_memory_data_chunks(self, raw_data, config_category_name, type_id):
+        """ Transforms and sends the data block to the PICROMF using OMF data messages smaller than
+            OMFMaxMessageBytes, the messages are sent in order and the sending stops at the first failure,
+            so that only the rows of the failed message and the following ones are sent again
+        Args:
+            raw_data :            data block to send as retrieved from the Storage layer
+            config_category_name: used to identify OMF objects already created
+            type_id:              used to identify OMF objects already created
+        Returns:
+            is_data_sent : True, at least a message was successfully sent
+            new_position : Last row_id of the messages successfully sent
+            num_sent     : Number of rows successfully sent
+        Raises:
+            Exception: the sending of the first message failed
+        Todo:
+        """
+        max_bytes = _config['OMFMaxMessageBytes']
+        is_data_sent = False
+        new_position = 0
+        num_sent = 0
+        objects_created = False
+        rows_per_message = len(raw_data)
+        start = 0
+        while start < len(raw_data):
+            raw_chunk = raw_data[start:start + rows_per_message]
+            data_to_send = []
+            is_data_available, chunk_position, chunk_sent = self._transform_in_memory_data(data_to_send, raw_chunk)
+            if is_data_available:
+                omf_data_json = json.dumps(data_to_send)
+                if len(omf_data_json) > max_bytes and len(raw_chunk) > 1:
+                    # Evaluates the number of rows fitting in a message from the size of the current one
+                    rows_per_message = max(1, min(len(raw_chunk) - 1,
+                                                  int(len(raw_chunk) * max_bytes * 0.9 / len(omf_data_json))))
+                    continue
+                if not objects_created:
+                    self._create_omf_objects(raw_data, config_category_name, type_id)
+                    objects_created = True
+                try:
+                    self._send_in_memory_data_to_picromf("Data", omf_data_json)
+                except Exception as ex:
+                    if not is_data_sent:
+                        raise
+                    _logger.warning(_MESSAGES_LIST["e000001"].format(new_position, ex))
+                    break
+                is_data_sent = True
+                new_position = chunk_position
+                num_sent += chunk_sent
+            start += len(raw_chunk)
+        return is_data_sent, new_position, num_sent
+
     @_performance_log
     def _send_in_memory_data_to_picromf(self, message_type, omf_data):
         """ Sends data to PICROMF - it retries the operation using a sleep time increased *2 for every retry
             it logs a WARNING only at the end of the retry mechanism in case of a communication error
+            the connections to the PICROMF are kept alive and reused, the retries of a message sent by a worker
+            of the executor do not block the other messages
         Args:
             message_type: possible values {Type, Container, Data}
-            omf_data:     OMF message to send
+            omf_data:     OMF message to send, either as a python structure or already converted to JSON
         Returns:
         Raises:
             Exception: an error occurred during the OMF request
@@ -611,17 +803,21 @@ class OmfTranslatorPlugin(object):
                       'action': 'create',
                       'messageformat': 'JSON',
                       'omfversion': '1.0'}
-        omf_data_json = json.dumps(omf_data)
+        omf_data_json = omf_data if isinstance(omf_data, str) else json.dumps(omf_data)
 
         if _log_debug_level == 3:
             _logger.debug("OMF message : |{0}| |{1}| " .format(message_type, omf_data_json))
 
+        omf_body, compression = _compression.compress(omf_data_json)
+        if compression is not None:
+            msg_header['compression'] = compression
+
         while num_retry < _config['OMFMaxRetry']:
             _error = False
             try:
-                response = requests.post(_config['URL'],
+                response = _session.post(_config['URL'],
                                          headers=msg_header,
-                                         data=omf_data_json,
+                                         data=omf_body,
                                          verify=False,
                                          timeout=_config['OMFHttpTimeout'])
             except Exception as e:
@@ -660,15 +856,27 @@ class OmfTranslatorPlugin(object):
         num_sent = 0
         # internal statistic - rows that generate errors in the preparation process, before sending them to OMF
         num_unsent = 0
+        # OMF containers by container ID, used to group the readings of the same container
+        containers = {} if _config['OMFDataGrouped'] else None
+        measurement_ids = {}
         try:
+            # Converts the Date/time of the whole block to a proper ISO format,
+            # the rows having an invalid timestamp are reported and skipped one by one below
+            try:
+                plugin_common.convert_timestamps(raw_data)
+            except ValueError:
+                pass
             for row in raw_data:
                 row_id = row['id']
                 asset_code = row['asset_code']
                 # Identification of the object/sensor
-                measurement_id = self._generate_omf_measurement(asset_code)
-                
+                measurement_id = measurement_ids.get(asset_code)
+                if measurement_id is None:
+                    measurement_id = self._generate_omf_measurement(asset_code)
+                    measurement_ids[asset_code] = measurement_id
+
                 try:
-                    self._transform_in_memory_row(data_to_send, row, measurement_id)
+                    self._transform_in_memory_row(data_to_send, row, measurement_id, containers)
                     # Used for the statistics update
                     num_sent += 1
                     # Latest position reached
@@ -682,12 +890,15 @@ class OmfTranslatorPlugin(object):
             raise
         return data_available, new_position, num_sent
     
-    def _transform_in_memory_row(self, data_to_send, row, target_stream_id):
+    def _transform_in_memory_row(self, data_to_send, row, target_stream_id, containers=None):
         """ Extends the in memory structure using data retrieved from the Storage Layer
         Args:
             data_to_send:      data block to send - updated/used by reference
             row:               information retrieved from the Storage Layer that it is used to extend data_to_send
             target_stream_id:  OMF container ID
+            containers:        OMF containers already in data_to_send by container ID - updated/used by reference,
+                               the reading is added to the values of its container;
+                               None adds a new container for every reading
         Returns:
         Raises:
         Todo:
@@ -699,36 +910,46 @@ class OmfTranslatorPlugin(object):
             timestamp_raw = row['user_ts']
 
             # Converts Date/time to a proper ISO format - Z is the zone designator for the zero UTC offset
-            step1 = datetime.datetime.strptime(timestamp_raw, '%Y-%m-%d %H:%M:%S.%f+00')
-            timestamp = step1.isoformat() + 'Z'
+            # the block is usually already converted by _transform_in_memory_data
+            if timestamp_raw.endswith('Z'):
+                timestamp = timestamp_raw
+            else:
+                timestamp = plugin_common.convert_timestamp(timestamp_raw)
 
             sensor_data = row['reading']
             if _log_debug_level == 3:
                 _logger.debug("stream ID : |{0}| sensor ID : |{1}| row ID : |{2}|  "
                               .format(target_stream_id, asset_code, str(row_id)))
             # Prepares new data for the PICROMF
-            new_data = [
-                {
-                    "containerid": target_stream_id,
-                    "values": [
-                        {
-                            "Time": timestamp
-                        }
-                    ]
-                }
-            ]
+            new_values = {
+                "Time": timestamp
+            }
             # Evaluates which data is available
             for data_key in sensor_data:
                 try:
-                    new_data[0]["values"][0][data_key] = sensor_data[data_key]
+                    new_values[data_key] = sensor_data[data_key]
                     data_available = True
                 except KeyError:
                     pass
             if data_available:
-                # note : append produces a not properly constructed OMF message
-                data_to_send.extend(new_data)
+                if containers is None:
+                    new_data = {
+                        "containerid": target_stream_id,
+                        "values": [new_values]
+                    }
+                    data_to_send.append(new_data)
+                else:
+                    new_data = containers.get(target_stream_id)
+                    if new_data is None:
+                        new_data = {
+                            "containerid": target_stream_id,
+                            "values": []
+                        }
+                        containers[target_stream_id] = new_data
+                        data_to_send.append(new_data)
+                    new_data["values"].append(new_values)
                 if _log_debug_level == 3:
-                    _logger.debug("in memory info |{0}| ".format(new_data))
+                    _logger.debug("in memory info |{0}| ".format(new_values))
             else:
                 _logger.warning(plugin_common.MESSAGES_LIST["e000020"])
         except Exception:
@@ -121,3 +121,9 @@ class FoglampMicroservice(FoglampProcess):
 
     async def unregister_interest(self, request):
         pass
+
+    async def notify_readings(self, request):
+        pass
+
+    async def wait_readings(self, request):
+        pass
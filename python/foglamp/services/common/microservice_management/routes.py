@@ -28,6 +28,9 @@ def setup(app, obj):
     # Interest Registration
     app.router.add_route('POST', '/foglamp/service/interest', obj.register_interest)
     app.router.add_route('DELETE', '/foglamp/service/interest/{interest_id}', obj.unregister_interest)
+    # Readings notification, from the south services to the north sending processes
+    app.router.add_route('POST', '/foglamp/notify/readings', obj.notify_readings)
+    app.router.add_route('GET', '/foglamp/notify/readings', obj.wait_readings)
 
     # enable cors support
     enable_cors(app)
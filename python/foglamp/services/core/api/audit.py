@@ -10,6 +10,7 @@ from collections import OrderedDict
 from aiohttp import web
 from foglamp.common.storage_client.payload_builder import PayloadBuilder
 from foglamp.services.core import connect
+from foglamp.services.core.single_flight import SingleFlight
 
 __author__ = "Amarendra K. Sinha, Ashish Jabble"
 __copyright__ = "Copyright (c) 2017 OSIsoft, LLC"
@@ -89,7 +90,7 @@ async def get_audit_entries(request):
 
         # SELECT count (*) FROM log <_and_where_payload>
         storage_client = connect.get_storage()
-        result = storage_client.query_tbl_with_payload('log', total_count_payload)
+        result = await SingleFlight.query_tbl_with_payload(storage_client, 'log', total_count_payload)
         total_count = result['rows'][0]['count']
 
         payload.ORDER_BY(['ts', 'desc'])
@@ -99,7 +100,7 @@ async def get_audit_entries(request):
             payload.OFFSET(int(offset))
 
         # SELECT * FROM log <payload.payload()>
-        results = storage_client.query_tbl_with_payload('log', payload.payload())
+        results = await SingleFlight.query_tbl_with_payload(storage_client, 'log', payload.payload())
         res = []
         for row in results['rows']:
             r = dict()
@@ -130,7 +131,7 @@ async def get_audit_log_codes(request):
         curl -X GET http://localhost:8081/foglamp/audit/logcode
     """
     storage_client = connect.get_storage()
-    result = storage_client.query_tbl('log_codes')
+    result = await SingleFlight.query_tbl(storage_client, 'log_codes')
 
     return web.json_response({'logCode': result['rows']})
 
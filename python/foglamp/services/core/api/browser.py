@@ -13,6 +13,12 @@ Supports a number of REST API:
      - Return a summary count of all asset readings
   http://<address>/foglamp/asset/{asset_code}
     - Return a set of asset readings for the given asset 
+  http://<address>/foglamp/latest/{asset_code}
+    - Return the most recent reading for the given asset. It is not under /foglamp/asset/{asset_code},
+      where it would shadow the readings of a datapoint named latest
+  http://<address>/foglamp/export/{asset_code}
+    - Stream the readings for the given asset as newline delimited JSON or CSV. It is not under
+      /foglamp/asset/{asset_code}, where it would shadow the readings of a datapoint named export
   http://<address>/foglamp/asset/{asset_code}/{reading}
     - Return a set of sensor readings for the specified asset and sensor
   http://<address>/foglamp/asset/{asset_code}/{reading}/summary
@@ -20,11 +26,14 @@ Supports a number of REST API:
   http://<address>/foglamp/asset/{asset_code}/{reading}/series
     - Return a time series (min, max and average) for the specified asset and
       sensor averages over seconds, minutes or hours. The selection of seconds, minutes
-      or hours is done via the group query parameter
+      or hours is done via the group query parameter, or with points=N at most N values
+      over intervals of the same duration
 
-  All but the /foglamp/asset API call take a set of optional query parameters
+  All but the /foglamp/asset and /foglamp/latest/{asset_code} API calls take a set of optional query parameters
     limit=x     Return the first x rows only
     skip=x      skip first n entries and used with limit to implemented paged interfaces
+    after=c     Return the readings following the cursor c, taken from the Link header of the previous page
+    before=c    Return the readings preceding the cursor c, taken from the Link header of the next page
     seconds=x   Limit the data return to be less than x seconds old
     minutes=x   Limit the data returned to be less than x minutes old
     hours=x     Limit the data returned to be less than x hours old
@@ -32,15 +41,33 @@ Supports a number of REST API:
   Note seconds, minutes and hours can not be combined in a URL. If they are then only seconds
   will have an effect.
 
+  The summary and series calls are computed from the rollups per minute or per hour of the readings,
+  see the rollup task, when the resolution requested allows it: a time limit of a few minutes at least
+  for the summary, a group by minutes or hours, or intervals of at least a minute for points=N. The
+  rollups are used only when the rollup task has run recently, and only for the minutes or hours that
+  are entirely within the time limit and ended before its last run. The readings at the edges of the
+  time limit, and the ones after the last run, are read from the readings table. The rollups include
+  the readings already purged.
+
   TODO: Improve error handling, use a connection pool
 """
 
+import base64
+import calendar
+import csv
+import datetime
+import functools
+import io
 import json
+import math
+import re
+import time
 from aiohttp import web
 
 from collections import OrderedDict
 from foglamp.common.storage_client.payload_builder import PayloadBuilder
 from foglamp.services.core import connect
+from foglamp.services.core.single_flight import SingleFlight
 
 
 __author__ = "Mark Riddoch, Ashish Jabble"
@@ -51,12 +78,22 @@ __version__ = "${VERSION}"
 
 __DEFAULT_LIMIT = 20
 __DEFAULT_OFFSET = 0
+__EXPORT_PAGE_SIZE = 1000
+__MAX_POINTS = 10000
 __TIMESTAMP_FMT = 'YYYY-MM-DD HH24:MI:SS.MS'
+__CURSOR_TS = 'cursor_user_ts'
+__CURSOR_ID = 'cursor_id'
+__ROLLUP_TABLES = OrderedDict([(3600, 'readings_hour'), (60, 'readings_minute')])
+__ROLLUP_MAX_AGE = 300
+__ROLLUP_MIN_BUCKETS = 3
+__TIMESTAMP_RE = re.compile(r'^\d{4}-\d{2}-\d{2}([ T]\d{2}:\d{2}(:\d{2}(\.\d{1,6})?)?)?([+-]\d{2}(:?\d{2})?|Z)?$')
 
 
 def setup(app):
     """ Add the routes for the API endpoints supported by the data browser """
     app.router.add_route('GET', '/foglamp/asset', asset_counts)
+    app.router.add_route('GET', '/foglamp/latest/{asset_code}', asset_latest)
+    app.router.add_route('GET', '/foglamp/export/{asset_code}', asset_export)
     app.router.add_route('GET', '/foglamp/asset/{asset_code}', asset)
     app.router.add_route('GET', '/foglamp/asset/{asset_code}/{reading}', asset_reading)
     app.router.add_route('GET', '/foglamp/asset/{asset_code}/{reading}/summary', asset_summary)
@@ -67,24 +104,48 @@ async def asset_counts(request):
     """ Browse all the assets for which we have recorded readings and
     return a readings count.
 
+    The counts are maintained by the storage in the asset_summary table when the readings
+    are appended and purged, the readings table is not scanned.
+
     Return the result of the query
-    SELECT asset_code, count(*) FROM readings GROUP BY asset_code;
+    SELECT asset_code, readings AS count FROM asset_summary ORDER BY asset_code;
     """
-
-    # TODO: FOGL-643 - Aggregate with alias support needed to use payload builder
-    # PayloadBuilder().AGGREGATE(["count", "*"]).GROUP_BY('asset_code')
-    aggregate = {"operation": "count", "column": "*", "alias": "count"}
     d = OrderedDict()
-    d['aggregate'] = aggregate
-    d['group'] = "asset_code"
+    d['return'] = ["asset_code", {"column": "readings", "alias": "count"}]
+    d['sort'] = {"column": "asset_code", "direction": "asc"}
 
     payload = json.dumps(d)
     _storage = connect.get_storage()
-    results = _storage.query_tbl_with_payload('readings', payload)
+    results = await SingleFlight.query_tbl_with_payload(_storage, 'asset_summary', payload)
 
     return web.json_response(results['rows'])
 
 
+async def asset_latest(request):
+    """ Return the most recent reading of an asset, with its timestamp
+
+    Return the result of the query
+    SELECT TO_CHAR(last_ts, '__TIMESTAMP_FMT') as "timestamp", last_reading AS reading FROM asset_summary WHERE asset_code = 'asset_code'
+
+    :Example:
+        curl -X GET http://localhost:8081/foglamp/latest/TI
+    """
+    asset_code = request.match_info.get('asset_code', '')
+
+    d = OrderedDict()
+    d['return'] = [{"column": "last_ts", "format": __TIMESTAMP_FMT, "alias": "timestamp"},
+                   {"column": "last_reading", "alias": "reading"}]
+    d['where'] = {"column": "asset_code", "condition": "=", "value": asset_code}
+
+    payload = json.dumps(d)
+    _storage = connect.get_storage()
+    results = await SingleFlight.query_tbl_with_payload(_storage, 'asset_summary', payload)
+    if not results['rows']:
+        raise web.HTTPNotFound(reason='No readings for asset {}'.format(asset_code))
+
+    return web.json_response(results['rows'][0])
+
+
 async def asset(request):
     """ Browse a particular asset for which we have recorded readings and
     return a readings with timestamps for the asset. The number of readings
@@ -98,26 +159,7 @@ async def asset(request):
 
     # TODO: FOGL-637, 640
     timestamp = {"column": "user_ts", "format": __TIMESTAMP_FMT, "alias": "timestamp"}
-    d = OrderedDict()
-    d['return'] = [timestamp, "reading"]
-    _where = PayloadBuilder().WHERE(["asset_code", "=", asset_code]).chain_payload()
-    _and_where = where_clause(request, _where)
-    d.update(_and_where)
-
-    # Add the order by and limit clause
-    limit = int(request.query.get('limit')) if 'limit' in request.query else __DEFAULT_LIMIT
-    offset = int(request.query.get('skip')) if 'skip' in request.query else __DEFAULT_OFFSET
-    _sort_limit_skip_payload = PayloadBuilder(d).ORDER_BY(["user_ts", "desc"]).LIMIT(limit)
-    if offset:
-        _sort_limit_skip_payload = PayloadBuilder(d).SKIP(offset)
-
-    d.update(_sort_limit_skip_payload.chain_payload())
-
-    payload = json.dumps(d)
-    _storage = connect.get_storage()
-    results = _storage.query_tbl_with_payload('readings', payload)
-
-    return web.json_response(results['rows'])
+    return await _readings_page(request, asset_code, [timestamp, "reading"])
 
 
 async def asset_reading(request):
@@ -152,27 +194,100 @@ async def asset_reading(request):
     json_property['json'] = {"column": "reading", "properties": reading}
     json_property['alias'] = reading
 
-    d = OrderedDict()
-    d['return'] = [timestamp, json_property]
-    _where = PayloadBuilder().WHERE(["asset_code", "=", asset_code]).chain_payload()
-    _and_where = where_clause(request, _where)
-    d.update(_and_where)
+    return await _readings_page(request, asset_code, [timestamp, json_property])
 
-    # Add the order by and limit clause
-    limit = int(request.query.get('limit')) if 'limit' in request.query else __DEFAULT_LIMIT
-    offset = int(request.query.get('skip')) if 'skip' in request.query else __DEFAULT_OFFSET
-    _sort_limit_skip_payload = PayloadBuilder(d).ORDER_BY(["user_ts", "desc"]).LIMIT(limit)
 
-    if offset:
-        _sort_limit_skip_payload = PayloadBuilder(d).SKIP(offset)
+async def asset_export(request):
+    """ Export the readings of an asset, the oldest first, streamed as newline delimited JSON
+    or as CSV with the query parameter format=csv
 
-    d.update(_sort_limit_skip_payload.chain_payload())
+    The readings can be limited to a time range with the query parameters from and to, e.g.
+    from=2017-11-01 00:00:00&to=2017-11-02 00:00:00, from is included and to is excluded.
+    The seconds, minutes and hours query parameters are supported too.
+
+    The readings are read by pages and every page is sent as soon as it is read, so that
+    the memory used does not depend on the number of readings. The columns of the CSV are
+    the datapoints of the most recent reading of the asset and of the first page, the other
+    datapoints of a reading are written as a JSON object in the last column, other_datapoints.
+
+    :Example:
+        curl -X GET "http://localhost:8081/foglamp/export/TI?format=csv&from=2017-11-01"
+    """
+    asset_code = request.match_info.get('asset_code', '')
+    export_format = request.query.get('format', 'ndjson')
+    if export_format not in ('ndjson', 'csv'):
+        raise web.HTTPBadRequest(reason='format must be ndjson or csv')
+
+    conditions = []
+    for parameter, condition in (('from', '>='), ('to', '<')):
+        if parameter in request.query:
+            # The values are not escaped by the storage
+            if not __TIMESTAMP_RE.match(request.query[parameter]):
+                raise web.HTTPBadRequest(reason='{} must be a timestamp, e.g. 2017-11-01 10:00:00'.format(parameter))
+            conditions.append(["user_ts", condition, request.query[parameter]])
 
-    payload = json.dumps(d)
     _storage = connect.get_storage()
-    results = _storage.query_tbl_with_payload('readings', payload)
 
-    return web.json_response(results['rows'])
+    async def page(position=None):
+        return await _keyset_rows(_storage, request, asset_code, ["reading"], __EXPORT_PAGE_SIZE, position,
+                                  ascending=True, conditions=conditions)
+
+    # The first page is read before the response is started, to report the errors
+    rows = await page()
+
+    if export_format == 'csv':
+        datapoints = set(await _last_datapoints(_storage, asset_code))
+        datapoints.update(key for row in rows for key in row['reading'])
+        datapoints = sorted(datapoints)
+        encode = functools.partial(_csv_lines, datapoints)
+        content_type = 'text/csv'
+    else:
+        encode = _ndjson_lines
+        content_type = 'application/x-ndjson'
+    response = web.StreamResponse(headers={
+        'Content-Type': '{}; charset=utf-8'.format(content_type),
+        'Content-Disposition': 'attachment; filename="{}.{}"'.format(asset_code, export_format)})
+    await response.prepare(request)
+
+    if export_format == 'csv':
+        await response.write(_csv_text([['id', 'timestamp'] + datapoints + ['other_datapoints']]).encode())
+    while rows:
+        await response.write(encode(rows).encode())
+        if len(rows) < __EXPORT_PAGE_SIZE:
+            break
+        rows = await page((rows[-1][__CURSOR_TS], rows[-1][__CURSOR_ID]))
+
+    await response.write_eof()
+    return response
+
+
+async def _last_datapoints(storage, asset_code):
+    """ Returns the datapoints of the most recent reading of an asset, kept in the asset_summary table """
+    payload = PayloadBuilder().SELECT("last_reading").WHERE(["asset_code", "=", asset_code]).payload()
+    results = await SingleFlight.query_tbl_with_payload(storage, 'asset_summary', payload)
+    return list(results['rows'][0]['last_reading']) if results['rows'] else []
+
+
+def _ndjson_lines(rows):
+    return ''.join(json.dumps({"id": row[__CURSOR_ID], "timestamp": row[__CURSOR_TS], "reading": row['reading']}) + '\n'
+                   for row in rows)
+
+
+def _csv_lines(datapoints, rows):
+    lines = []
+    for row in rows:
+        values = [row['reading'].get(datapoint, '') for datapoint in datapoints]
+        others = {key: value for key, value in row['reading'].items() if key not in datapoints}
+        lines.append([row[__CURSOR_ID], row[__CURSOR_TS]] +
+                     [json.dumps(value) if isinstance(value, (dict, list)) else value for value in values] +
+                     [json.dumps(others, sort_keys=True) if others else ''])
+    return _csv_text(lines)
+
+
+def _csv_text(lines):
+    output = io.StringIO()
+    csv.writer(output, lineterminator='\n').writerows(lines)
+    return output.getvalue()
 
 
 async def asset_summary(request):
@@ -199,6 +314,24 @@ async def asset_summary(request):
     """
     asset_code = request.match_info.get('asset_code', '')
     reading = request.match_info.get('reading', '')
+    _storage = connect.get_storage()
+
+    window = _window_seconds(request)
+    span = await _rollup_span(_storage, window, list(__ROLLUP_TABLES)) if window else None
+    if span:
+        resolution, start, end = span
+        d = OrderedDict()
+        d['aggregate'] = _rollup_aggregates()
+        d.update(_rollup_where(asset_code, reading, start, end))
+        results = await SingleFlight.query_tbl_with_payload(_storage, __ROLLUP_TABLES[resolution], json.dumps(d))
+        rows = results['rows']
+        for _where in _edges_where(request, asset_code, start, end):
+            d = OrderedDict()
+            d['aggregate'] = _readings_aggregates(reading)
+            d.update(_where)
+            results = await SingleFlight.query_tbl_with_payload(_storage, 'readings', json.dumps(d))
+            rows += results['rows']
+        return web.json_response({reading: [_rollup_values(_merge_rollups(rows))]})
 
     # TODO: FOGL-643
     prop_dict = {"column": "reading", "properties": reading}
@@ -213,8 +346,7 @@ async def asset_summary(request):
     d.update(_and_where)
 
     payload = json.dumps(d)
-    _storage = connect.get_storage()
-    results = _storage.query_tbl_with_payload('readings', payload)
+    results = await SingleFlight.query_tbl_with_payload(_storage, 'readings', payload)
 
     return web.json_response({reading: results['rows']})
 
@@ -240,20 +372,55 @@ async def asset_averages(request):
     The amount of time covered by each returned value is set using the
     query parameter group. This may be set to seconds, minutes or hours
 
+    With the query parameter points=N the series has at most N values, whatever the length of the time
+    range: the readings are grouped by intervals of the same number of seconds, so that the peaks are
+    preserved by the min and max of every interval, and the group and limit parameters are ignored.
+
     Return the result of the query
     SELECT user_ts AVG((reading->>'reading')::float) FROM readings WHERE asset_code = 'asset_code' GROUP BY user_ts
     """
     asset_code = request.match_info.get('asset_code', '')
     reading = request.match_info.get('reading', '')
 
+    if 'points' in request.query:
+        return await _downsampled_series(request, asset_code, reading)
+
     ts_restraint = 'YYYY-MM-DD HH24:MI:SS'
+    resolution = None
     if 'group' in request.query:
         if request.query['group'] == 'seconds':
             ts_restraint = 'YYYY-MM-DD HH24:MI:SS'
         elif request.query['group'] == 'minutes':
             ts_restraint = 'YYYY-MM-DD HH24:MI'
+            resolution = 60
         elif request.query['group'] == 'hours':
             ts_restraint = 'YYYY-MM-DD HH24'
+            resolution = 3600
+    limit = int(request.query.get('limit')) if 'limit' in request.query else __DEFAULT_LIMIT
+
+    _storage = connect.get_storage()
+    span = await _rollup_span(_storage, _window_seconds(request), [resolution]) if resolution else None
+    if span:
+        # One row per minute or hour, the most recent first
+        _, start, end = span
+        d = OrderedDict()
+        d['return'] = [{"column": "bucket_ts", "format": ts_restraint, "alias": "timestamp"},
+                       "min", "max", "total", "readings"]
+        d.update(_rollup_where(asset_code, reading, start, end))
+        d['sort'] = {"column": "bucket_ts", "direction": "desc"}
+        d['limit'] = limit
+        results = await SingleFlight.query_tbl_with_payload(_storage, __ROLLUP_TABLES[resolution], json.dumps(d))
+        rows = results['rows']
+        for _where in _edges_where(request, asset_code, start, end):
+            d = OrderedDict()
+            d['aggregate'] = _readings_aggregates(reading)
+            d.update(_where)
+            d['group'] = {"column": "user_ts", "format": ts_restraint, "alias": "timestamp"}
+            d['limit'] = limit
+            results = await SingleFlight.query_tbl_with_payload(_storage, 'readings', json.dumps(d))
+            rows += results['rows']
+        rows = sorted(_merge_intervals(rows), key=lambda row: row['timestamp'], reverse=True)[:limit]
+        return web.json_response([_rollup_values(row) for row in rows])
 
     # TODO: FOGL-637, 640
     timestamp = {"column": "user_ts", "format": ts_restraint, "alias": "timestamp"}
@@ -272,18 +439,308 @@ async def asset_averages(request):
 
     # Add the group by and limit clause
     d['group'] = timestamp
-    limit = int(request.query.get('limit')) if 'limit' in request.query else __DEFAULT_LIMIT
     _limit_payload = PayloadBuilder(d).LIMIT(limit)
     d.update(_limit_payload.chain_payload())
 
     payload = json.dumps(d)
-    _storage = connect.get_storage()
-    results = _storage.query_tbl_with_payload('readings', payload)
+    results = await SingleFlight.query_tbl_with_payload(_storage, 'readings', payload)
 
     return web.json_response(results['rows'])
 
 
-def where_clause(request, where):
+async def _downsampled_series(request, asset_code, reading):
+    """ Returns the min, max and average of a sensor in at most points=N intervals of the same duration,
+    computed by the storage
+
+    SELECT MIN(..), MAX(..), AVG(..), to_timestamp(size * floor(extract(epoch from user_ts) / size))
+    FROM readings WHERE asset_code = 'asset_code' GROUP BY floor(extract(epoch from user_ts) / size)
+    """
+    try:
+        points = int(request.query['points'])
+    except ValueError:
+        raise web.HTTPBadRequest(reason='points must be an integer')
+    if not 2 <= points <= __MAX_POINTS:
+        raise web.HTTPBadRequest(reason='points must be between 2 and {}'.format(__MAX_POINTS))
+
+    _storage = connect.get_storage()
+    _where = PayloadBuilder().WHERE(["asset_code", "=", asset_code]).chain_payload()
+    _and_where = where_clause(request, _where)
+
+    window = duration = _window_seconds(request)
+    if not duration:
+        # All the readings, from the first one
+        d = OrderedDict()
+        d['aggregate'] = [{"operation": "min", "column": "user_ts", "alias": "first"},
+                          {"operation": "max", "column": "user_ts", "alias": "last"}]
+        d.update(_and_where)
+        results = await SingleFlight.query_tbl_with_payload(_storage, 'readings', json.dumps(d))
+        row = results['rows'][0] if results['rows'] else {}
+        if not row.get('first'):
+            return web.json_response([])
+        duration = _epoch(row['last']) - _epoch(row['first'])
+        # The rollups are kept after the readings are purged, they are limited to the time of the first reading
+        window = int(math.ceil(time.time() - _epoch(row['first'])))
+
+    # A range of duration seconds spans at most duration / size + 1 intervals
+    size = max(1, int(math.ceil(duration / (points - 1))))
+
+    resolutions = [seconds for seconds in __ROLLUP_TABLES if size >= seconds]
+    span = await _rollup_span(_storage, window, resolutions) if resolutions else None
+    if span:
+        # Intervals of whole minutes or hours, the readings of an interval at an edge of the span are merged
+        # with its rollups
+        resolution, start, end = span
+        size = int(math.ceil(size / resolution)) * resolution
+        timebucket = {"size": str(size), "format": 'YYYY-MM-DD HH24:MI:SS', "alias": "timestamp"}
+        d = OrderedDict()
+        d['aggregate'] = _rollup_aggregates()
+        d.update(_rollup_where(asset_code, reading, start, end))
+        d['timebucket'] = dict(timebucket, timestamp="bucket_ts")
+        results = await SingleFlight.query_tbl_with_payload(_storage, __ROLLUP_TABLES[resolution], json.dumps(d))
+        rows = results['rows']
+        for _where in _edges_where(request, asset_code, start, end):
+            d = OrderedDict()
+            d['aggregate'] = _readings_aggregates(reading)
+            d.update(_where)
+            d['timebucket'] = dict(timebucket, timestamp="user_ts")
+            results = await SingleFlight.query_tbl_with_payload(_storage, 'readings', json.dumps(d))
+            rows += results['rows']
+        return web.json_response(sorted((_rollup_values(row) for row in _merge_intervals(rows)),
+                                        key=lambda row: row['timestamp']))
+
+    prop_dict = {"column": "reading", "properties": reading}
+    d = OrderedDict()
+    d['aggregate'] = [{"operation": "min", "json": prop_dict, "alias": "min"},
+                      {"operation": "max", "json": prop_dict, "alias": "max"},
+                      {"operation": "avg", "json": prop_dict, "alias": "average"}]
+    d.update(_and_where)
+    d['timebucket'] = {"timestamp": "user_ts", "size": str(size), "format": 'YYYY-MM-DD HH24:MI:SS',
+                       "alias": "timestamp"}
+    results = await SingleFlight.query_tbl_with_payload(_storage, 'readings', json.dumps(d))
+
+    # The storage does not sort the groups
+    return web.json_response(sorted(results['rows'], key=lambda row: row['timestamp']))
+
+
+async def _rollup_span(storage, window, resolutions):
+    """ The coarsest of the resolutions with __ROLLUP_MIN_BUCKETS complete rollups within the last window seconds,
+    and the start and end of these rollups, None if the rollups are not used
+
+    A rollup is complete when its minute or hour ended before the last run of the rollup task, which must have
+    run recently. The readings out of the span, at the edges of the time limit and after the last run, are read
+    from the readings table. Without time limit, the start is None.
+    """
+    payload = PayloadBuilder().SELECT("ts").WHERE(["name", "=", "readings"]).\
+        AND_WHERE(["ts", "newer", __ROLLUP_MAX_AGE]).payload()
+    results = await SingleFlight.query_tbl_with_payload(storage, 'rollups', payload)
+    if not results['rows']:
+        return None
+    rolled_up = int(_epoch(results['rows'][0]['ts']))
+    for resolution in resolutions:
+        end = rolled_up - rolled_up % resolution
+        if not window:
+            return resolution, None, end
+        start = int(math.ceil((time.time() - window) / resolution)) * resolution
+        if end - start >= __ROLLUP_MIN_BUCKETS * resolution:
+            return resolution, start, end
+    return None
+
+
+def _rollup_aggregates():
+    return [{"operation": "min", "column": "min", "alias": "min"},
+            {"operation": "max", "column": "max", "alias": "max"},
+            {"operation": "sum", "column": "total", "alias": "total"},
+            {"operation": "sum", "column": "readings", "alias": "readings"}]
+
+
+def _readings_aggregates(reading):
+    """ The aggregates of the readings of a sensor, named as the columns of the rollups """
+    prop_dict = {"column": "reading", "properties": reading}
+    return [{"operation": "min", "json": prop_dict, "alias": "min"},
+            {"operation": "max", "json": prop_dict, "alias": "max"},
+            {"operation": "sum", "json": prop_dict, "alias": "total"},
+            {"operation": "count", "json": prop_dict, "alias": "readings"}]
+
+
+def _rollup_where(asset_code, reading, start, end):
+    _where = PayloadBuilder().WHERE(["asset_code", "=", asset_code]).AND_WHERE(["datapoint", "=", reading])
+    if start is not None:
+        _where = _where.AND_WHERE(["bucket_ts", ">=", _utc_timestamp(start)])
+    return _where.AND_WHERE(["bucket_ts", "<", _utc_timestamp(end)]).chain_payload()
+
+
+def _edges_where(request, asset_code, start, end):
+    """ The conditions on the readings of the time limit of the request that are before start or from end """
+    edges = []
+    if start is not None:
+        _where = PayloadBuilder().WHERE(["asset_code", "=", asset_code]).\
+            AND_WHERE(["user_ts", "<", _utc_timestamp(start)]).chain_payload()
+        edges.append(where_clause(request, _where))
+    _where = PayloadBuilder().WHERE(["asset_code", "=", asset_code]).\
+        AND_WHERE(["user_ts", ">=", _utc_timestamp(end)]).chain_payload()
+    edges.append(where_clause(request, _where))
+    return edges
+
+
+def _merge_rollups(rows):
+    """ The min, max, total and number of readings of rows of rollups and readings of the same interval """
+    rows = [row for row in rows if row['readings'] not in ('', None) and float(row['readings'])]
+    merged = OrderedDict()
+    if rows and 'timestamp' in rows[0]:
+        merged['timestamp'] = rows[0]['timestamp']
+    # The values are returned as they are by the storage
+    merged['min'] = min((row['min'] for row in rows), key=float) if rows else ''
+    merged['max'] = max((row['max'] for row in rows), key=float) if rows else ''
+    merged['total'] = sum(float(row['total']) for row in rows)
+    merged['readings'] = sum(float(row['readings']) for row in rows)
+    return merged
+
+
+def _merge_intervals(rows):
+    """ The rows of rollups and readings merged per timestamp """
+    intervals = OrderedDict()
+    for row in rows:
+        intervals.setdefault(row['timestamp'], []).append(row)
+    merged = [_merge_rollups(interval) for interval in intervals.values()]
+    return [row for row in merged if row['readings']]
+
+
+def _rollup_values(row):
+    """ The min, max and average of a row of rollups, as returned for the readings """
+    values = OrderedDict()
+    if 'timestamp' in row:
+        values['timestamp'] = row['timestamp']
+    readings = float(row['readings']) if row['readings'] not in ('', None) else 0
+    values['min'] = row['min']
+    values['max'] = row['max']
+    values['average'] = str(float(row['total']) / readings) if readings else ''
+    return values
+
+
+def _utc_timestamp(epoch):
+    return time.strftime('%Y-%m-%d %H:%M:%S+00', time.gmtime(epoch))
+
+
+def _epoch(timestamp):
+    """ Seconds since the epoch of a timestamp returned by the storage, e.g. 2017-11-01 10:00:00.123456+05:30 """
+    match = re.match(r'^(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})(\.\d+)?(([+-])(\d{2}):?(\d{2})?)?$', timestamp)
+    if match is None:
+        raise ValueError('Invalid timestamp {}'.format(timestamp))
+    date_time, fraction, zone, sign, hours, minutes = match.groups()
+    seconds = calendar.timegm(datetime.datetime.strptime(date_time, '%Y-%m-%d %H:%M:%S').timetuple())
+    if fraction:
+        seconds += float(fraction)
+    if zone:
+        offset = int(hours) * 3600 + int(minutes or 0) * 60
+        seconds -= offset if sign == '+' else -offset
+    return seconds
+
+
+async def _readings_page(request, asset_code, returned):
+    """ Returns a page of the readings of an asset, the most recent first
+
+    The page starts after the position of the cursor given by the query parameter after, or ends
+    before the one given by before, so that every page costs the same whatever its depth and the
+    readings inserted meanwhile do not shift the pages. The cursors of the next and previous pages
+    are returned in the Link header, e.g. Link: </foglamp/asset/TI?limit=20&after=WyIyMDE3LTEx...>; rel="next"
+    """
+    limit = int(request.query.get('limit')) if 'limit' in request.query else __DEFAULT_LIMIT
+    offset = int(request.query.get('skip')) if 'skip' in request.query else __DEFAULT_OFFSET
+    after = request.query.get('after')
+    before = request.query.get('before')
+    if after and before:
+        raise web.HTTPBadRequest(reason='after and before can not be combined')
+    if (after or before) and offset:
+        raise web.HTTPBadRequest(reason='skip can not be combined with after or before')
+
+    _storage = connect.get_storage()
+    if after or before:
+        position = _parse_cursor(after or before)
+        rows = await _keyset_rows(_storage, request, asset_code, returned, limit, position, ascending=bool(before))
+        if before:
+            rows = rows[::-1]
+    else:
+        rows = await _keyset_rows(_storage, request, asset_code, returned, limit, offset=offset)
+
+    links = []
+    if rows and (len(rows) == limit or before):
+        links.append(_link(request, 'after', rows[-1], 'next'))
+    if rows and (after or (before and len(rows) == limit)):
+        links.append(_link(request, 'before', rows[0], 'prev'))
+
+    # The rows are shared with the identical requests in flight, they are not modified
+    readings = [{key: value for key, value in row.items() if key not in (__CURSOR_TS, __CURSOR_ID)} for row in rows]
+    headers = {'Link': ', '.join(links)} if links else None
+    return web.json_response(readings, headers=headers)
+
+
+async def _keyset_rows(storage, request, asset_code, returned, limit, position=None, ascending=False,
+                       conditions=(), offset=0):
+    """ Returns the rows of the readings of an asset following position, a (user_ts, id) pair,
+    the most recent first or, if ascending, the oldest first """
+    condition, direction = ('>', 'asc') if ascending else ('<', 'desc')
+
+    async def query(query_conditions, sort, query_limit, query_offset=0):
+        payload = _readings_payload(request, asset_code, returned, list(conditions) + query_conditions, sort,
+                                    query_limit, query_offset)
+        results = await SingleFlight.query_tbl_with_payload(storage, 'readings', payload)
+        return results['rows']
+
+    if position is None:
+        return await query([], [["user_ts", direction], ["id", direction]], limit, offset)
+
+    user_ts, reading_id = position
+    # The storage does not compare (user_ts, id) pairs: the readings with the timestamp of
+    # the position are read first, then the older (or more recent) ones
+    rows = await query([["user_ts", "=", user_ts], ["id", condition, str(reading_id)]], [["id", direction]], limit)
+    if len(rows) < limit:
+        rows = rows + await query([["user_ts", condition, user_ts]],
+                                  [["user_ts", direction], ["id", direction]], limit - len(rows))
+    return rows
+
+
+def _readings_payload(request, asset_code, returned, conditions, sort, limit, offset):
+    d = OrderedDict()
+    d['return'] = returned + [{"column": "user_ts", "alias": __CURSOR_TS}, {"column": "id", "alias": __CURSOR_ID}]
+    _where = PayloadBuilder().WHERE(["asset_code", "=", asset_code]).chain_payload()
+    _and_where = where_clause(request, _where)
+    if conditions:
+        PayloadBuilder(_and_where).AND_WHERE(*conditions)
+    d.update(_and_where)
+
+    # Add the order by and limit clause
+    PayloadBuilder(d).ORDER_BY(*sort).LIMIT(limit)
+    if offset:
+        PayloadBuilder(d).SKIP(offset)
+
+    return json.dumps(d)
+
+
+def _cursor(row):
+    """ Opaque cursor of the position of a reading: its timestamp, with the microseconds, and its id """
+    return base64.urlsafe_b64encode(json.dumps([row[__CURSOR_TS], row[__CURSOR_ID]]).encode()).decode()
+
+
+def _parse_cursor(cursor):
+    try:
+        user_ts, reading_id = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+        # The values are not escaped by the storage
+        if not __TIMESTAMP_RE.match(user_ts):
+            raise ValueError(user_ts)
+        return user_ts, int(reading_id)
+    except (ValueError, TypeError):
+        raise web.HTTPBadRequest(reason='Invalid cursor {}'.format(cursor))
+
+
+def _link(request, parameter, row, rel):
+    query = OrderedDict((key, value) for key, value in request.query.items() if key not in ('after', 'before', 'skip'))
+    query[parameter] = _cursor(row)
+    return '<{}>; rel="{}"'.format(request.rel_url.with_query(query), rel)
+
+
+def _window_seconds(request):
+    """ The number of seconds of the most recent readings selected by the seconds, minutes or
+    hours query parameter, 0 if they are not limited """
     val = 0
     if 'seconds' in request.query:
         val = int(request.query['seconds'])
@@ -291,6 +748,11 @@ def where_clause(request, where):
         val = int(request.query['minutes']) * 60
     elif 'hours' in request.query:
         val = int(request.query['hours']) * 60 * 60
+    return val
+
+
+def where_clause(request, where):
+    val = _window_seconds(request)
 
     if val == 0:
         return where
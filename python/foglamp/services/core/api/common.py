@@ -7,6 +7,8 @@
 import time
 from aiohttp import web
 
+from foglamp.services.core.single_flight import SingleFlight
+
 __author__ = "Amarendra K. Sinha, Ashish Jabble"
 __copyright__ = "Copyright (c) 2017 OSIsoft, LLC"
 __license__ = "Apache 2.0"
@@ -30,6 +32,8 @@ async def ping(request):
     Returns:
             basic health information json payload
             {'uptime': 32892} Time in seconds since FogLAMP started
+            {'storageQueries': {'executed': 120, 'coalesced': 45, 'inFlight': 1}} Storage queries of the REST API,
+            coalesced is the number of queries that shared the result of an identical one in flight
 
     :Example:
             curl -X GET http://localhost:8081/foglamp/ping
@@ -37,4 +41,4 @@ async def ping(request):
     since_started = time.time() - __start_time
 
     # TODO: FOGL-790 - ping method should return more data
-    return web.json_response({'uptime': since_started})
+    return web.json_response({'uptime': since_started, 'storageQueries': SingleFlight.stats()})
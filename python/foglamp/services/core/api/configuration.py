@@ -6,6 +6,7 @@
 
 from aiohttp import web
 from foglamp.services.core import connect
+from foglamp.services.core.response_cache import ResponseCache
 from foglamp.common.configuration_manager import ConfigurationManager
 
 __author__ = "Amarendra K. Sinha, Ashish Jabble"
@@ -124,6 +125,7 @@ async def set_configuration_item(request):
     try:
         value = data['value']
         await cf_mgr.set_category_item_value_entry(category_name, config_item, value)
+        ResponseCache.invalidate('/foglamp/categories', '/foglamp/category/{}'.format(category_name))
         result = await cf_mgr.get_category_item(category_name, config_item)
 
         if result is None:
@@ -159,6 +161,7 @@ async def delete_configuration_item_value(request):
     # TODO: make it optimized and elegant
     cf_mgr = ConfigurationManager(connect.get_storage())
     await cf_mgr.set_category_item_value_entry(category_name, config_item, '')
+    ResponseCache.invalidate('/foglamp/categories', '/foglamp/category/{}'.format(category_name))
     result = await cf_mgr.get_category_item(category_name, config_item)
 
     if result is None:
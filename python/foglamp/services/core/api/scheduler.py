@@ -12,6 +12,7 @@ from foglamp.services.core import server
 from foglamp.services.core.scheduler.entities import Schedule, StartUpSchedule, TimedSchedule, IntervalSchedule, ManualSchedule, Task
 from foglamp.services.core.scheduler.exceptions import TaskNotFoundError, ScheduleNotFoundError
 from foglamp.services.core import connect
+from foglamp.services.core.response_cache import ResponseCache
 from foglamp.common.storage_client.payload_builder import PayloadBuilder
 
 __author__ = "Amarendra K. Sinha"
@@ -28,10 +29,13 @@ _help = """
     | GET POST        | /foglamp/schedule                                         |
     | GET PUT DELETE  | /foglamp/schedule/{schedule_id}                           |
     | POST            | /foglamp/schedule/start/{schedule_id}                     |
+    | POST            | /foglamp/schedule/reload                                  |
     | GET             | /foglamp/schedule/type                                    |
     
     | GET             | /foglamp/task                                             |
     | GET             | /foglamp/task/latest                                      |
+    | GET             | /foglamp/task/summary                                     |
+    | GET             | /foglamp/task/deferred                                    |
     | GET PUT         | /foglamp/task/{task_id}                                   |
     | GET             | /foglamp/task/state                                       |
     | PUT             | /foglamp/task/cancel/{task_id}                            |
@@ -226,6 +230,8 @@ async def _execute_add_update_schedule(data, curr_value=None):
 
     # Save schedule
     await server.Server.scheduler.save_schedule(schedule)
+    # The statistics history reports the interval of the schedule of the statistics collector
+    ResponseCache.invalidate('/foglamp/statistics/history')
 
     updated_schedule_id = schedule.schedule_id
 
@@ -319,6 +325,19 @@ async def start_schedule(request):
         raise web.HTTPNotFound(reason=str(ex))
 
 
+async def reload_schedules(request):
+    """
+    Applies the changes made to the schedules table by other means than this API, e.g. by a plugin installation
+
+    :Example: curl -X POST  http://localhost:8082/foglamp/schedule/reload
+    """
+
+    await server.Server.scheduler.reload_schedules()
+    ResponseCache.invalidate('/foglamp/statistics/history')
+
+    return web.json_response({'message': 'Schedules reloaded successfully'})
+
+
 async def post_schedule(request):
     """
     Create a new schedule in schedules table
@@ -432,6 +451,7 @@ async def delete_schedule(request):
             raise web.HTTPNotFound(reason="Invalid Schedule ID {}".format(schedule_id))
 
         await server.Server.scheduler.delete_schedule(uuid.UUID(schedule_id))
+        ResponseCache.invalidate('/foglamp/statistics/history')
 
         return web.json_response({'message': 'Schedule deleted successfully', 'id': schedule_id})
     except (ValueError, ScheduleNotFoundError) as ex:
@@ -489,7 +509,8 @@ async def get_task(request):
             'startTime': str(tsk.start_time),
             'endTime': str(tsk.end_time),
             'exitCode': tsk.exit_code,
-            'reason': tsk.reason
+            'reason': tsk.reason,
+            'resources': _task_resources(tsk)
         }
 
         return web.json_response(task)
@@ -497,6 +518,17 @@ async def get_task(request):
         raise web.HTTPNotFound(reason=str(ex))
 
 
+def _task_resources(task):
+    """Resources used by a task, None when they are not known"""
+    if task.cpu_time is None:
+        return None
+    return {'cpuTime': task.cpu_time,
+            'maxRss': task.max_rss,
+            'readBytes': task.read_bytes,
+            'writeBytes': task.write_bytes,
+            'contextSwitches': task.context_switches}
+
+
 async def get_tasks(request):
     """
     Returns the list of tasks
@@ -551,7 +583,8 @@ async def get_tasks(request):
                  'startTime': str(task.start_time),
                  'endTime': str(task.end_time),
                  'exitCode': task.exit_code,
-                 'reason': task.reason
+                 'reason': task.reason,
+                 'resources': _task_resources(task)
                  }
             )
 
@@ -609,6 +642,61 @@ async def get_tasks_latest(request):
         raise web.HTTPNotFound(reason=str(ex))
 
 
+async def get_tasks_summary(request):
+    """
+    Returns the resources used by the tasks that terminated, per process name
+
+    :Example: curl -X GET  http://localhost:8082/foglamp/task/summary
+    :Example: curl -X GET  http://localhost:8082/foglamp/task/summary?name=xxx
+    """
+
+    name = request.query.get('name') if 'name' in request.query else None
+    where_clause = ["process_name", "=", name] if name else None
+
+    summary = await server.Server.scheduler.get_tasks_summary(where=where_clause)
+
+    processes = []
+    for process in summary:
+        processes.append(
+            {'name': process['process_name'],
+             'tasks': process['tasks'],
+             'cpuTime': process['cpu_time'],
+             'averageCpuTime': process['avg_cpu_time'],
+             'maxRss': process['max_rss'],
+             'readBytes': process['read_bytes'],
+             'writeBytes': process['write_bytes'],
+             'contextSwitches': process['context_switches']
+             }
+        )
+
+    return web.json_response({'processes': processes})
+
+
+async def get_tasks_deferred(request):
+    """
+    Returns the tasks due to start that the scheduler has deferred, as their process is limited
+    or excluded by running tasks, or as the system is too loaded
+
+    :Example: curl -X GET  http://localhost:8082/foglamp/task/deferred
+    """
+
+    deferred_tasks = await server.Server.scheduler.get_deferred_tasks()
+
+    tasks = []
+    for task in deferred_tasks:
+        tasks.append(
+            {'scheduleId': str(task['schedule_id']),
+             'scheduleName': task['schedule_name'],
+             'name': task['process_name'],
+             'state': 'Deferred',
+             'deferredSince': str(task['since']),
+             'reason': task['reason']
+             }
+        )
+
+    return web.json_response({'tasks': tasks})
+
+
 async def cancel_task(request):
     """Cancel a running task from tasks table
 
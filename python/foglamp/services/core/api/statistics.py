@@ -4,10 +4,20 @@
 # See: http://foglamp.readthedocs.io/
 # FOGLAMP_END
 
+import asyncio
+import calendar
+import datetime
+import json
+import math
+import re
+import time
+from collections import OrderedDict
+
 from aiohttp import web
 
 from foglamp.common.storage_client.payload_builder import PayloadBuilder
 from foglamp.services.core import connect
+from foglamp.services.core.single_flight import SingleFlight
 
 
 __author__ = "Amarendra K. Sinha, Ashish Jabble"
@@ -24,6 +34,11 @@ _help = """
 """
 
 
+_HISTORY_TS_FORMAT = 'YYYY-MM-DD HH24:MI:SS'
+_TIMESTAMP_RE = re.compile(r'^\d{4}-\d{2}-\d{2}([ T]\d{2}:\d{2}(:\d{2}(\.\d{1,6})?)?)?([+-]\d{2}(:?\d{2})?|Z)?$')
+_KEY_RE = re.compile(r'^\w+$')
+
+
 #################################
 #  Statistics
 #################################
@@ -42,7 +57,7 @@ async def get_statistics(request):
     """
     payload = PayloadBuilder().SELECT(("key", "description", "value")).ORDER_BY(["key"]).payload()
     storage_client = connect.get_storage()
-    results = storage_client.query_tbl_with_payload('statistics', payload)
+    results = await SingleFlight.query_tbl_with_payload(storage_client, 'statistics', payload)
 
     return web.json_response(results['rows'])
 
@@ -53,66 +68,135 @@ async def get_statistics_history(request):
         request:
 
     Returns:
-            a list of general set of statistics
+            a list of general set of statistics, one per run of the statistics collector, the oldest first
+
+    The sets can be selected with the query parameters:
+        limit=N     the N most recent sets only, the N last intervals before to when interval and to are given
+        from=ts     the sets from the timestamp ts, e.g. 2017-11-01 10:00:00
+        to=ts       the sets before the timestamp ts
+        keys=k1,k2  the statistics k1 and k2 only
+        interval=N  the statistics summed by intervals of N seconds, one set per interval
 
     :Example:
             curl -X GET http://localhost:8081/foglamp/statistics/history?limit=1
+            curl -X GET "http://localhost:8081/foglamp/statistics/history?from=2017-11-01&keys=READINGS,PURGED&interval=3600"
     """
     storage_client = connect.get_storage()
-    payload = PayloadBuilder().SELECT(("history_ts", "key", "value")).payload()
 
+    limit = None
     if 'limit' in request.query:
-        if request.query.get('limit').isdigit():
-            limit = int(request.query.get('limit'))
-            # FIXME: Hack straight away multiply the LIMIT by the group count
-            # i.e. there are 8 records per distinct (stats_key), so if limit supplied is 2
-            # then internally, we should calculate LIMIT *8
-            # TODO: FOGL-663 Need support for "subquery" from storage service
-            # Remove python side handling date_trunc and use
-            # SELECT date_trunc('second', history_ts::timestamptz)::varchar as history_ts
-
-            payload = PayloadBuilder().AGGREGATE(["count", "*"]).payload()
-            result = storage_client.query_tbl_with_payload("statistics", payload)
-            key_count = result['rows'][0]['count_*']
-
-            payload = PayloadBuilder().SELECT(("history_ts", "key", "value")).LIMIT(limit * key_count).payload()
-        else:
+        if not request.query.get('limit').isdigit():
             raise web.HTTPBadRequest(reason="limit must be an integer")
-
-    result_from_storage = storage_client.query_tbl_with_payload('statistics_history', payload)
-
-    result_without_microseconds = []
-    for row in result_from_storage['rows']:
-        # Remove microseconds
-        new_dict = {'history_ts': row['history_ts'][:-13], row['key']: row['value']}
-        result_without_microseconds.append(new_dict)
-
-    # sorted on history_ts
-    sorted_result = sorted(result_without_microseconds, key=lambda k: k['history_ts'])
-
-    results = []
-    temp_dict = {}
-    previous_ts = None
-    for row in sorted_result:
-        # first time or when history_ts changes
-        if previous_ts is None or previous_ts != row['history_ts']:
-            if previous_ts is not None:
-                results.append(temp_dict)
-            previous_ts = row['history_ts']
-            temp_dict = {'history_ts': previous_ts}
-
-        # Append statistics key to temp dict
-        for key, value in row.items():
-            temp_dict.update({key: value})
-
-    # Append the last set of records which do not get appended above
-    results.append(temp_dict)
-
+        limit = int(request.query.get('limit'))
+
+    interval = None
+    if 'interval' in request.query:
+        if not request.query.get('interval').isdigit() or int(request.query.get('interval')) == 0:
+            raise web.HTTPBadRequest(reason="interval must be a positive integer")
+        interval = int(request.query.get('interval'))
+
+    # The values are not escaped by the storage
+    conditions = []
+    for parameter, condition in (('from', '>='), ('to', '<')):
+        if parameter in request.query:
+            if not _TIMESTAMP_RE.match(request.query[parameter]):
+                raise web.HTTPBadRequest(reason='{} must be a timestamp, e.g. 2017-11-01 10:00:00'.format(parameter))
+            conditions.append(['history_ts', condition, request.query[parameter]])
+    keys = [key for key in request.query.get('keys', '').split(',') if key]
+    if not all(_KEY_RE.match(key) for key in keys):
+        raise web.HTTPBadRequest(reason="keys must be a comma separated list of statistics keys")
+
+    if limit == 0:
+        return web.json_response({"interval": interval or await _collector_interval(storage_client),
+                                  'statistics': []})
+    if limit is not None:
+        if interval and 'to' in request.query:
+            # The last intervals before to, rather than before now
+            conditions.append(['history_ts', '>=', _intervals_start(request.query['to'], interval, limit)])
+        elif interval:
+            conditions.append(['history_ts', 'newer', limit * interval])
+        else:
+            # All the statistics of a run of the collector have the same history_ts, the
+            # timestamps of the last runs give the start of the range
+            builder = PayloadBuilder().DISTINCT(["history_ts"])
+            _where(builder, conditions + ([['key', '=', keys[0]]] if keys else []))
+            payload = builder.ORDER_BY(["history_ts", "desc"]).LIMIT(limit).payload()
+            result = await SingleFlight.query_tbl_with_payload(storage_client, 'statistics_history', payload)
+            if not result['rows']:
+                return web.json_response({"interval": await _collector_interval(storage_client), 'statistics': []})
+            conditions.append(['history_ts', '>=', result['rows'][-1]['history_ts']])
+
+    # One query per key, on the range of the primary key (key, history_ts)
+    queries = [_history_rows(storage_client, [['key', '=', key]] + conditions, interval) for key in keys] or \
+              [_history_rows(storage_client, conditions, interval)]
+    if not interval:
+        queries.append(_collector_interval(storage_client))
+    results = await asyncio.gather(*queries)
+    if not interval:
+        interval = results.pop()
+
+    # Pivot the rows, one set per timestamp
+    sets = dict()
+    for rows in results:
+        for row in rows:
+            history_set = sets.get(row['history_ts'])
+            if history_set is None:
+                history_set = sets[row['history_ts']] = {'history_ts': row['history_ts']}
+            # The sums are returned as strings
+            history_set[row['key']] = int(row['value'])
+    statistics = [sets[history_ts] for history_ts in sorted(sets)]
+    if limit is not None:
+        # The first interval of the range can be partial
+        statistics = statistics[-limit:]
+
+    return web.json_response({"interval": interval, 'statistics': statistics})
+
+
+def _intervals_start(to, interval, limit):
+    """ The start of the limit intervals of seconds that end with the one including to, a timestamp
+    matching _TIMESTAMP_RE, in the time zone of to """
+    zone = _TIMESTAMP_RE.match(to).group(4) or ''
+    date_time, _, fraction = to[:len(to) - len(zone)].replace('T', ' ').partition('.')
+    date_time_format = {10: '%Y-%m-%d', 16: '%Y-%m-%d %H:%M', 19: '%Y-%m-%d %H:%M:%S'}[len(date_time)]
+    epoch = calendar.timegm(datetime.datetime.strptime(date_time, date_time_format).timetuple())
+    if fraction:
+        epoch += float('.' + fraction)
+    start = (math.ceil(epoch / interval) - limit) * interval
+    return time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(start)) + zone
+
+
+def _where(builder, conditions):
+    for index, condition in enumerate(conditions):
+        if index:
+            builder.AND_WHERE(condition)
+        else:
+            builder.WHERE(condition)
+    return builder
+
+
+async def _history_rows(storage_client, conditions, interval):
+    """ The statistics history, with the timestamps truncated to the second or summed by intervals of seconds """
+    d = OrderedDict()
+    if interval:
+        # SELECT sum(value), key, to_char(to_timestamp(interval * floor(extract(epoch from history_ts) / interval)), ..)
+        # FROM statistics_history .. GROUP BY key, floor(extract(epoch from history_ts) / interval)
+        d['aggregate'] = {"operation": "sum", "column": "value", "alias": "value"}
+        d.update(_where(PayloadBuilder(), conditions).chain_payload())
+        d['group'] = "key"
+        d['timebucket'] = {"timestamp": "history_ts", "size": str(interval), "format": _HISTORY_TS_FORMAT,
+                           "alias": "history_ts"}
+    else:
+        d['return'] = [{"column": "history_ts", "format": _HISTORY_TS_FORMAT, "alias": "history_ts"}, "key", "value"]
+        d.update(_where(PayloadBuilder(), conditions).chain_payload())
+    result = await SingleFlight.query_tbl_with_payload(storage_client, 'statistics_history', json.dumps(d))
+    return result['rows']
+
+
+async def _collector_interval(storage_client):
+    """ The interval of the schedule of the statistics collector, in seconds """
     # SELECT schedule_interval FROM schedules WHERE process_name='stats collector'
     payload = PayloadBuilder().SELECT("schedule_interval").WHERE(['process_name', '=', 'stats collector']).payload()
-    result = storage_client.query_tbl_with_payload('schedules', payload)
+    result = await SingleFlight.query_tbl_with_payload(storage_client, 'schedules', payload)
     time_str = result['rows'][0]['schedule_interval']
     ftr = [3600, 60, 1]
-    interval_in_secs = sum([a * b for a, b in zip(ftr, map(int, time_str.split(':')))])
-
-    return web.json_response({"interval": interval_in_secs, 'statistics': results})
+    return sum([a * b for a, b in zip(ftr, map(int, time_str.split(':')))])
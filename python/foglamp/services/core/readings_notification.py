@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+
+# FOGLAMP_BEGIN
+# See: http://foglamp.readthedocs.io/
+# FOGLAMP_END
+
+"""Readings notification class
+
+Tracks the readings appended to the storage by the south microservices, so that an idle
+north sending process can wait for new readings (long-poll) instead of polling the storage.
+"""
+
+import asyncio
+
+from foglamp.common import logger
+
+__copyright__ = "Copyright (c) 2017 OSIsoft, LLC"
+__license__ = "Apache 2.0"
+__version__ = "${VERSION}"
+
+
+class ReadingsNotification:
+
+    _generation = 0
+    """ Incremented every time new readings are notified """
+
+    _readings = 0
+    """ Number of readings notified since the start of the core """
+
+    _new_readings = None  # type: asyncio.Event
+    """ Fired, and replaced, every time new readings are notified """
+
+    # INFO - level 20
+    _logger = logger.setup(__name__, level=20)
+
+    @classmethod
+    def _event(cls):
+        if cls._new_readings is None:
+            cls._new_readings = asyncio.Event()
+        return cls._new_readings
+
+    @classmethod
+    def notify(cls, readings):
+        """ Notifies that new readings are available into the storage and wakes up all the waiters
+
+        :param readings: number of readings appended
+        :return: the current generation
+        """
+        cls._readings += readings
+        # The cached responses of the asset browser are not evicted, the south microservices notify
+        # every batch of readings, these responses expire after a few seconds instead
+        cls._generation += 1
+        event = cls._event()
+        cls._new_readings = asyncio.Event()
+        event.set()
+        return cls._generation
+
+    @classmethod
+    async def wait(cls, generation=None, timeout=5):
+        """ Waits for new readings
+
+        :param generation: generation already handled by the caller, it returns immediately if
+                           new readings were notified after it; None waits for the next notification
+        :param timeout: maximum time, in seconds, to wait; 0 returns the current generation
+        :return: the current generation and the number of readings notified
+        """
+        if timeout > 0 and (generation is None or generation == cls._generation):
+            try:
+                await asyncio.wait_for(cls._event().wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return cls._generation, cls._readings
@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+
+# FOGLAMP_BEGIN
+# See: http://foglamp.readthedocs.io/
+# FOGLAMP_END
+
+"""Response cache of the read-mostly endpoints of the REST API
+
+The dashboards poll the same endpoints, e.g. /foglamp/statistics, every few seconds from
+many browser tabs. The successful responses to GET requests of the routes in
+:attr:`ResponseCache.ROUTE_TTLS` are kept for the time to live of the route, so that only
+the first request in that time reaches the storage. Every cached response carries an ETag,
+a client sending it back in If-None-Match receives 304 Not Modified without the body.
+
+The API handlers that change the data call :meth:`ResponseCache.invalidate` to evict the
+related responses, a client that must not receive a cached response sends
+"Cache-Control: no-cache". The responses of the asset browser are not evicted when new
+readings are appended, which happens for every batch of the south microservices, they
+expire after the short time to live of their route.
+"""
+
+import collections
+import hashlib
+import time
+
+from aiohttp import web
+
+from foglamp.common import logger
+
+__copyright__ = "Copyright (c) 2017 OSIsoft, LLC"
+__license__ = "Apache 2.0"
+__version__ = "${VERSION}"
+
+
+_CacheEntry = collections.namedtuple('_CacheEntry', 'body content_type charset headers etag expires')
+
+_CACHED_HEADERS = ('Link',)
+""" Headers of the responses kept with their body, e.g. the cursors of the pages of readings """
+
+
+class ResponseCache:
+
+    ROUTE_TTLS = collections.OrderedDict([
+        ('/foglamp/statistics/history', 5),
+        ('/foglamp/statistics', 5),
+        ('/foglamp/asset', 5),
+        ('/foglamp/audit/logcode', 300),
+        ('/foglamp/audit/severity', 300),
+        ('/foglamp/categories', 30),
+        ('/foglamp/category', 30),
+    ])
+    """ Path, or path prefix, of the cached routes to the time to live of their responses, in seconds.
+    The first path matching the request is used. """
+
+    MAX_ENTRIES = 256
+    """ Maximum number of cached responses, the least recently used one is evicted first """
+
+    _entries = collections.OrderedDict()
+    """ Path and query string of the request to its _CacheEntry, least recently used first """
+
+    _generation = 0
+    """ Incremented by invalidate(), a response computed during an invalidation is not cached """
+
+    hits = 0
+    """ Number of requests served from the cache, including the 304 responses """
+
+    misses = 0
+    """ Number of requests of the cached routes that reached the handler """
+
+    # INFO - level 20
+    _logger = logger.setup(__name__, level=20)
+
+    @classmethod
+    def ttl(cls, path):
+        """ Returns the time to live of the responses to path, None if they are not cached """
+        for route, ttl in cls.ROUTE_TTLS.items():
+            if path == route or path.startswith(route + '/'):
+                return ttl
+        return None
+
+    @classmethod
+    def get(cls, key):
+        """ Returns the _CacheEntry of key, None if it is not cached or it is expired """
+        entry = cls._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires <= time.time():
+            del cls._entries[key]
+            return None
+        cls._entries.move_to_end(key)
+        return entry
+
+    @classmethod
+    def put(cls, key, body, content_type, charset, ttl, generation=None, headers=None):
+        """ Caches a response body for ttl seconds and returns its _CacheEntry
+
+        :param generation: the value of generation() before the response was computed, the
+                           response is not cached if invalidate() has been called since then
+        """
+        entry = _CacheEntry(body=body, content_type=content_type, charset=charset, headers=headers or {},
+                            etag='"{}"'.format(hashlib.sha1(body).hexdigest()), expires=time.time() + ttl)
+        if generation is not None and generation != cls._generation:
+            return entry
+        cls._entries[key] = entry
+        cls._entries.move_to_end(key)
+        while len(cls._entries) > cls.MAX_ENTRIES:
+            cls._entries.popitem(last=False)
+        return entry
+
+    @classmethod
+    def generation(cls):
+        return cls._generation
+
+    @classmethod
+    def invalidate(cls, *prefixes):
+        """ Evicts the responses to the paths starting with one of prefixes, all the responses if none is given """
+        cls._generation += 1
+        if not prefixes:
+            cls._entries.clear()
+            return
+        for key in [key for key in cls._entries if key.startswith(prefixes)]:
+            del cls._entries[key]
+
+    @classmethod
+    def clear(cls):
+        cls.invalidate()
+        cls.hits = 0
+        cls.misses = 0
+
+
+def _response(entry, request):
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match is not None and entry.etag in [tag.strip() for tag in if_none_match.split(',')]:
+        return web.Response(status=304, headers={'ETag': entry.etag, 'Cache-Control': 'no-cache'})
+    response = web.Response(body=entry.body, content_type=entry.content_type, charset=entry.charset,
+                            headers=entry.headers)
+    # The clients revalidate with the ETag, the responses are evicted on the server side
+    response.headers['ETag'] = entry.etag
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+async def cache_middleware(app, handler):
+    async def middleware_handler(request):
+        if request.method != 'GET':
+            return await handler(request)
+        ttl = ResponseCache.ttl(request.path)
+        if ttl is None:
+            return await handler(request)
+
+        key = request.path_qs
+        if 'no-cache' not in request.headers.get('Cache-Control', ''):
+            entry = ResponseCache.get(key)
+            if entry is not None:
+                ResponseCache.hits += 1
+                return _response(entry, request)
+
+        ResponseCache.misses += 1
+        generation = ResponseCache.generation()
+        response = await handler(request)
+        # Only complete responses, the error ones are not cached
+        if response.status != 200 or not isinstance(response, web.Response) or not isinstance(response.body, bytes):
+            return response
+        headers = {name: response.headers[name] for name in _CACHED_HEADERS if name in response.headers}
+        entry = ResponseCache.put(key, response.body, response.content_type, response.charset, ttl, generation,
+                                  headers)
+        return _response(entry, request)
+
+    return middleware_handler
@@ -39,6 +39,7 @@ def setup(app):
     app.router.add_route('GET', '/foglamp/schedule/type', api_scheduler.get_schedule_type)
     app.router.add_route('GET', '/foglamp/schedule/{schedule_id}', api_scheduler.get_schedule)
     app.router.add_route('POST', '/foglamp/schedule/start/{schedule_id}', api_scheduler.start_schedule)
+    app.router.add_route('POST', '/foglamp/schedule/reload', api_scheduler.reload_schedules)
     app.router.add_route('PUT', '/foglamp/schedule/{schedule_id}', api_scheduler.update_schedule)
     app.router.add_route('DELETE', '/foglamp/schedule/{schedule_id}', api_scheduler.delete_schedule)
 
@@ -46,6 +47,8 @@ def setup(app):
     app.router.add_route('GET', '/foglamp/task', api_scheduler.get_tasks)
     app.router.add_route('GET', '/foglamp/task/state', api_scheduler.get_task_state)
     app.router.add_route('GET', '/foglamp/task/latest', api_scheduler.get_tasks_latest)
+    app.router.add_route('GET', '/foglamp/task/summary', api_scheduler.get_tasks_summary)
+    app.router.add_route('GET', '/foglamp/task/deferred', api_scheduler.get_tasks_deferred)
     app.router.add_route('GET', '/foglamp/task/{task_id}', api_scheduler.get_task)
     app.router.add_route('PUT', '/foglamp/task/cancel/{task_id}', api_scheduler.cancel_task)
 
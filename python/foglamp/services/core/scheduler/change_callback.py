@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+
+# FOGLAMP_BEGIN
+# See: http://foglamp.readthedocs.io/
+# FOGLAMP_END
+
+""" Module to hold the callback to apply the changes of the SCHEDULER configuration category. """
+
+from foglamp.common import logger
+from foglamp.services.core.scheduler.exceptions import NotReadyError
+
+__copyright__ = "Copyright (c) 2017 OSIsoft, LLC"
+__license__ = "Apache 2.0"
+__version__ = "${VERSION}"
+
+_LOGGER = logger.setup(__name__)
+
+
+async def run(category_name):
+    """ Callback run by the configuration manager when the category of the scheduler changes
+
+    Args:
+        category_name (str): name of category that was changed
+    """
+    # Imported here as the server imports the scheduler
+    from foglamp.services.core import server
+
+    scheduler = server.Server.scheduler
+    if scheduler is None:
+        return
+
+    try:
+        await scheduler.reload_config()
+    except NotReadyError:
+        # Read when the scheduler starts
+        _LOGGER.debug('Scheduler not ready, change of category %s ignored', category_name)
+    except Exception:
+        # The change is stored, it is applied at the next restart
+        _LOGGER.exception('Unable to apply the change of category %s', category_name)
@@ -94,7 +94,8 @@ class Task(object):
                                                      'end_time', 'exit_code'])
 
     __slots__ = ['task_id', 'process_name', 'state', 'cancel_requested', 'start_time',
-                 'end_time', 'state', 'exit_code', 'reason']
+                 'end_time', 'state', 'exit_code', 'reason', 'cpu_time', 'max_rss', 'read_bytes',
+                 'write_bytes', 'context_switches']
 
     def __init__(self):
         # Instance attributes
@@ -107,5 +108,12 @@ class Task(object):
         self.start_time = None  # type: datetime.datetime
         self.end_time = None  # type: datetime.datetime
         self.exit_code = None  # type: int
+        self.cpu_time = None  # type: float
+        """User and system cpu time, in seconds"""
+        self.max_rss = None  # type: int
+        """Peak resident set size, in kB"""
+        self.read_bytes = None  # type: int
+        self.write_bytes = None  # type: int
+        self.context_switches = None  # type: int
 
 
@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+
+# FOGLAMP_BEGIN
+# See: http://foglamp.readthedocs.io/
+# FOGLAMP_END
+
+"""Resources used by the task processes, sampled from /proc
+
+A task is the process started by the scheduler and its descendants, e.g. the shell
+script and the Python interpreter it starts. The totals of a task are the sum of the
+last values sampled for each process of the tree, except the peak resident set size
+that is the largest one of the processes.
+"""
+
+import os
+import resource
+
+__copyright__ = "Copyright (c) 2017 OSIsoft, LLC"
+__license__ = "Apache 2.0"
+__version__ = "${VERSION}"
+
+COLUMNS = ('cpu_time', 'max_rss', 'read_bytes', 'write_bytes', 'context_switches')
+"""Columns of the tasks table that store the resources used by a task"""
+
+_PROC_DIR = '/proc'
+
+_CLOCK_TICKS = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+"""Unit of the cpu times in /proc/<pid>/stat, per second"""
+
+
+class TaskResources(object):
+    """Resources used by a task process and its descendants"""
+
+    __slots__ = ['pid', 'cpu_time', 'max_rss', 'read_bytes', 'write_bytes', 'context_switches', '_processes']
+
+    def __init__(self, pid: int):
+        self.pid = pid
+        self.cpu_time = None  # type: float
+        """User and system cpu time, in seconds"""
+        self.max_rss = None  # type: int
+        """Peak resident set size, in kB"""
+        self.read_bytes = None  # type: int
+        """Bytes read from the storage devices"""
+        self.write_bytes = None  # type: int
+        """Bytes written to the storage devices"""
+        self.context_switches = None  # type: int
+        """Voluntary and involuntary context switches"""
+        self._processes = dict()
+        """Dictionary of (pid, start time) to the last values sampled for the process"""
+
+    def sample(self, parents: dict = None) -> None:
+        """Samples the processes of the task
+
+        Args:
+            parents: Dictionary of pid to the list of its children pid, built by
+                     :func:`read_parents` when /proc/<pid>/task/<pid>/children is not available
+        """
+        pids = [self.pid]
+        index = 0
+        while index < len(pids):
+            pid = pids[index]
+            index += 1
+            values = _read_process(pid)
+            if values is None:
+                continue
+            start_time, children, process_values = values
+            self._processes[(pid, start_time)] = process_values
+            if children is None:
+                children = parents.get(pid, []) if parents is not None else []
+            pids.extend(children)
+
+        if self._processes:
+            self._set_totals()
+
+    def add_rusage(self, rusage: dict) -> None:
+        """Adds the resources reported by wait4() when the task process terminated,
+        they include its descendants that terminated before it"""
+        for column in COLUMNS:
+            value = rusage.get(column)
+            if value is not None and (getattr(self, column) is None or value > getattr(self, column)):
+                setattr(self, column, value)
+
+    def columns(self) -> dict:
+        """The values of the columns of the tasks table, the ones not sampled yet are omitted"""
+        return {column: getattr(self, column) for column in COLUMNS if getattr(self, column) is not None}
+
+    def _set_totals(self):
+        values = self._processes.values()
+        self.cpu_time = round(sum(value[0] for value in values), 2)
+        self.max_rss = max(value[1] for value in values)
+        self.read_bytes = sum(value[2] for value in values)
+        self.write_bytes = sum(value[3] for value in values)
+        self.context_switches = sum(value[4] for value in values)
+
+
+class ChildrenUsage(object):
+    """Resources of the terminated children of the process, as reported by getrusage(RUSAGE_CHILDREN)
+
+    The processes of the tasks started with a script are reaped by the event loop, so the
+    values of their last moments cannot be sampled from /proc. When such a task terminates,
+    the increase of the resources of the children since the previous reading is the final
+    sample of its process tree, as long as no other task terminated at the same time.
+    The peak resident set size of the children is not attributable to a single task.
+    """
+
+    __slots__ = ['_last', '_unattributed']
+
+    def __init__(self):
+        self._last = self._read()
+        self._unattributed = 0
+        """Number of the terminated tasks whose resources were read together with another task"""
+
+    @staticmethod
+    def _read():
+        usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+        return (usage.ru_utime + usage.ru_stime, usage.ru_inblock * 512, usage.ru_oublock * 512,
+                usage.ru_nvcsw + usage.ru_nivcsw)
+
+    def collect(self, terminated: int):
+        """Returns the resources used by the children reaped since the previous call
+
+        Args:
+            terminated: Number of the terminated tasks started with a script not collected yet, the caller included
+        Returns:
+            dict of the columns of the tasks table, None when the resources cannot be
+            attributed to the caller only
+        """
+        current = self._read()
+        cpu_time, read_bytes, write_bytes, context_switches = (
+            value - last for value, last in zip(current, self._last))
+        self._last = current
+        if self._unattributed > 0 or terminated > 1:
+            self._unattributed = max(self._unattributed - 1, terminated - 1)
+            return None
+        return {'cpu_time': round(cpu_time, 2), 'read_bytes': read_bytes, 'write_bytes': write_bytes,
+                'context_switches': context_switches}
+
+
+_needs_parents = None
+
+
+def needs_parents() -> bool:
+    """Whether /proc/<pid>/task/<pid>/children is not available and
+    :func:`read_parents` must be used to find the descendants"""
+    global _needs_parents
+    if _needs_parents is None:
+        _needs_parents = not os.path.exists(os.path.join(_PROC_DIR, 'self', 'task', str(os.getpid()), 'children'))
+    return _needs_parents
+
+
+def read_parents() -> dict:
+    """Returns a dictionary of pid to the list of its children pid"""
+    parents = dict()
+    for name in os.listdir(_PROC_DIR):
+        if not name.isdigit():
+            continue
+        try:
+            with open(os.path.join(_PROC_DIR, name, 'stat')) as stat_file:
+                fields = stat_file.read().rsplit(')', 1)[1].split()
+        except (OSError, IndexError):
+            continue
+        parents.setdefault(int(fields[1]), []).append(int(name))
+    return parents
+
+
+def _read_process(pid: int):
+    """Returns (start time, children pid or None, (cpu time, peak rss, read bytes, write bytes, context switches)),
+    None if the process has terminated"""
+    process_dir = os.path.join(_PROC_DIR, str(pid))
+    try:
+        with open(os.path.join(process_dir, 'stat')) as stat_file:
+            # The command name, between brackets, can contain spaces
+            fields = stat_file.read().rsplit(')', 1)[1].split()
+
+        status = dict()
+        with open(os.path.join(process_dir, 'status')) as status_file:
+            for line in status_file:
+                key, _, value = line.partition(':')
+                status[key] = value
+    except (OSError, IndexError):
+        return None
+
+    # Terminated, the values are no longer available
+    if fields[0] == 'Z':
+        return None
+
+    cpu_time = (int(fields[11]) + int(fields[12])) / _CLOCK_TICKS
+    max_rss = int(status.get('VmHWM', '0 kB').split()[0])
+    context_switches = (int(status.get('voluntary_ctxt_switches', 0)) +
+                        int(status.get('nonvoluntary_ctxt_switches', 0)))
+
+    read_bytes = write_bytes = 0
+    try:
+        with open(os.path.join(process_dir, 'io')) as io_file:
+            for line in io_file:
+                key, _, value = line.partition(':')
+                if key == 'read_bytes':
+                    read_bytes = int(value)
+                elif key == 'write_bytes':
+                    write_bytes = int(value)
+    except OSError:
+        pass  # Not readable by this user
+
+    children = None
+    try:
+        with open(os.path.join(process_dir, 'task', str(pid), 'children')) as children_file:
+            children = [int(child) for child in children_file.read().split()]
+    except OSError:
+        pass
+
+    return fields[19], children, (cpu_time, max_rss, read_bytes, write_bytes, context_switches)
+
+
+def sample(resources_list) -> None:
+    """Samples the processes of every task in resources_list, it reads /proc and blocks:
+    the scheduler runs it in a thread of the executor"""
+    resources_list = list(resources_list)
+    if not resources_list:
+        return
+    parents = read_parents() if needs_parents() else None
+    for resources in resources_list:
+        resources.sample(parents)
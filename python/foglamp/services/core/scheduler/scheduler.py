@@ -9,6 +9,9 @@
 import asyncio
 import collections
 import datetime
+import heapq
+import itertools
+import json
 import logging
 import math
 import signal
@@ -21,6 +24,8 @@ from foglamp.common.configuration_manager import ConfigurationManager
 from foglamp.common import logger
 from foglamp.services.core.scheduler.entities import ScheduledProcess, Schedule, Task, IntervalSchedule, TimedSchedule, StartUpSchedule, ManualSchedule
 from foglamp.services.core.scheduler.exceptions import *
+from foglamp.services.core.scheduler.zygote import Zygote, ZygoteProcess, TASK_MODULES
+from foglamp.services.core.scheduler import resources
 from foglamp.common.storage_client.exceptions import *
 from foglamp.common.storage_client.payload_builder import PayloadBuilder
 from foglamp.common.storage_client.storage_client import StorageClient
@@ -38,6 +43,10 @@ _ENV = os.getenv('FOGLAMP_ENV', 'DEV')
 # FOGLAMP_ROOT env variable
 _FOGLAMP_ROOT = os.getenv("FOGLAMP_ROOT", default='/usr/local/foglamp')
 _SCRIPTS_DIR= os.path.expanduser(_FOGLAMP_ROOT + '/scripts')
+_PYTHON_DIR = os.path.expanduser(_FOGLAMP_ROOT + '/python')
+
+_CONFIG_CHANGE_CALLBACK = 'foglamp.services.core.scheduler.change_callback'
+"""Module run by the configuration manager when the SCHEDULER category changes"""
 
 class Scheduler(object):
     """FogLAMP Task Scheduler
@@ -64,35 +73,217 @@ class Scheduler(object):
                                                           'process_name'])
     """Represents a row in the schedules table"""
 
+    _Deferral = collections.namedtuple('Deferral', ['schedule_name', 'process_name', 'reason', 'since'])
+    """Why a task due to start was not started by the admission control, since is the epoch time of the first refusal"""
+
     class _TaskProcess(object):
         """Tracks a running task with some flags"""
-        __slots__ = ['task_id', 'process', 'cancel_requested', 'schedule', 'start_time']
+        __slots__ = ['task_id', 'process', 'cancel_requested', 'schedule', 'start_time', 'resources']
 
         def __init__(self):
             self.task_id = None  # type: uuid.UUID
-            self.process = None  # type: asyncio.subprocess.Process
+            self.process = None  # type: asyncio.subprocess.Process or ZygoteProcess
             self.cancel_requested = None  # type: int
             """Epoch time when cancel was requested"""
             self.schedule = None  # Schedule._ScheduleRow
             self.start_time = None  # type: int
             """Epoch time when the task was started"""
+            self.resources = None  # type: resources.TaskResources
+            """Resources used by the process, sampled while it runs"""
 
     # TODO: Methods that accept a schedule and look in _schedule_executions
     # should accept schedule_execution instead. Add reference to schedule
     # in _ScheduleExecution.
 
+    class _ScheduleIndex(object):
+        """Priority queue of the schedule executions ordered by next start time
+
+        An entry is pushed every time the next start time of a schedule execution changes.
+        The entries made obsolete by a later change are not removed, they are discarded
+        when they reach the top of the queue (lazy invalidation).
+        """
+
+        _COMPACT_MIN_SIZE = 64
+        """Obsolete entries are removed when they are more than the valid ones and at least this number"""
+
+        def __init__(self):
+            self._heap = []
+            """heap of (next start time, sequence, version, _ScheduleExecution)"""
+            self._sequence = itertools.count()
+            """Orders the entries having the same next start time"""
+            self._valid = 0
+            """Number of valid entries in the heap"""
+
+        def __len__(self):
+            return self._valid
+
+        def push(self, schedule_execution) -> None:
+            """Replaces the entry of a schedule execution with its current next start time"""
+            if schedule_execution.index_version is not None:
+                self._valid -= 1
+            schedule_execution.version += 1
+            schedule_execution.index_version = None
+            next_start_time = schedule_execution.next_start_time
+            if next_start_time is None:
+                return
+            heapq.heappush(self._heap, (next_start_time, next(self._sequence), schedule_execution.version,
+                                        schedule_execution))
+            schedule_execution.index_version = schedule_execution.version
+            self._valid += 1
+            if len(self._heap) > self._COMPACT_MIN_SIZE and len(self._heap) > 2 * self._valid:
+                self._heap = [entry for entry in self._heap if entry[2] == entry[3].index_version]
+                heapq.heapify(self._heap)
+
+        def peek(self):
+            """Returns the schedule execution having the earliest next start time, None when empty"""
+            heap = self._heap
+            while heap:
+                entry = heap[0]
+                if entry[2] == entry[3].index_version:
+                    return entry[3]
+                heapq.heappop(heap)
+            return None
+
+        def pop(self):
+            """Removes and returns the schedule execution having the earliest next start time, None when empty"""
+            schedule_execution = self.peek()
+            if schedule_execution is not None:
+                heapq.heappop(self._heap)
+                schedule_execution.index_version = None
+                self._valid -= 1
+            return schedule_execution
+
+    class _TaskJournal(object):
+        """Write-behind journal of the rows of the tasks table
+
+        The rows inserted and updated by the scheduler are accumulated and
+        written in batches, by a thread of the default executor, so that the
+        event loop does not wait for the storage server. The rows of the tasks
+        started at the same time are inserted by a single request and a task
+        that terminates before its row is written is inserted with its final state.
+        """
+
+        _FLUSH_SECONDS = 0.5
+        """Maximum time a row waits to be written"""
+
+        _FLUSH_ROWS = 100
+        """The rows are written immediately when this number of rows is pending"""
+
+        def __init__(self, storage, scheduler_logger):
+            self._storage = storage  # type: StorageClient
+            self._logger = scheduler_logger  # type: logging.Logger
+            self._inserts = collections.OrderedDict()
+            """dict of task id to the values of the row to insert"""
+            self._updates = collections.OrderedDict()
+            """dict of task id to the values to update"""
+            self._flush_handle = None  # type: asyncio.Handle
+            """Delayed start of :meth:`_flush`"""
+            self._flush_task = None  # type: asyncio.Task
+            """Task for :meth:`_flush`, writing the pending rows"""
+
+        def insert(self, task_id: uuid.UUID, **values) -> None:
+            """Queues the insert of the row of a task"""
+            values['id'] = str(task_id)
+            self._inserts[task_id] = values
+            self._schedule_flush()
+
+        def update(self, task_id: uuid.UUID, **values) -> None:
+            """Queues the update of the row of a task"""
+            try:
+                # The row is not written yet
+                self._inserts[task_id].update(values)
+            except KeyError:
+                self._updates.setdefault(task_id, dict()).update(values)
+            self._schedule_flush()
+
+        def _schedule_flush(self):
+            if self._flush_task is not None:
+                # Scheduled again when the flush in progress ends
+                return
+            if len(self._inserts) + len(self._updates) >= self._FLUSH_ROWS:
+                self._start_flush()
+            elif self._flush_handle is None:
+                self._flush_handle = asyncio.get_event_loop().call_later(self._FLUSH_SECONDS, self._start_flush)
+
+        def _start_flush(self):
+            if self._flush_handle is not None:
+                self._flush_handle.cancel()
+                self._flush_handle = None
+            if self._flush_task is None and (self._inserts or self._updates):
+                self._flush_task = asyncio.ensure_future(self._flush())
+
+        async def _flush(self):
+            """Writes the pending rows, the payloads are built here as PayloadBuilder is not thread safe"""
+            inserts, self._inserts = self._inserts, collections.OrderedDict()
+            updates, self._updates = self._updates, collections.OrderedDict()
+
+            # Rows having the same columns are inserted by a single request
+            insert_payloads = collections.OrderedDict()
+            for values in inserts.values():
+                insert_payloads.setdefault(tuple(sorted(values.keys())), []).append(values)
+            requests = [("insert", json.dumps(rows)) for rows in insert_payloads.values()]
+            for (task_id, values) in updates.items():
+                requests.append(("update", PayloadBuilder()
+                                 .SET(**values)
+                                 .WHERE(['id', '=', str(task_id)])
+                                 .payload()))
+            try:
+                await asyncio.get_event_loop().run_in_executor(None, self._write, requests)
+            finally:
+                self._flush_task = None
+                if self._inserts or self._updates:
+                    self._schedule_flush()
+
+        def _write(self, requests):
+            """Sends the requests to the storage server, runs in a thread of the executor"""
+            for (operation, payload) in requests:
+                try:
+                    self._logger.debug('Database command: %s', payload)
+                    if operation == "insert":
+                        self._storage.insert_into_tbl("tasks", payload)
+                    else:
+                        self._storage.update_tbl("tasks", payload)
+                except Exception:
+                    self._logger.exception('%s failed: %s', operation.capitalize(), payload)
+                    # Must keep going!
+
+        async def flush(self) -> None:
+            """Writes all the pending rows"""
+            while True:
+                if self._flush_task is None:
+                    self._start_flush()
+                    if self._flush_task is None:
+                        return
+                await asyncio.shield(self._flush_task)
+
     class _ScheduleExecution(object):
         """Tracks information about schedules"""
 
-        __slots__ = ['next_start_time', 'task_processes', 'start_now']
+        __slots__ = ['schedule_id', '_next_start_time', 'task_processes', 'start_now', 'version', 'index_version',
+                     '_schedule_index']
 
-        def __init__(self):
-            self.next_start_time = None
-            """When to next start a task for the schedule"""
+        def __init__(self, schedule_id, schedule_index):
+            self.schedule_id = schedule_id  # type: uuid.UUID
+            self._next_start_time = None
             self.task_processes = dict()
             """dict of task id to _TaskProcess"""
             self.start_now = False
             """True when a task is queued to start via :meth:`start_task`"""
+            self.version = 0
+            """Incremented every time next_start_time changes"""
+            self.index_version = None
+            """version of the valid entry in the schedule index, None when not in the index"""
+            self._schedule_index = schedule_index  # type: Scheduler._ScheduleIndex
+
+        @property
+        def next_start_time(self):
+            """When to next start a task for the schedule"""
+            return self._next_start_time
+
+        @next_start_time.setter
+        def next_start_time(self, value):
+            self._next_start_time = value
+            self._schedule_index.push(self)
 
     # Constant class attributes
     _DEFAULT_MAX_RUNNING_TASKS = 50
@@ -117,12 +308,26 @@ class Scheduler(object):
     _PURGE_TASKS_FREQUENCY_SECONDS = _DAY_SECONDS
     """How frequently to purge the tasks table"""
 
+    _ADMISSION_RETRY_SECONDS = 5
+    """How frequently to check again the deferred tasks when no task terminates"""
+
+    _DEFAULT_EXCLUSION_GROUPS = [["purge", "backup", "restore"]]
+    """Processes that do not run at the same time"""
+
+    _DEFAULT_ADMISSION_EXEMPT_PROCESSES = ["sending process", "statistics to pi", "sending HTTP"]
+    """Processes started regardless of the load average and the available memory"""
+
+    _DEFAULT_TASK_SAMPLE_SECONDS = 5
+    """How frequently to sample the resources used by the running tasks"""
+
     # Mostly constant class attributes
     _logger = None  # type: logging.Logger
 
     _core_management_host = None
     _core_management_port = None
     _storage = None
+    _config_interest_registered = False
+    """True when the callback of the SCHEDULER category is registered, it is registered once per process"""
 
     def __init__(self, core_management_host=None, core_management_port=None):
         """Constructor"""
@@ -142,6 +347,14 @@ class Scheduler(object):
         # Instance attributes
 
         self._storage = None
+        self._task_journal = None  # type: Scheduler._TaskJournal
+        """Write-behind journal of the tasks table"""
+        self._zygote = None  # type: Zygote
+        """Starts the built-in Python tasks, None when they are started with their script"""
+        self._use_zygote = None  # type: bool
+        """Whether to start the built-in Python tasks through the zygote"""
+        self._retired_zygote_tasks = []  # type: List[asyncio.Task]
+        """Tasks stopping the zygotes no longer used once their tasks terminate, see :meth:`reload_config`"""
 
         self._ready = False
         """True when the scheduler is ready to accept API calls"""
@@ -155,8 +368,28 @@ class Scheduler(object):
         """Dictionary of scheduled_processes.name to script"""
         self._schedules = dict()
         """Dictionary of schedules.id to _ScheduleRow"""
+        self._schedules_version = 0
+        """Highest schedules.version read, see :meth:`reload_schedules`"""
         self._schedule_executions = dict()
         """Dictionary of schedules.id to _ScheduleExecution"""
+        self._schedule_index = self._ScheduleIndex()
+        """_ScheduleExecution ordered by next_start_time"""
+        self._queued_schedule_ids = collections.OrderedDict()
+        """schedules.id of the schedules queued for execution via :meth:`queue_task`, in order"""
+        self._deferred_executions = collections.OrderedDict()
+        """schedules.id to the _ScheduleExecution taken from the index and not admitted yet, in order"""
+        self._deferrals = dict()
+        """schedules.id to the _Deferral of the schedules due or queued and not admitted yet"""
+        self._process_concurrency = dict()
+        """scheduled_processes.name to the maximum number of its tasks running at any given time"""
+        self._exclusion_groups = []
+        """Lists of scheduled_processes.name, a task does not start when a task of another process of its group runs"""
+        self._admission_exempt_processes = set()
+        """scheduled_processes.name started regardless of the load average and the available memory"""
+        self._max_load_average = 0  # type: float
+        """Tasks do not start when the 1 minute load average is above, 0 for no limit"""
+        self._min_available_memory_mb = 0  # type: int
+        """Tasks do not start when the available memory is below, in MB, 0 for no limit"""
         self._task_processes = dict()
         """Dictionary of tasks.id to _TaskProcess"""
         self._check_processes_pending = False
@@ -173,6 +406,12 @@ class Scheduler(object):
         """Delete finished task rows when they become this old"""
         self._purge_tasks_task = None  # type: asyncio.Task
         """asynico task for :meth:`purge_tasks`, if scheduled to run"""
+        self._task_sample_seconds = None  # type: int
+        """How frequently to sample the resources used by the running tasks, 0 to sample only at the end"""
+        self._sample_tasks_task = None  # type: asyncio.Task
+        """Task for :meth:`_sample_tasks_loop`"""
+        self._children_usage = None  # type: resources.ChildrenUsage
+        """Resources of the task processes reaped by the event loop, see :meth:`_wait_for_task_completion`"""
 
     @property
     def max_completed_task_age(self) -> datetime.timedelta:
@@ -217,6 +456,16 @@ class Scheduler(object):
     async def _wait_for_task_completion(self, task_process: _TaskProcess) -> None:
         exit_code = await task_process.process.wait()
 
+        # Final sample: the exact values reported by the zygote for the tasks it started,
+        # the resources of the children reaped since the previous task terminated for the others
+        rusage = getattr(task_process.process, 'rusage', None)
+        if rusage is None and self._children_usage is not None:
+            terminated = sum(1 for other in self._task_processes.values()
+                             if other.process.returncode is not None and not isinstance(other.process, ZygoteProcess))
+            rusage = self._children_usage.collect(terminated)
+        if rusage:
+            task_process.resources.add_rusage(rusage)
+
         schedule = task_process.schedule
 
         self._logger.info(
@@ -250,6 +499,13 @@ class Scheduler(object):
                     "Tasks will no longer execute for schedule '%s'", schedule.name)
         elif schedule.exclusive:
             self._schedule_next_task(schedule)
+            # The schedule left the index when the task started
+            if schedule_execution.index_version is None and schedule_execution.next_start_time:
+                self._schedule_index.push(schedule_execution)
+
+        if not schedule_execution.task_processes and (schedule_deleted or (
+                not schedule_execution.next_start_time and not schedule_execution.start_now)):
+            self._remove_schedule_execution(schedule_execution)
 
         if schedule.type != Schedule.Type.STARTUP:
             if exit_code < 0 and task_process.cancel_requested:
@@ -258,18 +514,11 @@ class Scheduler(object):
                 state = Task.State.COMPLETE
 
             # Update the task's status
-            update_payload = PayloadBuilder() \
-                .SET(exit_code=exit_code,
-                     state=int(state),
-                     end_time=str(datetime.datetime.now())) \
-                .WHERE(['id', '=', str(task_process.task_id)]) \
-                .payload()
-            try:
-                self._logger.debug('Database command: %s', update_payload)
-                res = self._storage.update_tbl("tasks", update_payload)
-            except Exception:
-                self._logger.exception('Update failed: %s', update_payload)
-                # Must keep going!
+            self._task_journal.update(task_process.task_id,
+                                      exit_code=exit_code,
+                                      state=int(state),
+                                      end_time=str(datetime.datetime.now()),
+                                      **task_process.resources.columns())
 
         # Due to maximum running tasks reached, it is necessary to
         # look for schedules that are ready to run even if there
@@ -302,8 +551,19 @@ class Scheduler(object):
         task_process = self._TaskProcess()
         task_process.start_time = time.time()
 
+        process = None
+        module = TASK_MODULES.get(args_to_exec[0])
+        if module is not None and self._zygote is not None and self._zygote.running:
+            try:
+                process = await self._zygote.launch(module, args_to_exec[1:], cwd=_PYTHON_DIR)
+            except EnvironmentError:
+                self._logger.exception(
+                    "Unable to start schedule '%s' process '%s' through the zygote, using the script\n%s",
+                    schedule.name, schedule.process_name, args_to_exec)
+
         try:
-            process = await asyncio.create_subprocess_exec(*args_to_exec, cwd=_SCRIPTS_DIR)
+            if process is None:
+                process = await asyncio.create_subprocess_exec(*args_to_exec, cwd=_SCRIPTS_DIR)
         except EnvironmentError:
             self._logger.exception(
                 "Unable to start schedule '%s' process '%s'\n%s",
@@ -312,6 +572,7 @@ class Scheduler(object):
 
         task_id = uuid.uuid4()
         task_process.process = process
+        task_process.resources = resources.TaskResources(process.pid)
         task_process.schedule = schedule
         task_process.task_id = task_id
 
@@ -325,92 +586,226 @@ class Scheduler(object):
 
         # Startup tasks are not tracked in the tasks table
         if schedule.type != Schedule.Type.STARTUP:
-            # The task row needs to exist before the completion handler runs
-            insert_payload = PayloadBuilder() \
-                .INSERT(id=str(task_id),
-                        pid=(self._schedule_executions[schedule.id].
-                             task_processes[task_id].process.pid),
-                        process_name=schedule.process_name,
-                        state=int(Task.State.RUNNING),
-                        start_time=str(datetime.datetime.now())) \
-                .payload()
-            try:
-                self._logger.debug('Database command: %s', insert_payload)
-                res = self._storage.insert_into_tbl("tasks", insert_payload)
-            except Exception:
-                self._logger.exception('Insert failed: %s', insert_payload)
-                # The process has started. Regardless of this error it must be waited on.
+            # The task row needs to exist before the completion handler runs,
+            # the journal writes the insert before the update
+            self._task_journal.insert(task_id,
+                                      pid=(self._schedule_executions[schedule.id].
+                                           task_processes[task_id].process.pid),
+                                      process_name=schedule.process_name,
+                                      state=int(Task.State.RUNNING),
+                                      start_time=str(datetime.datetime.now()))
 
         asyncio.ensure_future(self._wait_for_task_completion(task_process))
 
     async def _check_schedules(self):
-        """Starts tasks according to schedules based on the current time"""
-        earliest_start_time = None
+        """Starts tasks according to schedules based on the current time
+
+        Only the schedules queued for execution, the deferred ones and the ones
+        due, taken from the top of :attr:`_schedule_index`, are visited. A task
+        refused by :meth:`_check_admission` is deferred, it starts when a later
+        call admits it.
+
+        Returns:
+            The earliest next start time, None when no task can be started
+            or no task is scheduled
+        """
+        next_start_time = await self._start_due_tasks()
+
+        # Load and memory change without the scheduler being notified
+        if self._deferrals and not self._paused:
+            now = self.current_time if self.current_time else time.time()
+            retry_time = now + self._ADMISSION_RETRY_SECONDS
+            if next_start_time is None or retry_time < next_start_time:
+                next_start_time = retry_time
+
+        return next_start_time
 
-        # Can not iterate over _schedule_executions - it can change mid-iteration
-        for schedule_id in list(self._schedule_executions.keys()):
+    async def _start_due_tasks(self):
+        """Starts the tasks of :meth:`_check_schedules`, returns the earliest next start time"""
+        # Tasks queued via queue_task()
+        for schedule_id in list(self._queued_schedule_ids.keys()):
             if self._paused or len(self._task_processes) >= self._max_running_tasks:
                 return None
 
-            schedule_execution = self._schedule_executions[schedule_id]
+            schedule_execution = self._schedule_executions.get(schedule_id)
+            schedule = self._schedules.get(schedule_id)
+
+            if schedule is None or schedule_execution is None or not schedule_execution.start_now:
+                # The schedule has been deleted or the task already started
+                del self._queued_schedule_ids[schedule_id]
+                if schedule_execution is not None and schedule is None \
+                        and not schedule_execution.task_processes:
+                    self._remove_schedule_execution(schedule_execution)
+                continue
+
+            if schedule.exclusive and schedule_execution.task_processes:
+                # Started when the running task completes
+                continue
+
+            if not self._check_admission(schedule):
+                continue
+
+            # Manual start - don't change next_start_time
+            del self._queued_schedule_ids[schedule_id]
+            await self._start_task(schedule)
+            schedule_execution.start_now = False
+
+        # Due tasks refused by the admission control
+        for schedule_id, schedule_execution in list(self._deferred_executions.items()):
+            if self._paused or len(self._task_processes) >= self._max_running_tasks:
+                return None
+
+            schedule = self._schedules.get(schedule_id)
+            if (schedule is None or self._schedule_executions.get(schedule_id) is not schedule_execution
+                    or schedule_execution.index_version is not None
+                    or (schedule.exclusive and schedule_execution.task_processes)):
+                # Deleted, or back in the index because the schedule was modified
+                # or a task started by queue_task() completed
+                del self._deferred_executions[schedule_id]
+                if not self._queued_schedule_ids.get(schedule_id):
+                    self._deferrals.pop(schedule_id, None)
+                if schedule is None and not schedule_execution.task_processes:
+                    self._remove_schedule_execution(schedule_execution)
+                continue
+
+            if not self._check_admission(schedule):
+                continue
+
+            del self._deferred_executions[schedule_id]
+            await self._start_due_task(schedule, schedule_execution)
+
+        while True:
+            if self._paused or len(self._task_processes) >= self._max_running_tasks:
+                return None
+
+            schedule_execution = self._schedule_index.peek()
+            if schedule_execution is None:
+                return None
+
+            now = self.current_time if self.current_time else time.time()
+            if now < schedule_execution.next_start_time:
+                return schedule_execution.next_start_time
+
+            self._schedule_index.pop()
+            schedule_id = schedule_execution.schedule_id
+
+            if self._schedule_executions.get(schedule_id) is not schedule_execution:
+                continue
 
             try:
                 schedule = self._schedules[schedule_id]
             except KeyError:
                 # The schedule has been deleted
                 if not schedule_execution.task_processes:
-                    del self._schedule_executions[schedule_id]
+                    self._remove_schedule_execution(schedule_execution)
                 continue
 
             if schedule.exclusive and schedule_execution.task_processes:
+                # Back in the index when the running task completes
                 continue
 
-            # next_start_time is None when repeat is None until the
-            # task completes, at which time schedule_execution is removed
-            next_start_time = schedule_execution.next_start_time
-            if not next_start_time and not schedule_execution.start_now:
-                if not schedule_execution.task_processes:
-                    del self._schedule_executions[schedule_id]
+            if not self._check_admission(schedule):
+                # Out of the index until admitted
+                self._deferred_executions[schedule_id] = schedule_execution
                 continue
 
-            if next_start_time and not schedule_execution.start_now:
-                now = self.current_time if self.current_time else time.time()
-                right_time = now >= next_start_time
-            else:
-                right_time = False
-
-            if right_time or schedule_execution.start_now:
-                # Start a task
-
-                if not right_time:
-                    # Manual start - don't change next_start_time
-                    pass
-                elif schedule.exclusive:
-                    # Exclusive tasks won't start again until they terminate
-                    # Or the schedule doesn't repeat
-                    next_start_time = None
-                else:
-                    # _schedule_next_task alters next_start_time
-                    self._schedule_next_task(schedule)
-                    next_start_time = schedule_execution.next_start_time
-
-                await self._start_task(schedule)
+            await self._start_due_task(schedule, schedule_execution)
 
-                # Queued manual execution is ignored when it was
-                # already time to run the task. The task doesn't
-                # start twice even when nonexclusive.
-                # The choice to put this after "await" above was
-                # deliberate. The above "await" could have allowed
-                # queue_task() to run. The following line
-                # will undo that because, after all, the task started.
-                schedule_execution.start_now = False
-
-            # Keep track of the earliest next_start_time
-            if next_start_time and (earliest_start_time is None or
-                                            earliest_start_time > next_start_time):
-                earliest_start_time = next_start_time
-
-        return earliest_start_time
+    async def _start_due_task(self, schedule, schedule_execution):
+        """Starts the task of a schedule whose next start time has been reached"""
+        if not schedule.exclusive:
+            # _schedule_next_task alters next_start_time
+            self._schedule_next_task(schedule)
+        # Exclusive tasks won't start again until they terminate
+        # Or the schedule doesn't repeat
+
+        await self._start_task(schedule)
+
+        # Queued manual execution is ignored when it was
+        # already time to run the task. The task doesn't
+        # start twice even when nonexclusive.
+        # The choice to put this after "await" above was
+        # deliberate. The above "await" could have allowed
+        # queue_task() to run. The following line
+        # will undo that because, after all, the task started.
+        schedule_execution.start_now = False
+        self._queued_schedule_ids.pop(schedule.id, None)
+
+    def _check_admission(self, schedule) -> bool:
+        """Whether a task of schedule can start now, records the deferral of the schedule when it can not"""
+        reason = self._admission_refusal(schedule)
+        if reason is None:
+            self._deferrals.pop(schedule.id, None)
+            return True
+
+        deferral = self._deferrals.get(schedule.id)
+        if deferral is None:
+            self._logger.info("Task deferred: Schedule '%s' process '%s': %s",
+                              schedule.name, schedule.process_name, reason)
+            self._deferrals[schedule.id] = self._Deferral(
+                schedule.name, schedule.process_name, reason,
+                self.current_time if self.current_time else time.time())
+        elif deferral.reason != reason:
+            self._deferrals[schedule.id] = deferral._replace(reason=reason)
+        return False
+
+    def _admission_refusal(self, schedule):
+        """Returns why a task of schedule can not start now, None when it can"""
+        # Services are always started
+        if schedule.type == Schedule.Type.STARTUP:
+            return None
+
+        process_name = schedule.process_name
+        running = collections.Counter(task_process.schedule.process_name
+                                      for task_process in self._task_processes.values())
+
+        limit = self._process_concurrency.get(process_name)
+        if limit is not None and running[process_name] >= limit:
+            return "{0} '{1}' tasks running, the maximum".format(running[process_name], process_name)
+
+        for group in self._exclusion_groups:
+            if process_name in group:
+                for other_process_name in group:
+                    if other_process_name != process_name and running[other_process_name]:
+                        return "'{0}' excludes '{1}'".format(other_process_name, process_name)
+
+        if process_name in self._admission_exempt_processes:
+            return None
+
+        if self._max_load_average > 0:
+            load_average = os.getloadavg()[0]
+            if load_average > self._max_load_average:
+                return "load average {0:.2f} above {1}".format(load_average, self._max_load_average)
+
+        if self._min_available_memory_mb > 0:
+            available_memory_mb = self._available_memory_mb()
+            if available_memory_mb is not None and available_memory_mb < self._min_available_memory_mb:
+                return "available memory {0} MB below {1} MB".format(available_memory_mb,
+                                                                     self._min_available_memory_mb)
+
+        return None
+
+    @staticmethod
+    def _available_memory_mb():
+        """Memory available for starting new processes, None when unknown"""
+        try:
+            with open('/proc/meminfo') as meminfo:
+                for line in meminfo:
+                    if line.startswith('MemAvailable:'):
+                        return int(line.split()[1]) // 1024
+        except OSError:
+            pass
+        return None
+
+    def _remove_schedule_execution(self, schedule_execution):
+        """Stops tracking a schedule that has been deleted or that will not start tasks anymore"""
+        schedule_execution.next_start_time = None
+        schedule_execution.start_now = False
+        self._queued_schedule_ids.pop(schedule_execution.schedule_id, None)
+        self._deferred_executions.pop(schedule_execution.schedule_id, None)
+        self._deferrals.pop(schedule_execution.schedule_id, None)
+        if self._schedule_executions.get(schedule_execution.schedule_id) is schedule_execution:
+            del self._schedule_executions[schedule_execution.schedule_id]
 
     async def _scheduler_loop(self):
         """Main loop for the scheduler"""
@@ -448,6 +843,17 @@ class Scheduler(object):
                 # other coroutines
                 await asyncio.sleep(0)
 
+    async def _sample_tasks_loop(self):
+        """Samples the resources used by the running tasks until the scheduler is paused"""
+        while not self._paused:
+            await asyncio.sleep(self._task_sample_seconds)
+            try:
+                # /proc is read by a thread, the event loop is not blocked
+                task_resources = [task_process.resources for task_process in self._task_processes.values()]
+                await asyncio.get_event_loop().run_in_executor(None, resources.sample, task_resources)
+            except Exception:
+                self._logger.exception('Unable to sample the resources used by the tasks')
+
     def _schedule_next_timed_task(self, schedule, schedule_execution, current_dt):
         """Handle daylight savings time transitions.
            Assume 'repeat' is not null.
@@ -557,7 +963,7 @@ class Scheduler(object):
         try:
             schedule_execution = self._schedule_executions[schedule.id]
         except KeyError:
-            schedule_execution = self._ScheduleExecution()
+            schedule_execution = self._ScheduleExecution(schedule.id, self._schedule_index)
             self._schedule_executions[schedule.id] = schedule_execution
 
         if schedule.type == Schedule.Type.INTERVAL:
@@ -600,48 +1006,170 @@ class Scheduler(object):
             self._logger.exception('Query failed: %s', "scheduled_processes")
             raise
 
-    async def _get_schedules(self):
+    async def _get_schedules(self, since_version=None):
+        """Reads the schedules, all of them or the ones inserted or updated after since_version
+
+        Returns:
+            The number of schedules read that are new or that have changed
+        """
         # TODO: Get processes first, then add to Schedule
+        if since_version is None:
+            query_payload = None
+        else:
+            query_payload = PayloadBuilder().WHERE(["version", ">", since_version]).payload()
+
+        changed = 0
         try:
-            self._logger.debug('Database command: %s', 'schedules')
-            res = self._storage.query_tbl("schedules")
+            self._logger.debug('Database command: %s %s', 'schedules', query_payload)
+            if query_payload is None:
+                res = self._storage.query_tbl("schedules")
+            else:
+                res = self._storage.query_tbl_with_payload("schedules", query_payload)
             for row in res['rows']:
-                s_interval = datetime.datetime.strptime(row.get('schedule_interval'), "%H:%M:%S")
-                interval = datetime.timedelta(hours=s_interval.hour, minutes=s_interval.minute,
-                                              seconds=s_interval.second)
-
-                repeat_seconds = None
-                if interval is not None:
-                    repeat_seconds = interval.total_seconds()
-
-                s_ti = row.get('schedule_time') if row.get('schedule_time') else '00:00:00'
-                s_tim = datetime.datetime.strptime(s_ti, "%H:%M:%S")
-                schedule_time = datetime.time().replace(hour=s_tim.hour, minute=s_tim.minute, second=s_tim.second)
-
-                schedule_id = uuid.UUID(row.get('id'))
-
-                schedule = self._ScheduleRow(
-                    id=schedule_id,
-                    name=row.get('schedule_name'),
-                    type=int(row.get('schedule_type')),
-                    day=int(row.get('schedule_day')) if row.get('schedule_day').strip() else 0,
-                    time=schedule_time,
-                    repeat=interval,
-                    repeat_seconds=repeat_seconds,
-                    exclusive=True if row.get('exclusive') == 't' else False,
-                    process_name=row.get('process_name'))
-
-                self._schedules[schedule_id] = schedule
-                self._schedule_first_task(schedule, self._start_time)
+                schedule = self._schedule_row_from_storage(row)
+                if row.get('version') is not None:
+                    self._schedules_version = max(self._schedules_version, int(row.get('version')))
+
+                prev_schedule = self._schedules.get(schedule.id)
+                self._schedules[schedule.id] = schedule
+
+                if since_version is None:
+                    self._schedule_first_task(schedule, self._start_time)
+                    changed += 1
+                elif prev_schedule is None or self._schedule_timing(prev_schedule) != self._schedule_timing(schedule):
+                    # As save_schedule()
+                    if schedule.type in [Schedule.Type.INTERVAL, Schedule.Type.TIMED]:
+                        now = self.current_time if self.current_time else time.time()
+                        self._schedule_first_task(schedule, now)
+                    changed += 1
+                elif prev_schedule != schedule:
+                    changed += 1
+        except Exception:
+            self._logger.exception('Query failed: %s %s', 'schedules', query_payload)
+            raise
+
+        return changed
+
+    def _schedule_row_from_storage(self, row) -> _ScheduleRow:
+        """Converts a row of the schedules table"""
+        s_interval = datetime.datetime.strptime(row.get('schedule_interval'), "%H:%M:%S")
+        interval = datetime.timedelta(hours=s_interval.hour, minutes=s_interval.minute,
+                                      seconds=s_interval.second)
+
+        repeat_seconds = None
+        if interval is not None:
+            repeat_seconds = interval.total_seconds()
+
+        s_ti = row.get('schedule_time') if row.get('schedule_time') else '00:00:00'
+        s_tim = datetime.datetime.strptime(s_ti, "%H:%M:%S")
+        schedule_time = datetime.time().replace(hour=s_tim.hour, minute=s_tim.minute, second=s_tim.second)
+
+        return self._ScheduleRow(
+            id=uuid.UUID(row.get('id')),
+            name=row.get('schedule_name'),
+            type=int(row.get('schedule_type')),
+            day=int(row.get('schedule_day')) if row.get('schedule_day').strip() else 0,
+            time=schedule_time,
+            repeat=interval,
+            repeat_seconds=repeat_seconds,
+            exclusive=True if row.get('exclusive') == 't' else False,
+            process_name=row.get('process_name'))
+
+    @staticmethod
+    def _schedule_timing(schedule) -> tuple:
+        """The attributes of a schedule that determine when its tasks start, time and day
+        are not significant and stored with a default value unless the schedule is timed"""
+        if schedule.type == Schedule.Type.TIMED:
+            return schedule.type, schedule.time, schedule.day or None, schedule.repeat_seconds, schedule.exclusive
+        return schedule.type, None, None, schedule.repeat_seconds, schedule.exclusive
+
+    async def _get_deleted_schedules(self):
+        """Stops tracking the schedules deleted from storage by other means than :meth:`delete_schedule`
+
+        The ids are read only when the number of rows differs from the number of schedules known.
+
+        Returns:
+            The number of schedules deleted
+        """
+        count_payload = PayloadBuilder().AGGREGATE(["count", "id"]).payload()
+        try:
+            self._logger.debug('Database command: %s', count_payload)
+            res = self._storage.query_tbl_with_payload("schedules", count_payload)
+            if int(res['rows'][0]['count_id']) == len(self._schedules):
+                return 0
+
+            id_payload = PayloadBuilder().SELECT("id").payload()
+            self._logger.debug('Database command: %s', id_payload)
+            res = self._storage.query_tbl_with_payload("schedules", id_payload)
         except Exception:
             self._logger.exception('Query failed: %s', 'schedules')
             raise
 
+        schedule_ids = {uuid.UUID(row.get('id')) for row in res['rows']}
+        deleted_schedule_ids = [schedule_id for schedule_id in self._schedules if schedule_id not in schedule_ids]
+        # The executions are removed by _check_schedules or when their tasks terminate
+        for schedule_id in deleted_schedule_ids:
+            del self._schedules[schedule_id]
+        return len(deleted_schedule_ids)
+
     async def _read_storage(self):
         """Reads schedule information from the storage server"""
         await self._get_process_scripts()
         await self._get_schedules()
 
+    async def reload_schedules(self) -> None:
+        """Applies the changes made to the scheduled processes and the schedules in storage
+
+        Only the schedules inserted or updated since the last read, having a higher
+        version stamp, are read.
+
+        Raises:
+            NotReadyError: The scheduler is not ready for requests
+        """
+        if self._paused or not self._ready:
+            raise NotReadyError()
+
+        await self._get_process_scripts()
+        changed = await self._get_schedules(self._schedules_version)
+        deleted = await self._get_deleted_schedules()
+
+        if changed or deleted:
+            self._logger.info("Schedules reloaded: %s changed %s deleted", changed, deleted)
+            self._resume_check_schedules()
+
+    async def reload_config(self) -> None:
+        """Applies the changes made to the SCHEDULER configuration category and to the schedules
+
+        Raises:
+            NotReadyError: The scheduler is not ready for requests
+        """
+        if self._paused or not self._ready:
+            raise NotReadyError()
+
+        use_zygote = self._use_zygote
+        task_sample_seconds = self._task_sample_seconds
+
+        cfg_manager = ConfigurationManager(self._storage)
+        self._apply_config(await cfg_manager.get_category_all_items('SCHEDULER'))
+
+        if self._use_zygote != use_zygote:
+            if self._use_zygote:
+                await self._start_zygote()
+            elif self._zygote is not None:
+                # The tasks started through the zygote keep running, it stops when they terminate
+                self._retired_zygote_tasks.append(asyncio.ensure_future(self._zygote.stop(timeout=None)))
+                self._zygote = None
+
+        if self._task_sample_seconds != task_sample_seconds:
+            if self._sample_tasks_task is not None:
+                self._sample_tasks_task.cancel()
+                self._sample_tasks_task = None
+            if self._task_sample_seconds > 0:
+                self._sample_tasks_task = asyncio.ensure_future(self._sample_tasks_loop())
+
+        await self.reload_schedules()
+        self._resume_check_schedules()
+
     async def _mark_tasks_interrupted(self):
         """The state for any task with a NULL end_time is set to interrupted"""
         # TODO FOGL-722 NULL can not be passed like this
@@ -675,16 +1203,95 @@ class Scheduler(object):
                 "type": "integer",
                 "default": str(self._DEFAULT_MAX_COMPLETED_TASK_AGE_DAYS)
             },
+            "task_sample_seconds": {
+                "description": "How frequently, in seconds, to sample the resources used by the running tasks, "
+                               "0 to record only the resources reported when a task started through the "
+                               "zygote terminates",
+                "type": "integer",
+                "default": str(self._DEFAULT_TASK_SAMPLE_SECONDS)
+            },
+            "process_concurrency": {
+                "description": "The maximum number of tasks of a scheduled process that can be running "
+                               "at any given time, by process name",
+                "type": "JSON",
+                "default": json.dumps({})
+            },
+            "exclusion_groups": {
+                "description": "Groups of scheduled processes, a task does not start while a task of "
+                               "another process of its group is running",
+                "type": "JSON",
+                "default": json.dumps(self._DEFAULT_EXCLUSION_GROUPS)
+            },
+            "max_load_average": {
+                "description": "Tasks do not start while the 1 minute load average is above this value, "
+                               "0 for no limit",
+                "type": "string",
+                "default": "0"
+            },
+            "min_available_memory_mb": {
+                "description": "Tasks do not start while the available memory, in MB, is below this value, "
+                               "0 for no limit",
+                "type": "integer",
+                "default": "0"
+            },
+            "admission_exempt_processes": {
+                "description": "Scheduled processes started regardless of the load average and the "
+                               "available memory",
+                "type": "JSON",
+                "default": json.dumps(self._DEFAULT_ADMISSION_EXEMPT_PROCESSES)
+            },
+            "use_zygote": {
+                "description": "Start the built-in Python tasks by forking a Python process that has "
+                               "already loaded them, instead of starting a new interpreter for every task",
+                "type": "boolean",
+                "default": "true"
+            },
         }
 
         cfg_manager = ConfigurationManager(self._storage)
         await cfg_manager.create_category('SCHEDULER', default_config,
                                                     'Scheduler configuration')
 
-        config = await cfg_manager.get_category_all_items('SCHEDULER')
+        if not Scheduler._config_interest_registered:
+            cfg_manager.register_interest('SCHEDULER', _CONFIG_CHANGE_CALLBACK)
+            Scheduler._config_interest_registered = True
+
+        self._apply_config(await cfg_manager.get_category_all_items('SCHEDULER'))
+
+    def _apply_config(self, config):
+        """Sets the attributes of the scheduler from the items of the SCHEDULER category
+
+        The zygote and the sampling of the task resources are started and stopped
+        by :meth:`start` and :meth:`reload_config`.
+        """
         self._max_running_tasks = int(config['max_running_tasks']['value'])
         self._max_completed_task_age = datetime.timedelta(
             seconds=int(config['max_completed_task_age_days']['value']) * self._DAY_SECONDS)
+        self._use_zygote = config['use_zygote']['value'].lower() == 'true'
+        self._task_sample_seconds = int(config['task_sample_seconds']['value'])
+        self._process_concurrency = {name: int(limit) for (name, limit)
+                                     in self._json_config_value(config['process_concurrency']).items()}
+        self._exclusion_groups = [set(group) for group in self._json_config_value(config['exclusion_groups'])]
+        self._admission_exempt_processes = set(self._json_config_value(config['admission_exempt_processes']))
+        self._max_load_average = float(config['max_load_average']['value'])
+        self._min_available_memory_mb = int(config['min_available_memory_mb']['value'])
+
+    @staticmethod
+    def _json_config_value(item):
+        value = item['value']
+        return json.loads(value) if isinstance(value, str) else value
+
+    async def _start_zygote(self):
+        """Starts the zygote, the tasks are started with their script if it can not start"""
+        if not self._use_zygote:
+            return
+        zygote = Zygote(self._logger)
+        try:
+            await zygote.start()
+        except EnvironmentError:
+            self._logger.exception("Unable to start the zygote, the tasks are started with their script")
+            return
+        self._zygote = zygote
 
     async def start(self):
         """Starts the scheduler
@@ -733,14 +1340,19 @@ class Scheduler(object):
 
         # Everything OK, so now start Scheduler and create Storage instance
         self._logger.info("Starting Scheduler: Management port received is %d", self._core_management_port)
+        self._task_journal = self._TaskJournal(self._storage, self._logger)
+        self._children_usage = resources.ChildrenUsage()
 
         await self._read_config()
+        await self._start_zygote()
         await self._mark_tasks_interrupted()
         await self._read_storage()
 
         self._ready = True
 
         self._scheduler_loop_task = asyncio.ensure_future(self._scheduler_loop())
+        if self._task_sample_seconds > 0:
+            self._sample_tasks_task = asyncio.ensure_future(self._sample_tasks_loop())
 
     async def stop(self):
         """Attempts to stop the scheduler
@@ -778,6 +1390,10 @@ class Scheduler(object):
                 self._logger.exception('An exception was raised by Scheduler._scheduler_loop')
             self._scheduler_loop_task = None
 
+            if self._sample_tasks_task is not None:
+                self._sample_tasks_task.cancel()
+                self._sample_tasks_task = None
+
         # Can not iterate over _task_processes - it can change mid-iteration
         for task_id in list(self._task_processes.keys()):
             try:
@@ -803,16 +1419,33 @@ class Scheduler(object):
             except ProcessLookupError:
                 pass  # Process has terminated
 
-        # Wait for all processes to stop
-        for _ in range(self._STOP_WAIT_SECONDS):
-            if not self._task_processes:
-                break
-            await asyncio.sleep(1)
+        try:
+            # Wait for all processes to stop
+            for _ in range(self._STOP_WAIT_SECONDS):
+                if not self._task_processes:
+                    break
+                await asyncio.sleep(1)
+
+            if self._task_processes:
+                raise TimeoutError()
+        finally:
+            # Writes the state of the tasks terminated, also when some tasks are still running
+            if self._task_journal is not None:
+                await self._task_journal.flush()
 
-        if self._task_processes:
-            raise TimeoutError()
+        if self._zygote is not None:
+            await self._zygote.stop()
+            self._zygote = None
+
+        for retired_zygote_task in self._retired_zygote_tasks:
+            await retired_zygote_task
+        self._retired_zygote_tasks = []
 
         self._schedule_executions = None
+        self._schedule_index = None
+        self._queued_schedule_ids = None
+        self._deferred_executions = None
+        self._deferrals = None
         self._task_processes = None
         self._schedules = None
         self._process_scripts = None
@@ -1024,6 +1657,11 @@ class Scheduler(object):
             self._schedule_first_task(schedule_row, now)
             self._resume_check_schedules()
 
+        # Reads the version stamp given to the row by storage, with the other changes made since the last read,
+        # so that the next reload does not read the row again
+        if await self._get_schedules(self._schedules_version):
+            self._resume_check_schedules()
+
     async def queue_task(self, schedule_id: uuid.UUID) -> None:
         """Requests a task to be started for a schedule
 
@@ -1047,10 +1685,11 @@ class Scheduler(object):
         try:
             schedule_execution = self._schedule_executions[schedule_id]
         except KeyError:
-            schedule_execution = self._ScheduleExecution()
+            schedule_execution = self._ScheduleExecution(schedule_row.id, self._schedule_index)
             self._schedule_executions[schedule_row.id] = schedule_execution
 
         schedule_execution.start_now = True
+        self._queued_schedule_ids[schedule_id] = True
 
         self._logger.info("Queued schedule '%s' for execution", schedule_row.name)
         self._resume_check_schedules()
@@ -1069,9 +1708,7 @@ class Scheduler(object):
         if not self._ready:
             raise NotReadyError()
 
-        try:
-            del self._schedules[schedule_id]
-        except KeyError:
+        if schedule_id not in self._schedules:
             raise ScheduleNotFoundError(schedule_id)
 
         # TODO: Inspect race conditions with _set_first
@@ -1085,6 +1722,9 @@ class Scheduler(object):
             self._logger.exception('Delete failed: %s', delete_payload)
             raise
 
+        # Removed once deleted from storage, the number of rows read by reload_schedules() then matches
+        del self._schedules[schedule_id]
+
     async def get_running_tasks(self) -> List[Task]:
         """Retrieves a list of all tasks that are currently running
 
@@ -1107,27 +1747,82 @@ class Scheduler(object):
                 task.cancel_requested = (
                     datetime.datetime.fromtimestamp(task_process.cancel_requested))
             task.start_time = datetime.datetime.fromtimestamp(task_process.start_time)
+            self._set_task_resources(task, task_process.resources.columns())
             tasks.append(task)
 
         return tasks
 
+    async def get_deferred_tasks(self) -> List[dict]:
+        """Retrieves the tasks due to start that have been deferred by the admission control
+
+        Returns:
+            A list of dict ordered by deferral time, with the keys schedule_id,
+            schedule_name, process_name, reason and since (datetime of the first refusal)
+        """
+        if not self._ready:
+            raise NotReadyError()
+
+        deferred_tasks = []
+        for (schedule_id, deferral) in sorted(self._deferrals.items(), key=lambda item: item[1].since):
+            deferred_tasks.append({'schedule_id': schedule_id,
+                                   'schedule_name': deferral.schedule_name,
+                                   'process_name': deferral.process_name,
+                                   'reason': deferral.reason,
+                                   'since': datetime.datetime.fromtimestamp(deferral.since)})
+        return deferred_tasks
+
+    def _task_row_to_task(self, row) -> Task:
+        """Converts a row of the tasks table, the resources of a running task are the last sampled"""
+        task = Task()
+        task.task_id = row.get('id')
+        task.state = Task.State(int(row.get('state')))
+        task.start_time = row.get('start_time')
+        task.process_name = row.get('process_name')
+        task.end_time = row.get('end_time')
+        task.exit_code = row.get('exit_code')
+        task.reason = row.get('reason')
+
+        task_process = None
+        if task.state == Task.State.RUNNING and self._task_processes:
+            try:
+                task_process = self._task_processes.get(uuid.UUID(str(task.task_id)))
+            except ValueError:
+                pass
+        if task_process is not None:
+            self._set_task_resources(task, task_process.resources.columns())
+        else:
+            self._set_task_resources(task, row)
+        return task
+
+    @staticmethod
+    def _set_task_resources(task: Task, values: dict) -> None:
+        """Sets the resources of task from values, a row of the tasks table or TaskResources.columns()
+        The storage server returns some numeric columns as strings and null as an empty string or 0,
+        the resources are unknown when the cpu time is"""
+        no_resources = values.get('cpu_time') in (None, '')
+        for column in resources.COLUMNS:
+            value = values.get(column)
+            if no_resources:
+                value = None
+            elif column == 'cpu_time':
+                value = float(value)
+            else:
+                value = int(value)
+            setattr(task, column, value)
+
     async def get_task(self, task_id: uuid.UUID) -> Task:
         """Retrieves a task given its id"""
+        # The rows in the journal are written before the query
+        if self._task_journal is not None:
+            await self._task_journal.flush()
+
         query_payload = PayloadBuilder().WHERE(["id", "=", task_id]).payload()
 
         try:
             self._logger.debug('Database command: %s', query_payload)
             res = self._storage.query_tbl_with_payload("tasks", query_payload)
             for row in res['rows']:
-                task = Task()
-                task.task_id = row.get('id')
-                task.state = Task.State(int(row.get('state')))
-                task.start_time = row.get('start_time')
-                task.process_name = row.get('process_name')
-                task.end_time = row.get('end_time')
-                task.exit_code = row.get('exit_code')
-                task.reason = row.get('reason')
-                return task
+                return self._task_row_to_task(row)
         except Exception:
             self._logger.exception('Query failed: %s', query_payload)
             raise
@@ -1147,6 +1842,9 @@ class Scheduler(object):
                 A tuple of Task attributes to sort by.
                 Defaults to ("start_time", "desc")
         """
+        # The rows in the journal are written before the query
+        if self._task_journal is not None:
+            await self._task_journal.flush()
 
         chain_payload = PayloadBuilder().LIMIT(limit).chain_payload()
         if offset:
@@ -1167,21 +1865,60 @@ class Scheduler(object):
             self._logger.debug('Database command: %s', query_payload)
             res = self._storage.query_tbl_with_payload("tasks", query_payload)
             for row in res['rows']:
-                task = Task()
-                task.task_id = row.get('id')
-                task.state = Task.State(int(row.get('state')))
-                task.start_time = row.get('start_time')
-                task.process_name = row.get('process_name')
-                task.end_time = row.get('end_time')
-                task.exit_code = row.get('exit_code')
-                task.reason = row.get('reason')
-                tasks.append(task)
+                tasks.append(self._task_row_to_task(row))
         except Exception:
             self._logger.exception('Query failed: %s', query_payload)
             raise
 
         return tasks
 
+    async def get_tasks_summary(self, where=None) -> List[dict]:
+        """Retrieves the resources used by the tasks that terminated, per process name
+
+        Args:
+            where: A query on the tasks table
+
+        Returns:
+            A list of dict ordered by process name, with the keys process_name, tasks (the
+            number of tasks having resource data), cpu_time, avg_cpu_time, max_rss,
+            read_bytes, write_bytes and context_switches
+        """
+        # The rows in the journal are written before the query
+        if self._task_journal is not None:
+            await self._task_journal.flush()
+
+        chain_payload = PayloadBuilder().AGGREGATE(["count", "cpu_time"], ["sum", "cpu_time"], ["avg", "cpu_time"],
+                                                   ["max", "max_rss"], ["sum", "read_bytes"],
+                                                   ["sum", "write_bytes"], ["sum", "context_switches"])\
+            .GROUP_BY("process_name").chain_payload()
+        if where:
+            chain_payload = PayloadBuilder(chain_payload).WHERE(where).chain_payload()
+        query_payload = PayloadBuilder(chain_payload).payload()
+
+        try:
+            self._logger.debug('Database command: %s', query_payload)
+            res = self._storage.query_tbl_with_payload("tasks", query_payload)
+        except Exception:
+            self._logger.exception('Query failed: %s', query_payload)
+            raise
+
+        def number(value, convert):
+            return None if value is None or value == '' else convert(value)
+
+        summary = []
+        for row in res['rows']:
+            summary.append({
+                'process_name': row['process_name'],
+                'tasks': number(row.get('count_cpu_time'), int),
+                'cpu_time': number(row.get('sum_cpu_time'), lambda v: round(float(v), 2)),
+                'avg_cpu_time': number(row.get('avg_cpu_time'), lambda v: round(float(v), 2)),
+                'max_rss': number(row.get('max_max_rss'), int),
+                'read_bytes': number(row.get('sum_read_bytes'), int),
+                'write_bytes': number(row.get('sum_write_bytes'), int),
+                'context_switches': number(row.get('sum_context_switches'), int),
+            })
+        return sorted(summary, key=lambda process: process['process_name'])
+
     async def cancel_task(self, task_id: uuid.UUID) -> None:
         """Cancels a running task
 
@@ -0,0 +1,405 @@
+# -*- coding: utf-8 -*-
+
+# FOGLAMP_BEGIN
+# See: http://foglamp.readthedocs.io/
+# FOGLAMP_END
+
+"""Pre-loaded Python process that forks the built-in Python tasks
+
+Starting a task with a script means starting a new Python interpreter that imports
+asyncio, aiohttp, the storage client and the task itself before doing any work.
+The zygote is a Python process started once by the scheduler: it imports these modules
+and then forks a child for every task it is asked to start. The child runs the module
+of the task as __main__, as 'python3 -m <module>' would, and it is a normal process for
+the scheduler: it has its own pid, its exit code is reported back and it can be
+terminated with a signal.
+
+The scheduler and the zygote exchange JSON lines, the requests are written to the
+stdin of the zygote and the responses are written to a pipe passed as argument:
+    request  {"id": 1, "module": "foglamp.tasks.purge", "args": [...], "cwd": "..."}
+    response {"id": 1, "pid": 1234} or {"id": 1, "error": "..."}
+    response {"pid": 1234, "exit": 0, "rusage": {...}} when the task terminates
+"""
+
+import asyncio
+import gc
+import importlib
+import itertools
+import json
+import logging
+import os
+import random
+import runpy
+import select
+import signal
+import sys
+import traceback
+
+__copyright__ = "Copyright (c) 2017 OSIsoft, LLC"
+__license__ = "Apache 2.0"
+__version__ = "${VERSION}"
+
+TASK_MODULES = {
+    "tasks/north": "foglamp.tasks.north.sending_process",
+    "tasks/purge": "foglamp.tasks.purge",
+    "tasks/statistics": "foglamp.tasks.statistics",
+    "tasks/rollup": "foglamp.tasks.rollup",
+    "tasks/backup_postgres": "foglamp.plugins.storage.postgres.backup_restore.backup_postgres",
+}
+"""Scripts of the scheduled processes, relative to the scripts directory, that can be started
+through the zygote and the module each one runs. The restore is not included as it detaches
+itself from FogLAMP."""
+
+PRELOAD_MODULES = [
+    "aiohttp",
+    "foglamp.common.storage_client.storage_client",
+    "foglamp.common.configuration_manager",
+    "foglamp.common.process",
+    "foglamp.tasks.north.sending_process",
+    "foglamp.tasks.purge.purge",
+    "foglamp.tasks.statistics.statistics_history",
+    "foglamp.tasks.rollup.rollup",
+]
+"""Modules imported by the zygote before forking the tasks"""
+
+_STOP_WAIT_SECONDS = 5
+"""Wait this number of seconds in :meth:`Zygote.stop` for the zygote to terminate"""
+
+_ORPHAN_POLL_SECONDS = 1
+"""How frequently to check the tasks still running when the zygote terminated unexpectedly"""
+
+_ORPHAN_EXIT_CODE = 255
+"""Exit code reported for a task that outlived the zygote, its real exit code is lost"""
+
+
+class ZygoteProcess(object):
+    """A task forked by the zygote
+
+    It provides the part of asyncio.subprocess.Process used by the scheduler.
+    """
+    __slots__ = ['pid', 'returncode', 'rusage', '_exited']
+
+    def __init__(self, pid: int, loop):
+        self.pid = pid
+        self.returncode = None  # type: int
+        """Exit code, negative signal number if the process was terminated by a signal"""
+        self.rusage = None  # type: dict
+        """Resources used by the process, as reported by wait4(), see :func:`_rusage`"""
+        self._exited = loop.create_future()
+
+    async def wait(self) -> int:
+        """Waits for the process to terminate and returns its exit code"""
+        return await asyncio.shield(self._exited)
+
+    def send_signal(self, signal_number: int) -> None:
+        """Raises:
+            ProcessLookupError: The process has terminated
+        """
+        if self.returncode is not None:
+            raise ProcessLookupError()
+        os.kill(self.pid, signal_number)
+
+    def terminate(self) -> None:
+        self.send_signal(signal.SIGTERM)
+
+    def kill(self) -> None:
+        self.send_signal(signal.SIGKILL)
+
+    def _set_returncode(self, returncode: int) -> None:
+        if self.returncode is None:
+            self.returncode = returncode
+            self._exited.set_result(returncode)
+
+
+class Zygote(object):
+    """Starts the zygote and the tasks through it
+
+    Usage:
+        - Call :meth:`start`
+        - Call :meth:`launch` for every task
+        - Call :meth:`stop`
+    """
+
+    def __init__(self, scheduler_logger: logging.Logger, preload=None):
+        self._logger = scheduler_logger
+        self._preload = PRELOAD_MODULES if preload is None else preload
+        self._process = None  # type: asyncio.subprocess.Process
+        """The zygote"""
+        self._reader_task = None  # type: asyncio.Task
+        """Task for :meth:`_read_responses`"""
+        self._request_ids = itertools.count(1)
+        self._requests = dict()
+        """Dictionary of request id to the future of the started ZygoteProcess"""
+        self._processes = dict()
+        """Dictionary of pid to running ZygoteProcess"""
+
+    @property
+    def running(self) -> bool:
+        return self._reader_task is not None and not self._reader_task.done()
+
+    async def start(self) -> None:
+        """Starts the zygote, it loads the modules in the background
+
+        Raises:
+            EnvironmentError: If the zygote could not start
+        """
+        loop = asyncio.get_event_loop()
+        read_fd, write_fd = os.pipe()
+        try:
+            self._process = await asyncio.create_subprocess_exec(
+                sys.executable, '-m', __name__, str(write_fd), *self._preload,
+                stdin=asyncio.subprocess.PIPE, pass_fds=(write_fd,))
+        except Exception:
+            os.close(read_fd)
+            raise
+        finally:
+            os.close(write_fd)
+
+        reader = asyncio.StreamReader()
+        await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), os.fdopen(read_fd, 'rb', 0))
+        self._reader_task = asyncio.ensure_future(self._read_responses(reader))
+
+        self._logger.info("Zygote started: pid %s", self._process.pid)
+
+    async def launch(self, module: str, args: list, cwd: str = None) -> ZygoteProcess:
+        """Forks a task that runs module as __main__ with args as the command line arguments
+
+        Raises:
+            EnvironmentError: If the task could not start
+        """
+        if not self.running:
+            raise EnvironmentError("The zygote is not running")
+
+        request_id = next(self._request_ids)
+        future = asyncio.get_event_loop().create_future()
+        self._requests[request_id] = future
+
+        request = {"id": request_id, "module": module, "args": args, "cwd": cwd}
+        try:
+            self._process.stdin.write((json.dumps(request) + "\n").encode())
+            await self._process.stdin.drain()
+            return await future
+        finally:
+            self._requests.pop(request_id, None)
+
+    async def _read_responses(self, reader: asyncio.StreamReader) -> None:
+        loop = asyncio.get_event_loop()
+
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+
+            response = json.loads(line.decode())
+            if "id" in response:
+                future = self._requests.get(response["id"])
+                if future is None or future.done():
+                    continue
+                if "error" in response:
+                    future.set_exception(EnvironmentError(response["error"]))
+                else:
+                    # Registered before the response with the exit code can be read
+                    process = ZygoteProcess(response["pid"], loop)
+                    self._processes[process.pid] = process
+                    future.set_result(process)
+            else:
+                process = self._processes.pop(response["pid"], None)
+                if process is not None:
+                    process.rusage = response.get("rusage")
+                    process._set_returncode(response["exit"])
+
+        for future in self._requests.values():
+            if not future.done():
+                future.set_exception(EnvironmentError("The zygote terminated"))
+
+        if self._processes:
+            self._logger.error("Zygote terminated with %s running tasks", len(self._processes))
+            asyncio.ensure_future(self._wait_for_orphans(self._processes))
+            self._processes = dict()
+
+    @staticmethod
+    async def _wait_for_orphans(processes: dict) -> None:
+        """Waits for the tasks forked by a zygote that terminated, they are no longer
+        children of a process that can collect their exit code"""
+        while processes:
+            await asyncio.sleep(_ORPHAN_POLL_SECONDS)
+            for pid in list(processes.keys()):
+                try:
+                    os.kill(pid, 0)
+                except ProcessLookupError:
+                    processes.pop(pid)._set_returncode(_ORPHAN_EXIT_CODE)
+                except PermissionError:
+                    pass
+
+    async def stop(self, timeout: float = _STOP_WAIT_SECONDS) -> None:
+        """Stops the zygote, it terminates when the tasks it started have terminated
+
+        Args:
+            timeout: Seconds to wait for the zygote to terminate before killing it, None to wait
+                until the tasks have terminated
+        """
+        if self._process is None:
+            return
+
+        self._process.stdin.close()
+        try:
+            await asyncio.wait_for(self._process.wait(), timeout)
+        except asyncio.TimeoutError:
+            self._logger.warning("Zygote did not terminate: pid %s", self._process.pid)
+            try:
+                self._process.kill()
+            except ProcessLookupError:
+                pass
+            await self._process.wait()
+
+        if self._reader_task is not None:
+            await self._reader_task
+            self._reader_task = None
+
+        self._process = None
+
+
+# -------------------------------------------- The zygote process
+
+def _exit_code(status: int) -> int:
+    """Exit code of a wait status, as asyncio.subprocess.Process.returncode"""
+    if os.WIFSIGNALED(status):
+        return -os.WTERMSIG(status)
+    return os.WEXITSTATUS(status)
+
+
+def _rusage(rusage) -> dict:
+    """Resources used by a task, with the columns of the tasks table, see resources.COLUMNS"""
+    return {
+        "cpu_time": round(rusage.ru_utime + rusage.ru_stime, 2),
+        "max_rss": rusage.ru_maxrss,
+        "read_bytes": rusage.ru_inblock * 512,
+        "write_bytes": rusage.ru_oublock * 512,
+        "context_switches": rusage.ru_nvcsw + rusage.ru_nivcsw,
+    }
+
+
+def _run_task(request: dict, fds_to_close: list) -> None:
+    """Runs in the forked child, never returns"""
+    exit_code = 1
+    try:
+        signal.set_wakeup_fd(-1)
+        signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+        for fd in fds_to_close:
+            os.close(fd)
+
+        # stdin of the zygote is the pipe of the requests
+        null_fd = os.open(os.devnull, os.O_RDONLY)
+        os.dup2(null_fd, 0)
+        os.close(null_fd)
+
+        if request.get("cwd") and os.path.isdir(request["cwd"]):
+            os.chdir(request["cwd"])
+
+        # The state shared with the zygote must not be reused
+        random.seed()
+        asyncio.set_event_loop(asyncio.new_event_loop())
+
+        sys.argv = [request["module"]] + request["args"]
+        runpy.run_module(request["module"], run_name="__main__", alter_sys=True)
+        exit_code = 0
+    except SystemExit as ex:
+        if ex.code is None:
+            exit_code = 0
+        elif isinstance(ex.code, int):
+            exit_code = ex.code
+        else:
+            print(ex.code, file=sys.stderr)
+            exit_code = 1
+    except BaseException:
+        traceback.print_exc()
+    finally:
+        try:
+            logging.shutdown()
+            sys.stdout.flush()
+            sys.stderr.flush()
+        finally:
+            os._exit(exit_code & 0xff)
+
+
+def _serve(response_fd: int, preload: list) -> None:
+    """Loads the modules, then forks a task for every request until stdin is closed"""
+    for module in preload:
+        try:
+            importlib.import_module(module)
+        except Exception as ex:
+            # The task will import the module again and report the error
+            print("[FOGLAMP] zygote - WARNING - unable to preload |{0}| - {1}".format(module, ex), file=sys.stderr)
+
+    # Keeps the loaded objects out of the garbage collector, so that the pages
+    # stay shared with the forked tasks
+    gc.collect()
+    if hasattr(gc, "freeze"):
+        gc.freeze()
+
+    # The scheduler stops the zygote
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    wakeup_read_fd, wakeup_write_fd = os.pipe()
+    os.set_blocking(wakeup_read_fd, False)
+    os.set_blocking(wakeup_write_fd, False)
+    signal.signal(signal.SIGCHLD, lambda signal_number, frame: None)
+    signal.set_wakeup_fd(wakeup_write_fd)
+
+    fds_to_close = [response_fd, wakeup_read_fd, wakeup_write_fd]
+    children = set()
+    buffer = b""
+    stdin_open = True
+
+    def respond(response):
+        os.write(response_fd, (json.dumps(response) + "\n").encode())
+
+    def reap():
+        while children:
+            try:
+                pid, status, rusage = os.wait4(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            children.discard(pid)
+            respond({"pid": pid, "exit": _exit_code(status), "rusage": _rusage(rusage)})
+
+    try:
+        while stdin_open or children:
+            fds = [wakeup_read_fd, 0] if stdin_open else [wakeup_read_fd]
+            readable = select.select(fds, [], [])[0]
+
+            if wakeup_read_fd in readable:
+                try:
+                    while os.read(wakeup_read_fd, 4096):
+                        pass
+                except BlockingIOError:
+                    pass
+            reap()
+
+            if 0 in readable:
+                data = os.read(0, 65536)
+                if not data:
+                    stdin_open = False
+                    continue
+                buffer += data
+                *lines, buffer = buffer.split(b"\n")
+                for line in lines:
+                    request = json.loads(line.decode())
+                    try:
+                        pid = os.fork()
+                    except OSError as ex:
+                        respond({"id": request["id"], "error": str(ex)})
+                        continue
+                    if pid == 0:
+                        _run_task(request, fds_to_close)
+                    children.add(pid)
+                    respond({"id": request["id"], "pid": pid})
+    except BrokenPipeError:
+        pass  # The scheduler terminated
+
+
+if __name__ == "__main__":
+    _serve(int(sys.argv[1]), sys.argv[2:])
@@ -27,9 +27,11 @@ from foglamp.services.core.service_registry.service_registry import ServiceRegis
 from foglamp.services.core.service_registry import exceptions as service_registry_exceptions
 from foglamp.services.core.interest_registry.interest_registry import InterestRegistry
 from foglamp.services.core.interest_registry import exceptions as interest_registry_exceptions
+from foglamp.services.core.readings_notification import ReadingsNotification
 from foglamp.services.core.scheduler.scheduler import Scheduler
 from foglamp.services.core.service_registry.monitor import Monitor
 from foglamp.services.core import connect
+from foglamp.services.core.response_cache import cache_middleware
 from foglamp.services.common.service_announcer import ServiceAnnouncer
 
 __author__ = "Amarendra K. Sinha, Praveen Garg, Terris Linenbach"
@@ -86,13 +88,16 @@ class Server:
     _interest_registry = None
     """ Instance of interest registry (singleton) """
 
+    _MAX_READINGS_WAIT = 60
+    """ Maximum time, in seconds, a client can wait for the notification of new readings """
+
     @staticmethod
     def _make_app():
         """Creates the REST server
 
         :rtype: web.Application
         """
-        app = web.Application(middlewares=[middleware.error_middleware])
+        app = web.Application(middlewares=[middleware.error_middleware, cache_middleware])
         admin_routes.setup(app)
         return app
 
@@ -508,6 +513,42 @@ class Server:
     async def change(cls, request):
         pass
 
+    @classmethod
+    async def notify_readings(cls, request):
+        """ Notify that new readings are available into the storage
+
+        :Example: curl -d '{"readings": 100}' -X POST http://localhost:8082/foglamp/notify/readings
+        """
+        try:
+            data = await request.json()
+            readings = data.get('readings', None)
+            if not isinstance(readings, int) or readings < 0:
+                raise web.HTTPBadRequest(reason='readings can be a positive integer only')
+
+            generation = ReadingsNotification.notify(readings)
+
+            return web.json_response({'generation': generation})
+        except ValueError as ex:
+            raise web.HTTPBadRequest(reason=str(ex))
+
+    @classmethod
+    async def wait_readings(cls, request):
+        """ Wait (long-poll) for new readings, it returns as soon as new readings are notified or after timeout seconds
+
+        :Example: curl -X GET http://localhost:8082/foglamp/notify/readings?generation=10&timeout=5
+        """
+        try:
+            generation = int(request.query['generation']) if 'generation' in request.query else None
+            timeout = float(request.query['timeout']) if 'timeout' in request.query else 5
+        except ValueError:
+            raise web.HTTPBadRequest(reason='generation and timeout must be numbers')
+        if timeout < 0:
+            raise web.HTTPBadRequest(reason='timeout can be a positive number only')
+
+        generation, readings = await ReadingsNotification.wait(generation, min(timeout, cls._MAX_READINGS_WAIT))
+
+        return web.json_response({'generation': generation, 'readings': readings})
+
 
 def main():
     """ Processes command-line arguments
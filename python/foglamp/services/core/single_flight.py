@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+
+# FOGLAMP_BEGIN
+# See: http://foglamp.readthedocs.io/
+# FOGLAMP_END
+
+"""Coalescing of the identical storage queries of the REST API
+
+When many clients request the same data at the same time, e.g. the readings count of
+the assets, the REST API handlers would send the same heavy query to the storage once
+per request. The queries sent through :class:`SingleFlight` run in the default executor,
+so that they do not block the event loop, and an identical query received while one is
+in flight waits for the result of the first one instead of being sent again.
+
+The result is shared by all the requests that waited for it, the handlers must not
+modify it.
+"""
+
+import asyncio
+
+from foglamp.common import logger
+
+__copyright__ = "Copyright (c) 2017 OSIsoft, LLC"
+__license__ = "Apache 2.0"
+__version__ = "${VERSION}"
+
+
+class SingleFlight:
+
+    _in_flight = dict()
+    """ (method name, table name, query) to the future of the storage query in flight """
+
+    executed = 0
+    """ Number of queries sent to the storage """
+
+    coalesced = 0
+    """ Number of queries that waited for the result of an identical query in flight """
+
+    # INFO - level 20
+    _logger = logger.setup(__name__, level=20)
+
+    @classmethod
+    async def query_tbl(cls, storage, tbl_name, query=None):
+        """ StorageClient.query_tbl(), coalesced with the identical queries in flight """
+        return await cls._query(('query_tbl', tbl_name, query), storage.query_tbl, tbl_name, query)
+
+    @classmethod
+    async def query_tbl_with_payload(cls, storage, tbl_name, query_payload):
+        """ StorageClient.query_tbl_with_payload(), coalesced with the identical queries in flight """
+        return await cls._query(('query_tbl_with_payload', tbl_name, query_payload),
+                                storage.query_tbl_with_payload, tbl_name, query_payload)
+
+    @classmethod
+    async def _query(cls, key, function, *args):
+        future = cls._in_flight.get(key)
+        if future is None:
+            cls.executed += 1
+            future = asyncio.get_event_loop().run_in_executor(None, function, *args)
+            cls._in_flight[key] = future
+            future.add_done_callback(lambda _: cls._in_flight.pop(key, None))
+        else:
+            cls.coalesced += 1
+        # A request cancelled, e.g. by the client disconnecting, does not cancel the others
+        return await asyncio.shield(future)
+
+    @classmethod
+    def stats(cls):
+        """ Returns the counters of the queries, for the health information of the core """
+        return {'executed': cls.executed, 'coalesced': cls.coalesced, 'inFlight': len(cls._in_flight)}
+
+    @classmethod
+    def reset(cls):
+        cls.executed = 0
+        cls.coalesced = 0
@@ -6,6 +6,7 @@
 
 """FogLAMP Sensor Readings Ingest API"""
 
+import aiohttp
 import asyncio
 import datetime
 import time
@@ -88,6 +89,15 @@ class Ingest(object):
     _last_insert_time = 0  # type: int
     """epoch time of last insert"""
 
+    _readings_to_notify = 0  # type: int
+    """Number of readings inserted not yet notified to the core"""
+
+    _notify_readings_task = None  # type: asyncio.Task
+    """asyncio task for :meth:`_notify_readings`"""
+
+    _notify_readings_session = None  # type: aiohttp.ClientSession
+    """HTTP session used by :meth:`_notify_readings`, kept for the life of the ingest"""
+
     _readings_list_size = 0  # type: int
     """Maximum number of readings items in each buffer"""
 
@@ -214,6 +224,8 @@ class Ingest(object):
                             'to %s', cls._readings_buffer_size,
                             cls._readings_list_size * cls._max_concurrent_readings_inserts)
 
+        cls._notify_readings_session = aiohttp.ClientSession()
+
         # Start asyncio tasks
         cls._write_statistics_task = asyncio.ensure_future(cls._write_statistics())
 
@@ -276,6 +288,17 @@ class Ingest(object):
         except Exception:
             _LOGGER.exception('An exception was raised by Ingest._write_statistics')
 
+        # Readings notification
+        if cls._notify_readings_task is not None:
+            try:
+                await cls._notify_readings_task
+            except Exception:
+                _LOGGER.exception('An exception was raised by Ingest._notify_readings')
+            cls._notify_readings_task = None
+
+        await cls._notify_readings_session.close()
+        cls._notify_readings_session = None
+
         cls._started = False
 
     @classmethod
@@ -378,6 +401,7 @@ class Ingest(object):
                         if res["response"] == "appended":
                             batch_size = len(readings_list)
                             cls._readings_stats += batch_size
+                            cls._notify_readings_appended(batch_size)
                     except KeyError:
                         # if key error in next, it will be automatically in parent except block
                         if res["retryable"]:  # retryable is bool
@@ -416,6 +440,36 @@ class Ingest(object):
 
         _LOGGER.info('Insert readings loop stopped')
 
+    @classmethod
+    def _notify_readings_appended(cls, batch_size):
+        """Notifies the core, in background, that new readings are available
+
+        Notifications requested while one is in progress are merged into the next one
+        """
+        cls._readings_to_notify += batch_size
+
+        if cls._notify_readings_task is None or cls._notify_readings_task.done():
+            cls._notify_readings_task = asyncio.ensure_future(cls._notify_readings())
+
+    @classmethod
+    async def _notify_readings(cls):
+        """Sends the notifications of new readings to the core, used to wake up the idle north sending processes"""
+        url = "http://{}:{}/foglamp/notify/readings".format(cls._core_management_host, cls._core_management_port)
+        headers = {'content-type': 'application/json'}
+
+        while cls._readings_to_notify:
+            readings = cls._readings_to_notify
+            cls._readings_to_notify = 0
+            try:
+                async with cls._notify_readings_session.post(url, data=json.dumps({"readings": readings}),
+                                                             headers=headers) as resp:
+                    await resp.text()
+                    if resp.status not in range(200, 300):
+                        _LOGGER.debug('Readings notification error code: %d, reason: %s', resp.status, resp.reason)
+            except Exception:
+                # North sending processes fall back to polling the storage
+                _LOGGER.debug('Unable to notify new readings to the core')
+
     @classmethod
     async def _write_statistics(cls):
         """Periodically commits collected readings statistics"""
@@ -15,6 +15,7 @@ that is devolved to the translation plugin in order to allow for flexibility
 in the translation process.
 """
 import json
+import http.client
 import resource
 import asyncio
 import sys
@@ -76,6 +77,11 @@ _MESSAGES_LIST = {
     "e000025": "Required argument '--name' is missing - command line |{0}|",
     "e000026": "Required argument '--port' is missing - command line |{0}|",
     "e000027": "Required argument '--address' is missing - command line |{0}|",
+    "e000028": "cannot evaluate the encoded size of the block - error details |{0}|",
+    "e000029": "cannot wait for the notification of new readings, "
+               "polling the storage every sleepInterval seconds - error details |{0}|",
+    "e000030": "cannot retrieve the block size of the previous execution, "
+               "starting from blockSize - error details |{0}|",
 
 }
 """ Messages used for Information, Warning and Error notice """
@@ -226,6 +232,145 @@ class LogStorage(object):
             _LOGGER.error(_message)
 
 
+class AdaptiveBlockSize(object):
+    """ Adapts the size of the blocks of data fetched and sent, in rows and in encoded bytes,
+    using the measured fetch time, send latency and the errors reported by the destination.
+
+    The number of rows grows multiplicatively while full blocks keep improving the throughput (bytes/sec),
+    it is reduced when the throughput drops, when a block takes longer than the target send time
+    or when the destination reports an error; it is always kept within the configured min/max
+    and limited so that a block does not exceed the configured size in bytes.
+    """
+
+    _GROWTH_FACTOR = 1.25
+    """ Increase applied when a full block improves the throughput """
+
+    _REDUCTION_FACTOR = 0.9
+    """ Decrease applied when a full block worsens the throughput """
+
+    _ERROR_FACTOR = 0.5
+    """ Decrease applied when the destination reports an error """
+
+    _THROUGHPUT_TOLERANCE = 0.95
+    """ Throughput ratio, current vs best, considered not worse """
+
+    _SMOOTHING = 0.3
+    """ Weight of the last sample in the exponential moving averages """
+
+    _SAMPLE_ROWS = 50
+    """ Number of rows encoded to estimate the size in bytes of a block """
+
+    def __init__(self, initial, minimum, maximum, max_bytes, send_time_target, enabled=True):
+        """
+        Args:
+            initial: number of rows of the first block
+            minimum: minimum number of rows of a block
+            maximum: maximum number of rows of a block
+            max_bytes: maximum size of a block in bytes, as encoded JSON
+            send_time_target: maximum desired time, in seconds, to fetch and send a block
+            enabled: False = the number of rows is kept fixed to the initial value
+        """
+        self._enabled = enabled
+        self._min = max(1, minimum)
+        self._max = max(self._min, maximum)
+        self._max_bytes = max_bytes
+        self._send_time_target = send_time_target
+        self._row_bytes = None
+        """ Moving average of the encoded size of a row in bytes """
+        self._throughput = None
+        """ Moving average of the bytes/sec achieved by the full blocks """
+        self._rows = initial if not enabled else self._clamp(initial)
+
+    @property
+    def rows(self):
+        """ Current number of rows to fetch for a block """
+        return int(self._rows)
+
+    @property
+    def max_bytes(self):
+        """ Current maximum size of a block in bytes """
+        return self._max_bytes
+
+    @property
+    def throughput(self):
+        """ Current estimation of the throughput in bytes/sec, None if not yet available """
+        return self._throughput
+
+    def status(self):
+        """ Current values as a dict, used for logging """
+        return {
+            "blockSize": self.rows,
+            "blockMaxBytes": self._max_bytes,
+            "rowBytes": None if self._row_bytes is None else int(self._row_bytes),
+            "bytesPerSecond": None if self._throughput is None else int(self._throughput)
+        }
+
+    def _clamp(self, rows):
+        rows = min(max(rows, self._min), self._max)
+        if self._row_bytes:
+            rows = min(rows, max(self._min, self._max_bytes / self._row_bytes))
+        return rows
+
+    def _average(self, current, sample):
+        return sample if current is None else current + self._SMOOTHING * (sample - current)
+
+    def fit(self, data_block):
+        """ Estimates the encoded size of the block, sampling some rows, and trims it to the maximum size in bytes
+        Args:
+            data_block: block of data loaded from the Storage layer
+        Returns:
+            data_block: the block, trimmed if it exceeds the maximum size in bytes
+            block_bytes: estimated encoded size of the returned block
+        Raises:
+        """
+        num_rows = len(data_block)
+        step = max(1, num_rows // self._SAMPLE_ROWS)
+        samples = data_block[::step]
+        row_bytes = sum(len(json.dumps(row)) for row in samples) / len(samples)
+        self._row_bytes = self._average(self._row_bytes, row_bytes)
+        if self._enabled:
+            self._rows = self._clamp(self._rows)
+            if num_rows * row_bytes > self._max_bytes:
+                num_rows = max(1, int(self._max_bytes / row_bytes))
+                data_block = data_block[:num_rows]
+        return data_block, int(num_rows * row_bytes)
+
+    def success(self, full_block, block_bytes, fetch_time, send_time):
+        """ Adapts the number of rows after a block successfully sent
+        Args:
+            full_block: True if the block was fetched using all the rows requested
+            block_bytes: encoded size of the block sent
+            fetch_time: seconds needed to load the block from the Storage layer
+            send_time: seconds needed to send the block to the destination
+        Returns:
+        Raises:
+        """
+        if not self._enabled:
+            return
+        elapsed = max(fetch_time + send_time, 0.001)
+        throughput = block_bytes / elapsed
+        rows = self._rows
+        if elapsed > self._send_time_target:
+            # Too slow, risk of timeouts on the destination
+            rows = rows * max(self._send_time_target / elapsed, self._ERROR_FACTOR)
+        elif full_block:
+            # Only full blocks are meaningful, a partial block means that all the data is already sent
+            if self._throughput is None or throughput >= self._throughput * self._THROUGHPUT_TOLERANCE:
+                rows = rows * self._GROWTH_FACTOR
+            else:
+                rows = rows * self._REDUCTION_FACTOR
+        if full_block:
+            self._throughput = self._average(self._throughput, throughput)
+        self._rows = self._clamp(rows)
+
+    def failure(self):
+        """ Reduces the number of rows after an error reported by the destination """
+        if not self._enabled:
+            return
+        self._rows = self._clamp(self._rows * self._ERROR_FACTOR)
+        self._throughput = None
+
+
 class SendingProcess:
     """ SendingProcess """
 
@@ -242,6 +387,9 @@ class SendingProcess:
     _DATA_SOURCE_STATISTICS = "statistics"
     _DATA_SOURCE_AUDIT = "audit"
 
+    # Maximum time, in seconds, the storage is polled before retrying the notification of new readings
+    _MAX_NOTIFICATION_BACKOFF = 300
+
     # Configuration retrieved from the Configuration Manager
     _CONFIG_CATEGORY_NAME = 'SEND_PR'
     _CONFIG_CATEGORY_DESCRIPTION = 'Configuration of the Sending Process'
@@ -268,10 +416,40 @@ class SendingProcess:
             "type": "integer",
             "default": "5000"
         },
+        "blockSizeAdaptive": {
+            "description": "A switch that enables the adaptation of the block size, within blockSizeMin "
+                           "and blockSizeMax, to maximize the throughput. blockSize is the starting value, "
+                           "the next executions start from the size reached by the previous one.",
+            "type": "boolean",
+            "default": "True"
+        },
+        "blockSizeMin": {
+            "description": "The minimum size of a block of readings when the block size is adapted.",
+            "type": "integer",
+            "default": "100"
+        },
+        "blockSizeMax": {
+            "description": "The maximum size of a block of readings when the block size is adapted.",
+            "type": "integer",
+            "default": "50000"
+        },
+        "blockMaxBytes": {
+            "description": "The maximum size in bytes, as encoded JSON, of a block of readings "
+                           "when the block size is adapted.",
+            "type": "integer",
+            "default": "4194304"
+        },
+        "blockSendTimeTarget": {
+            "description": "The maximum time, expressed in seconds, desired to fetch and send a block "
+                           "when the block size is adapted.",
+            "type": "integer",
+            "default": "10"
+        },
         "sleepInterval": {
             "description": "A period of time, expressed in seconds, "
                            "to wait between attempts to send readings when there are no "
-                           "readings to be sent.",
+                           "readings to be sent. When the source is readings the sending process "
+                           "wakes up as soon as new readings are notified by the south microservices.",
             "type": "integer",
             "default": "5"
         },
@@ -308,10 +486,19 @@ class SendingProcess:
             'duration': int(self._CONFIG_DEFAULT['duration']['default']),
             'source': self._CONFIG_DEFAULT['source']['default'],
             'blockSize': int(self._CONFIG_DEFAULT['blockSize']['default']),
+            'blockSizeAdaptive': self._CONFIG_DEFAULT['blockSizeAdaptive']['default'].upper() == 'TRUE',
+            'blockSizeMin': int(self._CONFIG_DEFAULT['blockSizeMin']['default']),
+            'blockSizeMax': int(self._CONFIG_DEFAULT['blockSizeMax']['default']),
+            'blockMaxBytes': int(self._CONFIG_DEFAULT['blockMaxBytes']['default']),
+            'blockSendTimeTarget': int(self._CONFIG_DEFAULT['blockSendTimeTarget']['default']),
             'sleepInterval': int(self._CONFIG_DEFAULT['sleepInterval']['default']),
             'translator': self._CONFIG_DEFAULT['translator']['default'],
         }
         self._config_from_manager = ""
+        self._block_size = self._create_block_size()
+        """ Size of the blocks of data to fetch and send """
+        self._object_block = {}
+        """ object_block of the managed stream, it keeps the block size adapted by the previous executions """
         # Plugin handling - loading an empty plugin
         self._module_template = self._TRANSLATOR_PATH + "empty." + "empty"
         self._plugin = importlib.import_module(self._module_template)
@@ -333,12 +520,36 @@ class SendingProcess:
         self._log_storage = None
         """" Used to log operations in the Storage Layer """
 
+        self._readings_notification_retry = 0
+        """" Time before which the notification of new readings is not used, the storage is polled """
+        self._readings_notification_backoff = 0
+        """" Seconds the notification is not used after the next failure, doubled at every failure """
+        self._readings_generation = None
+        """" Last generation of the readings notification already handled """
+
         self.input_stream_id = None
         self._log_performance = None
         self._log_debug_level = None
 
         self._event_loop = asyncio.get_event_loop()
 
+    @property
+    def block_size(self):
+        """ Current size of the blocks of data, as rows and as maximum encoded bytes """
+        return self._block_size.status()
+
+    def _create_block_size(self, initial=None):
+        """ Creates the handler of the size of the blocks using the current configuration
+        Args:
+            initial: number of rows of the first block, blockSize if None
+        """
+        return AdaptiveBlockSize(self._config['blockSize'] if initial is None else initial,
+                                 self._config['blockSizeMin'],
+                                 self._config['blockSizeMax'],
+                                 self._config['blockMaxBytes'],
+                                 self._config['blockSendTimeTarget'],
+                                 enabled=self._config['blockSizeAdaptive'] is True)
+
     def _is_stream_id_valid(self, stream_id):
         """ Checks if the provided stream id  is valid
         Args:
@@ -397,7 +608,7 @@ class SendingProcess:
             data_to_send: a list of elements having each the structure :
                 row id     - integer
                 asset code - string
-                timestamp  - timestamp
+                timestamp  - timestamp, ISO-8601 UTC for the readings
                 value      - dictionary, like for example {"lux": 53570.172}
         Raises:
             UnknownDataSource
@@ -434,13 +645,10 @@ class SendingProcess:
         SendingProcess._logger.debug("{0} - position {1} ".format("_load_data_into_memory_readings", last_object_id))
         raw_data = None
         try:
-            # Loads data
-            payload = payload_builder.PayloadBuilder() \
-                .WHERE(['id', '>', last_object_id]) \
-                .LIMIT(self._config['blockSize']) \
-                .ORDER_BY(['id', 'ASC']) \
-                .payload()
-            readings = self._readings.query(payload)
+            # Loads data using the fetch API, keyset on the id, the translators declaring the iso timestamps
+            # receive them already as ISO-8601 UTC, the others in the format of the Storage layer
+            iso_timestamps = self._plugin_info.get('timestamps') == 'iso'
+            readings = self._readings.fetch(last_object_id + 1, self._block_size.rows, iso_timestamps=iso_timestamps)
             raw_data = readings['rows']
         except Exception as _ex:
             _message = _MESSAGES_LIST["e000009"].format(str(_ex))
@@ -464,7 +672,7 @@ class SendingProcess:
         try:
             payload = payload_builder.PayloadBuilder() \
                 .WHERE(['id', '>', last_object_id]) \
-                .LIMIT(self._config['blockSize']) \
+                .LIMIT(self._block_size.rows) \
                 .ORDER_BY(['id', 'ASC']) \
                 .payload()
             statistics_history = self._storage.query_tbl_with_payload('statistics_history', payload)
@@ -561,8 +769,31 @@ class SendingProcess:
             raise
         return last_object_id
 
+    def _block_size_read(self, stream_id):
+        """ Retrieves the block size adapted by the previous executions, kept in the object_block of the stream
+        Args:
+            stream_id: managed stream id
+        Returns:
+            number of rows of the first block, None to start from blockSize: the adaptation is disabled,
+            blockSize was changed since the previous execution or the stream has no block size yet
+        """
+        self._object_block = {}
+        if self._config['blockSizeAdaptive'] is not True:
+            return None
+        try:
+            streams = self._storage.query_tbl('streams', 'id={0}'.format(stream_id))
+            if streams['rows'] and isinstance(streams['rows'][0].get('object_block'), dict):
+                self._object_block = streams['rows'][0]['object_block']
+        except Exception as _ex:
+            _message = _MESSAGES_LIST["e000030"].format(_ex)
+            SendingProcess._logger.warning(_message)
+            return None
+        if self._object_block.get('blockSizeConfigured') != self._config['blockSize']:
+            return None
+        return self._object_block.get('blockSize')
+
     def _last_object_id_update(self, new_last_object_id, stream_id):
-        """ Updates reached position
+        """ Updates reached position, and the adapted block size the next execution starts from
         Args:
             new_last_object_id: Last row id already sent
             stream_id:          Managed stream id
@@ -573,8 +804,13 @@ class SendingProcess:
             SendingProcess._logger.debug("Last position, sent |{0}| ".format(str(new_last_object_id)))
             # TODO : FOGL-623 - avoid the update of the field ts when it will be managed by the DB itself
             #
+            values = {'last_object': new_last_object_id, 'ts': 'now()'}
+            if self._config['blockSizeAdaptive'] is True:
+                self._object_block = dict(self._object_block, blockSize=self._block_size.rows,
+                                          blockSizeConfigured=self._config['blockSize'])
+                values['object_block'] = self._object_block
             payload = payload_builder.PayloadBuilder() \
-                .SET(last_object=new_last_object_id, ts='now()') \
+                .SET(**values) \
                 .WHERE(['id', '=', stream_id]) \
                 .payload()
             self._storage.update_tbl("streams", payload)
@@ -595,14 +831,37 @@ class SendingProcess:
         SendingProcess._logger.debug("{0} - ".format("_send_data_block"))
         try:
             last_object_id = self._last_object_id_read(stream_id)
+            rows_requested = self._block_size.rows
+            fetch_start = time.time()
             data_to_send = self._load_data_into_memory(last_object_id)
+            fetch_time = time.time() - fetch_start
             if data_to_send:
-                data_sent, new_last_object_id, num_sent = self._plugin.plugin_send(self._plugin_handle, data_to_send, stream_id)
+                full_block = len(data_to_send) >= rows_requested
+                try:
+                    data_to_send, block_bytes = self._block_size.fit(data_to_send)
+                except Exception as _ex:
+                    _message = _MESSAGES_LIST["e000028"].format(_ex)
+                    SendingProcess._logger.error(_message)
+                    raise
+                send_start = time.time()
+                try:
+                    data_sent, new_last_object_id, num_sent = self._plugin.plugin_send(self._plugin_handle, data_to_send, stream_id)
+                except Exception:
+                    self._block_size.failure()
+                    raise
+                send_time = time.time() - send_start
                 if data_sent:
+                    self._block_size.success(full_block, block_bytes, fetch_time, send_time)
                     # Updates reached position, statistics and logs the operation within the Storage Layer
                     self._last_object_id_update(new_last_object_id, stream_id)
                     self._update_statistics(num_sent, stream_id)
-                    self._log_storage.write(LogStorage.Severity.INFO, {"sentRows": num_sent})
+                    log = {"sentRows": num_sent}
+                    log.update(self._block_size.status())
+                    self._log_storage.write(LogStorage.Severity.INFO, log)
+                else:
+                    self._block_size.failure()
+                SendingProcess._logger.debug("{0} - block size |{1}| ".format("_send_data_block",
+                                                                              self._block_size.status()))
         except Exception:
             _message = _MESSAGES_LIST["e000006"]
             SendingProcess._logger.error(_message)
@@ -619,6 +878,13 @@ class SendingProcess:
         """
         SendingProcess._logger.debug("{0} - ".format("send_data"))
         try:
+            if self._readings_notification_available():
+                # The generation is read before the first query, so that the readings
+                # appended after the query wake up the first wait
+                try:
+                    self._wait_readings_notification(0)
+                except Exception:
+                    pass
             start_time = time.time()
             elapsed_seconds = 0
             while elapsed_seconds < self._config['duration']:
@@ -630,7 +896,8 @@ class SendingProcess:
                     SendingProcess._logger.error(_message)
                 if not data_sent:
                     SendingProcess._logger.debug("{0} - sleeping".format("send_data"))
-                    time.sleep(self._config['sleepInterval'])
+                    remaining_seconds = self._config['duration'] - (time.time() - start_time)
+                    self._wait_for_data(max(0, min(self._config['sleepInterval'], remaining_seconds)))
                 elapsed_seconds = time.time() - start_time
                 SendingProcess._logger.debug("{0} - elapsed_seconds {1}".format(
                                                             "send_data",
@@ -641,6 +908,61 @@ class SendingProcess:
             self._log_storage.write(LogStorage.Severity.FAILURE, {"error - on send_data": _message})
             raise
 
+    def _readings_notification_available(self):
+        return self._config['source'] == self._DATA_SOURCE_READINGS and self._mgt_address is not None \
+               and time.time() >= self._readings_notification_retry
+
+    def _wait_readings_notification(self, timeout):
+        """ Waits (long-poll) for the notification of new readings after the last generation handled
+        Args:
+            timeout: maximum time to wait, in seconds; 0 reads the current generation
+        Returns:
+        Raises:
+            Exception: the notification is not available, the storage is polled until the next retry
+        """
+        try:
+            url = '/foglamp/notify/readings?timeout={}'.format(timeout)
+            if self._readings_generation is not None:
+                url += '&generation={}'.format(self._readings_generation)
+            conn = http.client.HTTPConnection("{0}:{1}".format(self._mgt_address, self._mgt_port),
+                                              timeout=timeout + self._config['sleepInterval'])
+            conn.request('GET', url=url)
+            r = conn.getresponse()
+            res = r.read().decode()
+            conn.close()
+            if r.status not in range(200, 300):
+                raise RuntimeError("{0} {1}".format(r.status, r.reason))
+            self._readings_generation = json.loads(res)['generation']
+            self._readings_notification_backoff = 0
+        except Exception as _ex:
+            # The last generation handled is kept, the first wait after the retry returns
+            # immediately if readings were notified in the meantime
+            self._readings_notification_backoff = min(
+                max(self._config['sleepInterval'], 2 * self._readings_notification_backoff),
+                self._MAX_NOTIFICATION_BACKOFF)
+            self._readings_notification_retry = time.time() + self._readings_notification_backoff
+            _message = _MESSAGES_LIST["e000029"].format(_ex)
+            SendingProcess._logger.warning(_message)
+            raise
+
+    def _wait_for_data(self, timeout):
+        """ Waits for new data to send, at most timeout seconds.
+            For the readings it waits for the notification of new readings from the core (long-poll),
+            the timer is used as a fallback for the other sources or while the notification is not available.
+        Args:
+            timeout: maximum time to wait, in seconds
+        Returns:
+        Raises:
+        """
+        if not self._readings_notification_available():
+            time.sleep(timeout)
+            return
+        start = time.time()
+        try:
+            self._wait_readings_notification(timeout)
+        except Exception:
+            time.sleep(max(0, timeout - (time.time() - start)))
+
     def _update_statistics(self, num_sent, stream_id):
         """ Updates FogLAMP statistics
         Raises :
@@ -709,6 +1031,12 @@ class SendingProcess:
             self._config['duration'] = int(_config_from_manager['duration']['value'])
             self._config['source'] = _config_from_manager['source']['value']
             self._config['blockSize'] = int(_config_from_manager['blockSize']['value'])
+            self._config['blockSizeAdaptive'] = \
+                True if _config_from_manager['blockSizeAdaptive']['value'].upper() == 'TRUE' else False
+            self._config['blockSizeMin'] = int(_config_from_manager['blockSizeMin']['value'])
+            self._config['blockSizeMax'] = int(_config_from_manager['blockSizeMax']['value'])
+            self._config['blockMaxBytes'] = int(_config_from_manager['blockMaxBytes']['value'])
+            self._config['blockSendTimeTarget'] = int(_config_from_manager['blockSendTimeTarget']['value'])
             self._config['sleepInterval'] = int(_config_from_manager['sleepInterval']['value'])
             self._config['translator'] = _config_from_manager['plugin']['value']
             _config_from_manager['_CONFIG_CATEGORY_NAME'] = config_category_name
@@ -738,6 +1066,8 @@ class SendingProcess:
             if self._is_stream_id_valid(stream_id):
                 # config from sending process
                 self._retrieve_configuration(stream_id, cat_keep_original=True)
+                # The adaptation goes on from the block size reached by the previous execution
+                self._block_size = self._create_block_size(self._block_size_read(stream_id))
                 exec_sending_process = self._config['enable']
                 if self._config['enable']:
                     self._plugin_load()
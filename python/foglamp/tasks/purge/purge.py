@@ -105,9 +105,10 @@ class Purge(FoglampProcess):
         unsent_retained = 0
         start_time = time.strftime('%Y-%m-%d %H:%M:%S.%s', time.localtime(time.time()))
 
-        payload = PayloadBuilder().AGGREGATE(["count", "*"]).payload()
-        result = self._storage.query_tbl_with_payload("readings", payload)
-        total_count = result['rows'][0]['count_*']
+        # The readings count of the assets is maintained by the storage, the readings table is not scanned
+        payload = PayloadBuilder().SELECT("readings").payload()
+        result = self._storage.query_tbl_with_payload("asset_summary", payload)
+        total_count = sum(row['readings'] for row in result['rows'])
 
         payload = PayloadBuilder().AGGREGATE(["min", "last_object"]).payload()
         result = self._storage.query_tbl_with_payload("streams", payload)
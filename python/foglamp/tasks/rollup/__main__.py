@@ -0,0 +1,20 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# FOGLAMP_BEGIN
+# See: http://foglamp.readthedocs.io/
+# FOGLAMP_END
+
+"""Rollup process starter"""
+
+from foglamp.tasks.rollup.rollup import Rollup
+from foglamp.common import logger
+
+__copyright__ = "Copyright (c) 2017 OSIsoft, LLC"
+__license__ = "Apache 2.0"
+__version__ = "${VERSION}"
+
+if __name__ == '__main__':
+    _logger = logger.setup("Rollup")
+    rollup_process = Rollup()
+    rollup_process.run()
@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+
+# FOGLAMP_BEGIN
+# See: http://foglamp.readthedocs.io/
+# FOGLAMP_END
+"""
+Rollup of the readings per minute and per hour.
+
+The numeric values of the readings are summarised, per asset and per datapoint, into the
+readings_minute and readings_hour tables with their min, max, sum and number. The readings
+are read in id order from the position saved in the rollups table by the previous run, and the
+buckets already computed are merged with the new readings. Every bucket holds the id of the last
+reading merged into it, written with its values, so that a block of readings is not merged twice
+when a run stops before saving its position.
+
+The rollups are removed when they are older than their own retention, configured in the ROLLUP
+category, the purge of the readings does not remove them.
+"""
+import asyncio
+import calendar
+import collections
+import datetime
+import json
+import numbers
+import re
+import time
+
+from foglamp.common.configuration_manager import ConfigurationManager
+from foglamp.common.storage_client.payload_builder import PayloadBuilder
+from foglamp.common import logger
+from foglamp.common.process import FoglampProcess
+
+
+__copyright__ = "Copyright (c) 2017 OSIsoft, LLC"
+__license__ = "Apache 2.0"
+__version__ = "${VERSION}"
+
+
+_Bucket = collections.namedtuple('_Bucket', 'min max total readings last_object')
+
+RESOLUTIONS = collections.OrderedDict([('readings_minute', 60), ('readings_hour', 3600)])
+""" Rollup tables to the duration of their buckets, in seconds """
+
+
+class Rollup(FoglampProcess):
+
+    _DEFAULT_ROLLUP_CONFIG = {
+        "blockSize": {
+            "description": "Number of readings read from the storage at a time",
+            "type": "integer",
+            "default": "5000"
+        },
+        "minuteRetention": {
+            "description": "Age of the rollups per minute to be retained, the older ones are removed. (in Hours)",
+            "type": "integer",
+            "default": "168"
+        },
+        "hourRetention": {
+            "description": "Age of the rollups per hour to be retained, the older ones are removed. (in Hours)",
+            "type": "integer",
+            "default": "8760"
+        },
+    }
+    _CONFIG_CATEGORY_NAME = 'ROLLUP'
+    _CONFIG_CATEGORY_DESCRIPTION = 'Rollup of the readings per minute and per hour'
+
+    _ROLLUP_NAME = 'readings'
+    """ Row of the rollups table with the position of the task """
+
+    def __init__(self):
+        super().__init__()
+        self._logger = logger.setup("Rollup")
+
+    def set_configuration(self):
+        """" Set the default configuration for the rollup
+        :return:
+            Configuration information that was set for the rollup process
+        """
+        event_loop = asyncio.get_event_loop()
+        cfg_manager = ConfigurationManager(self._storage)
+        event_loop.run_until_complete(cfg_manager.create_category(self._CONFIG_CATEGORY_NAME,
+                                                                  self._DEFAULT_ROLLUP_CONFIG,
+                                                                  self._CONFIG_CATEGORY_DESCRIPTION))
+        return event_loop.run_until_complete(cfg_manager.get_category_all_items(self._CONFIG_CATEGORY_NAME))
+
+    def _last_object(self):
+        payload = PayloadBuilder().SELECT("last_object").WHERE(["name", "=", self._ROLLUP_NAME]).payload()
+        result = self._storage.query_tbl_with_payload("rollups", payload)
+        return result['rows'][0]['last_object'] if result['rows'] else 0
+
+    def _update_position(self, last_object):
+        # The ids are bigint, they are not passed as integers
+        payload = PayloadBuilder().SET(last_object=str(last_object), ts="now()").\
+            WHERE(["name", "=", self._ROLLUP_NAME]).payload()
+        self._storage.update_tbl("rollups", payload)
+
+    def rollup_readings(self, config):
+        """ Roll up the readings appended since the previous run
+        :return:
+            number of readings rolled up
+        """
+        block_size = int(config['blockSize']['value'])
+        last_object = self._last_object()
+        rolled_up = 0
+        while True:
+            result = self._readings_storage.fetch(last_object + 1, block_size, iso_timestamps=True)
+            readings = result['rows']
+            if not readings:
+                break
+            for table, seconds in RESOLUTIONS.items():
+                self._merge(table, seconds, readings)
+            # The position is saved once the block is rolled up in both the tables
+            last_object = readings[-1]['id']
+            self._update_position(last_object)
+            rolled_up += len(readings)
+            if len(readings) < block_size:
+                break
+        if rolled_up == 0:
+            # The time of the run tells the API that the rollups are up to date
+            self._update_position(last_object)
+        return rolled_up
+
+    def _merge(self, table, seconds, readings):
+        """ Merge a block of readings into the buckets of seconds of table
+
+        The buckets of the block are read with a single query, the readings with an id up to the
+        last_object of a bucket have already been merged into it and are skipped.
+        """
+        bucket_times = [_bucket_start(reading, seconds) for reading in readings]
+        payload = PayloadBuilder().SELECT("asset_code", "datapoint", "bucket_ts", "min", "max", "total", "readings",
+                                          "last_object").\
+            WHERE(["bucket_ts", ">=", min(bucket_times)]).AND_WHERE(["bucket_ts", "<=", max(bucket_times)]).payload()
+        result = self._storage.query_tbl_with_payload(table, payload)
+        # The double precision columns are returned as strings, the timestamps in the time zone of the storage
+        existing = {(row['asset_code'], _bucket_ts(_epoch(row['bucket_ts'])), row['datapoint']):
+                    _Bucket(float(row['min']), float(row['max']), float(row['total']), int(row['readings']),
+                            int(row['last_object'])) for row in result['rows']}
+
+        new_rows = []
+        for (asset_code, bucket_ts), datapoints in aggregate(readings, seconds, existing).items():
+            for datapoint, bucket in datapoints.items():
+                key = (asset_code, bucket_ts, datapoint)
+                if key in existing:
+                    bucket = merge(existing[key], bucket)
+                    # The ids are bigint, they are not passed as integers
+                    payload = PayloadBuilder().SET(min=bucket.min, max=bucket.max, total=bucket.total,
+                                                   readings=bucket.readings, last_object=str(bucket.last_object)).\
+                        WHERE(["asset_code", "=", asset_code]).AND_WHERE(["datapoint", "=", datapoint]).\
+                        AND_WHERE(["bucket_ts", "=", bucket_ts]).payload()
+                    self._storage.update_tbl(table, payload)
+                else:
+                    new_rows.append(collections.OrderedDict([
+                        ("asset_code", asset_code), ("datapoint", datapoint), ("bucket_ts", bucket_ts),
+                        ("min", bucket.min), ("max", bucket.max), ("total", bucket.total),
+                        ("readings", bucket.readings), ("last_object", str(bucket.last_object))]))
+        if new_rows:
+            self._storage.insert_into_tbl(table, json.dumps(new_rows))
+
+    def purge_rollups(self, config):
+        """ Remove the rollups older than their retention """
+        for table, retention in (('readings_minute', config['minuteRetention']['value']),
+                                 ('readings_hour', config['hourRetention']['value'])):
+            payload = PayloadBuilder().WHERE(["bucket_ts", "older", int(retention) * 60 * 60]).payload()
+            self._storage.delete_from_tbl(table, payload)
+
+    def run(self):
+        """" Starts the rollup task
+
+            1. Write and read the rollup task configuration
+            2. Roll up the readings appended since the previous run
+            3. Remove the rollups older than their retention
+        """
+        try:
+            config = self.set_configuration()
+            rolled_up = self.rollup_readings(config)
+            self.purge_rollups(config)
+            self._logger.info("Rollup: %d readings rolled up", rolled_up)
+        except Exception as ex:
+            self._logger.exception(str(ex))
+
+
+def aggregate(readings, seconds, merged=None):
+    """ Summarise the numeric values of readings in buckets of seconds
+
+    :param readings: readings returned by ReadingsStorageClient.fetch() with ISO-8601 timestamps
+    :param merged: (asset code, bucket start, datapoint) to the _Bucket already stored, the readings
+                   with an id up to its last_object are skipped
+    :return: (asset code, bucket start) to the datapoint names to their _Bucket
+    """
+    merged = merged or {}
+    buckets = collections.OrderedDict()
+    for reading in readings:
+        bucket_ts = _bucket_start(reading, seconds)
+        datapoints = buckets.setdefault((reading['asset_code'], bucket_ts), collections.OrderedDict())
+        for datapoint, value in reading['reading'].items():
+            if isinstance(value, bool) or not isinstance(value, numbers.Real):
+                continue
+            # The values of the where clauses are not escaped by the storage, the inserted ones
+            # that look like function calls are not quoted
+            if "'" in datapoint or "(" in datapoint:
+                continue
+            stored = merged.get((reading['asset_code'], bucket_ts, datapoint))
+            if stored is not None and reading['id'] <= stored.last_object:
+                continue
+            # The storage writes the integers as 32 bits ones
+            bucket = _Bucket(float(value), float(value), float(value), 1, reading['id'])
+            datapoints[datapoint] = merge(datapoints[datapoint], bucket) if datapoint in datapoints else bucket
+    return collections.OrderedDict((key, datapoints) for key, datapoints in buckets.items() if datapoints)
+
+
+def merge(bucket, other):
+    return _Bucket(min(bucket.min, other.min), max(bucket.max, other.max), bucket.total + other.total,
+                   bucket.readings + other.readings, max(bucket.last_object, other.last_object))
+
+
+def _bucket_start(reading, seconds):
+    """ Start of the bucket of seconds of a reading with an ISO-8601 timestamp, as written in the rollup tables """
+    user_ts = datetime.datetime.strptime(reading['user_ts'][:19], '%Y-%m-%dT%H:%M:%S')
+    epoch = calendar.timegm(user_ts.timetuple())
+    return _bucket_ts(epoch - epoch % seconds)
+
+
+def _bucket_ts(epoch):
+    return time.strftime('%Y-%m-%d %H:%M:%S+00', time.gmtime(epoch))
+
+
+def _epoch(timestamp):
+    """ Seconds since the epoch of a timestamp returned by the storage, e.g. 2017-11-01 10:00:00+05:30 """
+    match = re.match(r'^(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})(\.\d+)?(([+-])(\d{2}):?(\d{2})?)?$', timestamp)
+    if match is None:
+        raise ValueError('Invalid timestamp {}'.format(timestamp))
+    date_time, _, zone, sign, hours, minutes = match.groups()
+    seconds = calendar.timegm(datetime.datetime.strptime(date_time, '%Y-%m-%d %H:%M:%S').timetuple())
+    if zone:
+        offset = int(hours) * 3600 + int(minutes or 0) * 60
+        seconds -= offset if sign == '+' else -offset
+    return seconds
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+
+# FOGLAMP_BEGIN
+# See: http://foglamp.readthedocs.io/
+# FOGLAMP_END
+
+""" Storage server simulated for the unit tests of the API and of the tasks, the tables are kept in lists
+of rows and the queries are evaluated on them.
+
+The where clauses are chains of "and" conditions, the tests evaluating other conditions, e.g. newer or
+older, or other parts of the payloads, e.g. aggregates, override Storage.query or Storage.compare.
+"""
+
+import datetime
+import json
+import operator
+
+__copyright__ = "Copyright (c) 2017 OSIsoft, LLC"
+__license__ = "Apache 2.0"
+__version__ = "${VERSION}"
+
+START = 1509530400  # 2017-11-01 10:00:00 UTC
+
+OPERATORS = {'=': operator.eq, '<': operator.lt, '<=': operator.le, '>': operator.gt, '>=': operator.ge}
+
+
+def timestamp(epoch, fmt='%Y-%m-%d %H:%M:%S'):
+    """ The UTC timestamp of an epoch, as the storage formats it """
+    return datetime.datetime.utcfromtimestamp(epoch).strftime(fmt)
+
+
+def clauses(where):
+    """ The (column, condition, value) of the conditions of a where clause, the condition is = if omitted """
+    result = []
+    while where is not None:
+        result.append((where['column'], where.get('condition', '='), where['value']))
+        where = where.get('and')
+    return result
+
+
+def conditions(where):
+    """ The (column, condition) of the conditions of a where clause, to check the shape of a query """
+    return [(column, condition) for column, condition, _ in clauses(where)]
+
+
+def converted(row_value, value):
+    """ The value converted to the type of a column, from its value in a row, as the storage does """
+    if isinstance(row_value, int) and isinstance(value, str):
+        return int(value)
+    return value
+
+
+class Storage(object):
+    """Tables as lists of rows, the queries received are kept as (table name, payload)"""
+
+    def __init__(self, **tables):
+        self.tables = tables
+        self.queries = []
+
+    def compare(self, tbl_name, row, column, condition, value):
+        """ Evaluates a condition on a row """
+        return OPERATORS[condition](row[column], converted(row[column], value))
+
+    def select(self, tbl_name, where):
+        rows = self.tables[tbl_name]
+        for column, condition, value in clauses(where):
+            rows = [row for row in rows if self.compare(tbl_name, row, column, condition, value)]
+        return list(rows)
+
+    def query(self, tbl_name, payload):
+        """ The rows of a query with where, sort, skip, limit and return """
+        rows = self.select(tbl_name, payload.get('where'))
+
+        sort = payload.get('sort', [])
+        for order in reversed(sort if isinstance(sort, list) else [sort]):
+            rows.sort(key=lambda row: row[order['column']], reverse=order['direction'] == 'desc')
+        skip = payload.get('skip', 0)
+        rows = rows[skip:skip + payload['limit'] if 'limit' in payload else None]
+
+        if 'return' not in payload:
+            return rows
+        return [dict(self.returned(row, column) for column in payload['return']) for row in rows]
+
+    @staticmethod
+    def returned(row, column):
+        """ The (name, value) of a column of the return list, the formats are not applied """
+        if isinstance(column, str):
+            return column, row[column]
+        if 'json' in column:
+            return column['alias'], row[column['json']['column']][column['json']['properties']]
+        return column.get('alias', column['column']), row[column['column']]
+
+    def query_tbl_with_payload(self, tbl_name, query_payload):
+        payload = json.loads(query_payload)
+        self.queries.append((tbl_name, payload))
+        rows = self.query(tbl_name, payload)
+        return {'count': len(rows), 'rows': rows}
+
+    def update_tbl(self, tbl_name, data):
+        payload = json.loads(data)
+        rows = self.select(tbl_name, payload.get('where'))
+        for row in rows:
+            row.update((column, converted(row.get(column), value)) for column, value in payload['values'].items())
+        return {'response': 'updated', 'rows_affected': len(rows)}
+
+    def insert_into_tbl(self, tbl_name, data):
+        rows = json.loads(data)
+        rows = rows if isinstance(rows, list) else [rows]
+        self.tables[tbl_name].extend(rows)
+        return {'response': 'inserted', 'rows_affected': len(rows)}
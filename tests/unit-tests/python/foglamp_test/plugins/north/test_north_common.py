@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+
+# FOGLAMP_BEGIN
+# See: http://foglamp.readthedocs.io/
+# FOGLAMP_END
+
+import datetime
+import gzip
+import json
+import zlib
+
+import pytest
+
+from foglamp.plugins.north.common import common as plugin_common
+
+__copyright__ = "Copyright (c) 2017 OSIsoft, LLC"
+__license__ = "Apache 2.0"
+__version__ = "${VERSION}"
+
+
+def _strptime_conversion(timestamp):
+    """ Conversion used by the OMF translator before convert_timestamp """
+    return datetime.datetime.strptime(timestamp, '%Y-%m-%d %H:%M:%S.%f+00').isoformat() + 'Z'
+
+
+@pytest.allure.feature("unit")
+@pytest.allure.story("north")
+class TestConvertTimestamp:
+
+    @pytest.mark.parametrize("timestamp, expected", [
+        ("2017-10-11 15:10:51.927191+00", "2017-10-11T15:10:51.927191Z"),
+        ("2017-10-11 15:10:51.9+00", "2017-10-11T15:10:51.900000Z"),
+        ("2017-10-11 15:10:51+00", "2017-10-11T15:10:51.000000Z"),
+        ("2017-10-11 15:10:51.927191+00:00", "2017-10-11T15:10:51.927191Z"),
+        ("2017-10-11T15:10:51.927191Z", "2017-10-11T15:10:51.927191Z"),
+        ("2017-10-11 15:10:51.927191+05:30", "2017-10-11T09:40:51.927191Z"),
+        ("2017-10-11 02:10:51.927191+05", "2017-10-10T21:10:51.927191Z"),
+        ("2017-12-31 22:10:51.5-0230", "2018-01-01T00:40:51.500000Z"),
+        ("2017-10-11 15:10:51.927191", "2017-10-11T15:10:51.927191Z"),
+        ("2016-02-29 23:59:59.999999+00", "2016-02-29T23:59:59.999999Z"),
+        ("2017-10-31 00:00:00+00", "2017-10-31T00:00:00.000000Z"),
+    ])
+    def test_convert_timestamp(self, timestamp, expected):
+        assert expected == plugin_common.convert_timestamp(timestamp)
+
+    @pytest.mark.parametrize("timestamp", [
+        "2017-10-11",
+        "2017-10-11 15:10:51.927191+0x",
+        "2017-13-11 15:10:51.927191+01",
+        "2017-13-45 25:99:99.1+00",
+        "2017-10-11 24:10:51.927191+00",
+        "2017-10-11 15:60:51+00",
+        "2017-02-29 15:10:51.927191+00",
+        "2017-04-31T15:10:51Z",
+        "not a timestamp",
+    ])
+    def test_convert_timestamp_invalid(self, timestamp):
+        with pytest.raises(ValueError):
+            plugin_common.convert_timestamp(timestamp)
+
+    def test_same_result_as_strptime(self):
+        for timestamp in ["2017-10-11 15:10:51.927191+00", "2017-10-11 15:10:51.100000+00",
+                          "2017-01-01 00:00:00.000001+00", "2017-12-31 23:59:59.999999+00"]:
+            assert _strptime_conversion(timestamp) == plugin_common.convert_timestamp(timestamp)
+
+    def test_convert_timestamps_block(self):
+        raw_data = [
+            {"id": 1, "user_ts": "2017-10-11 15:10:51.927191+00"},
+            {"id": 2, "user_ts": "2017-10-11 15:10:51.927191+01"},
+            {"id": 3, "user_ts": "2017-10-11 15:10:51.927191+01"},
+            {"id": 4, "user_ts": "2017-10-11T15:10:52.000001Z"},
+        ]
+        assert raw_data is plugin_common.convert_timestamps(raw_data)
+        assert ["2017-10-11T15:10:51.927191Z", "2017-10-11T14:10:51.927191Z",
+                "2017-10-11T14:10:51.927191Z", "2017-10-11T15:10:52.000001Z"] == [row["user_ts"] for row in raw_data]
+
+    def test_convert_timestamps_block_invalid(self):
+        with pytest.raises(ValueError):
+            plugin_common.convert_timestamps([{"id": 1, "ts": "2017-10-11"}], key="ts")
+
+
+@pytest.allure.feature("unit")
+@pytest.allure.story("north")
+class TestAssetDiscovery:
+
+    @pytest.mark.parametrize("value, expected", [
+        (967, "integer"),
+        (-2 ** 53, "integer"),
+        (2 ** 63 + 1, "number"),
+        (967.0, "number"),
+        (967.5, "number"),
+        (True, "number"),
+        ("967", "number"),
+        ("abc", "string"),
+        (float("nan"), "string"),
+    ])
+    def test_evaluate_type(self, value, expected):
+        assert expected == plugin_common.evaluate_type(value)
+
+    def test_identify_unique_asset_codes(self):
+        raw_data = [
+            {"asset_code": "a", "reading": {"x": 1}},
+            {"asset_code": "b", "reading": {"y": "abc"}},
+            {"asset_code": "a", "reading": {"x": 2, "z": 1.5}},
+        ]
+        assert [{"asset_code": "a", "asset_data": {"x": 1, "z": 1.5}},
+                {"asset_code": "b", "asset_data": {"y": "abc"}}] == plugin_common.identify_unique_asset_codes(raw_data)
+        # The readings are not modified
+        assert {"x": 1} == raw_data[0]["reading"]
+
+
+@pytest.allure.feature("unit")
+@pytest.allure.story("north")
+class TestRequestCompression:
+
+    _BODY = json.dumps([{"containerid": "measurement_fogbench/temperature",
+                         "values": [{"Time": "2017-10-11T15:10:51.927191Z", "x": i}]} for i in range(100)])
+
+    @pytest.mark.parametrize("method, decompress", [
+        ("gzip", gzip.decompress),
+        ("deflate", zlib.decompress),
+    ])
+    def test_compress(self, method, decompress):
+        compression = plugin_common.RequestCompression(method, 6, 1024)
+        body, encoding = compression.compress(self._BODY)
+        assert method == encoding
+        assert self._BODY.encode() == decompress(body)
+        status = compression.status()
+        assert 1 == status["compressedRequests"]
+        assert len(self._BODY) == status["uncompressedBytes"]
+        assert len(body) == status["compressedBytes"]
+        assert status["compressionRatio"] > 1
+
+    def test_below_threshold_or_disabled(self):
+        assert (b"[]", None) == plugin_common.RequestCompression("gzip", 6, 1024).compress("[]")
+        compression = plugin_common.RequestCompression()
+        assert not compression.enabled
+        assert (self._BODY.encode(), None) == compression.compress(self._BODY)
+        assert 0 == compression.status()["compressedRequests"]
+
+    @pytest.mark.parametrize("method, level", [
+        ("zip", 6),
+        ("gzip", 0),
+        ("gzip", 10),
+    ])
+    def test_invalid(self, method, level):
+        with pytest.raises(ValueError):
+            plugin_common.RequestCompression(method, level, 1024)
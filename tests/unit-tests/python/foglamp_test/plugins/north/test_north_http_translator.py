@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+
+# FOGLAMP_BEGIN
+# See: http://foglamp.readthedocs.io/
+# FOGLAMP_END
+
+""" Tests of the HTTP translator, the aiohttp session is simulated by a class that records
+the requests it receives and answers with the status selected by the test.
+
+pytest -s tests/unit-tests/python/foglamp_test/plugins/north/test_north_http_translator.py
+"""
+
+import asyncio
+import json
+
+import pytest
+
+from foglamp.plugins.north.common.exceptions import HttpTranslatorException
+from foglamp.plugins.north.http_translator import http_translator
+
+__copyright__ = "Copyright (c) 2017 OSIsoft, LLC"
+__license__ = "Apache 2.0"
+__version__ = "${VERSION}"
+
+
+class _Response(object):
+
+    def __init__(self, status):
+        self.status = status
+        self.reason = 'OK' if status < 400 else 'Error'
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return False
+
+    async def text(self):
+        return '{}'
+
+
+class _Session(object):
+    """aiohttp.ClientSession, status(body) returns the status of the response to a request"""
+
+    created = []
+
+    def __init__(self, connector=None):
+        self.connector = connector
+        self.bodies = []
+        self.status = lambda body: 200
+        self.running = 0
+        self.max_running = 0
+        self.closed = False
+        _Session.created.append(self)
+
+    def post(self, url, data, headers):
+        return self._post(json.loads(data))
+
+    def _post(self, body):
+        session = self
+
+        class _Request(object):
+            async def __aenter__(self):
+                session.running += 1
+                session.max_running = max(session.max_running, session.running)
+                # The other requests can start meanwhile
+                await asyncio.sleep(0.01)
+                session.running -= 1
+                session.bodies.append(body)
+                return _Response(session.status(body))
+
+            async def __aexit__(self, exc_type, exc, tb):
+                return False
+
+        return _Request()
+
+    async def close(self):
+        self.closed = True
+
+
+def _payloads(count, asset_codes=('A', 'B')):
+    return [{'id': i, 'asset_code': asset_codes[i % len(asset_codes)], 'read_key': str(i),
+             'user_ts': '2017-11-01 10:00:00.000000+00', 'reading': {'x': i}} for i in range(1, count + 1)]
+
+
+@pytest.fixture
+def translator(monkeypatch):
+    config = {key: {'value': item['default']} for key, item in http_translator._DEFAULT_CONFIG.items()}
+    config['chunk_size']['value'] = '100'
+    config['max_concurrency']['value'] = '2'
+    monkeypatch.setattr(http_translator, 'config', config)
+    monkeypatch.setattr(http_translator.aiohttp, 'TCPConnector', lambda limit: {'limit': limit})
+    monkeypatch.setattr(http_translator.aiohttp, 'ClientSession', _Session)
+    monkeypatch.setattr(_Session, 'created', [])
+    return http_translator.HttpTranslatorPlugin()
+
+
+@pytest.allure.feature("unit")
+@pytest.allure.story("north")
+class TestHttpTranslator:
+
+    def test_chunks_grouped_by_asset(self, translator):
+        assert (True, 250, 250) == translator.send_payloads(_payloads(250), 1)
+        bodies = sorted(_Session.created[0].bodies, key=lambda body: body[0]['readings'][0]['read_key'])
+        assert [100, 100, 50] == [sum(len(group['readings']) for group in body) for body in bodies]
+        assert [['B', 'A']] * 3 == [[group['asset_code'] for group in body] for body in bodies]
+        assert {'read_key': '1', 'user_ts': '2017-11-01 10:00:00.000000+00', 'reading': {'x': 1}} == \
+            bodies[0][0]['readings'][0]
+
+    def test_shared_session(self, translator):
+        translator.send_payloads(_payloads(10), 1)
+        translator.send_payloads(_payloads(10), 1)
+        assert 1 == len(_Session.created)
+        # A connection for each concurrent request
+        assert {'limit': 2} == _Session.created[0].connector
+
+        translator.shutdown()
+        assert _Session.created[0].closed
+        assert translator.session is None
+
+    def test_max_concurrency(self, translator):
+        translator.send_payloads(_payloads(1000), 1)
+        session = _Session.created[0]
+        assert 10 == len(session.bodies)
+        assert 2 == session.max_running
+
+    def test_position_of_the_failed_chunk(self, translator):
+        translator.send_payloads(_payloads(1), 1)
+        # The chunk of the readings 201-300 is not accepted
+        _Session.created[0].status = lambda body: 500 if body[0]['readings'][0]['read_key'] == '201' else 200
+        assert (True, 200, 200) == translator.send_payloads(_payloads(500), 1)
+
+    def test_failure_of_the_first_chunk(self, translator):
+        translator.send_payloads(_payloads(1), 1)
+        _Session.created[0].status = lambda body: 400
+        assert (False, None, 0) == translator.send_payloads(_payloads(500), 1)
+
+    @pytest.mark.parametrize("status", [400, 404, 500, 503])
+    def test_error_status(self, translator, status):
+        session = _Session()
+        session.status = lambda body: status
+        with pytest.raises(HttpTranslatorException):
+            asyncio.get_event_loop().run_until_complete(translator._send([{'asset_code': 'A'}], session))
+
+    def test_cancel_tasks_timeout(self, translator):
+        http_translator.config['shutdown_wait_time']['value'] = '0'
+        event_loop = asyncio.get_event_loop()
+        done = asyncio.ensure_future(asyncio.sleep(0))
+        event_loop.run_until_complete(done)
+        pending = asyncio.ensure_future(asyncio.sleep(60))
+        translator.tasks = [done, pending]
+        event_loop.run_until_complete(translator.cancel_tasks())
+        assert [] == translator.tasks
+        # The cancellation is processed by the next iteration of the loop
+        event_loop.run_until_complete(asyncio.sleep(0))
+        assert pending.cancelled()
+        assert not done.cancelled()
@@ -0,0 +1,314 @@
+# -*- coding: utf-8 -*-
+
+# FOGLAMP_BEGIN
+# See: http://foglamp.readthedocs.io/
+# FOGLAMP_END
+
+""" Tests of the OMF translator, the PI Connector Relay is simulated by a session that records
+the OMF messages it receives and fails the ones selected by the test.
+
+pytest -s tests/unit-tests/python/foglamp_test/plugins/north/test_north_omf.py
+"""
+
+import collections
+import concurrent.futures
+import json
+import threading
+
+import pytest
+import requests
+
+from foglamp.plugins.north.common import exceptions as plugin_exceptions
+from foglamp.plugins.north.omf import omf
+
+__copyright__ = "Copyright (c) 2017 OSIsoft, LLC"
+__license__ = "Apache 2.0"
+__version__ = "${VERSION}"
+
+_TYPE_ID = "0001"
+_CATEGORY = "SEND_PR_1"
+
+
+class _Response(object):
+
+    def __init__(self, status_code):
+        self.status_code = status_code
+        self.text = ""
+
+
+class _Relay(object):
+    """PI Connector Relay, the messages for which fails(message_type, message) is True get a 500 response"""
+
+    def __init__(self):
+        self.messages = []
+        self.fails = None
+        self._lock = threading.Lock()
+
+    def post(self, url, headers, data, verify, timeout):
+        message = json.loads(data)
+        with self._lock:
+            self.messages.append((headers['messagetype'], message))
+        failed = self.fails is not None and self.fails(headers['messagetype'], message)
+        return _Response(500 if failed else 204)
+
+    def close(self):
+        pass
+
+    def readings_messages(self):
+        """ The Data messages of readings, not the static and link data of the assets """
+        return [message for message_type, message in self.messages
+                if message_type == 'Data' and 'containerid' in message[0]]
+
+
+class _Storage(object):
+    """omf_created_objects table"""
+
+    def __init__(self, asset_codes=()):
+        self.asset_codes = list(asset_codes)
+        self.queries = 0
+        self.inserting_threads = set()
+
+    def query_tbl_with_payload(self, tbl_name, query_payload):
+        assert 'omf_created_objects' == tbl_name
+        self.queries += 1
+        return {'rows': [{'asset_code': asset_code} for asset_code in self.asset_codes]}
+
+    def insert_into_tbl(self, tbl_name, payload):
+        assert 'omf_created_objects' == tbl_name
+        self.inserting_threads.add(threading.current_thread())
+        self.asset_codes.append(json.loads(payload)['asset_code'])
+
+    def delete_from_tbl(self, tbl_name, payload):
+        self.asset_codes = []
+
+
+class _SendingProcess(object):
+
+    def __init__(self, storage):
+        self._storage = storage
+
+    def _fetch_configuration(self, cat_name=None, cat_desc=None, cat_config=None, cat_keep_original=False):
+        return {key: dict(item, value=item['default']) for key, item in cat_config.items()}
+
+
+def _rows(count, asset_codes=('TI',), start=1):
+    return [{'id': i, 'asset_code': asset_codes[i % len(asset_codes)],
+             'user_ts': '2017-11-01 10:00:{:02d}.000000+00'.format(i % 60), 'reading': {'x': i}}
+            for i in range(start, start + count)]
+
+
+@pytest.fixture
+def relay(monkeypatch):
+    relay = _Relay()
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=4)
+    monkeypatch.setattr(omf, '_session', relay)
+    monkeypatch.setattr(omf, '_executor', executor)
+    monkeypatch.setattr(omf, '_logger', omf._LOGGER)
+    monkeypatch.setattr(omf, '_config', {'URL': 'https://pi:5460/ingress/messages', 'producerToken': 'token',
+                                         'OMFMaxRetry': 2, 'OMFRetrySleepTime': 0, 'OMFHttpTimeout': 1,
+                                         'OMFMaxMessageBytes': 1000000, 'OMFDataGrouped': True,
+                                         'StaticData': {'Location': 'Palo Alto'}})
+    monkeypatch.setattr(omf, '_config_omf_types', {'type-id': {'value': _TYPE_ID}})
+    monkeypatch.setattr(omf, '_omf_created_types', set())
+    monkeypatch.setattr(omf, '_omf_created_types_key', None)
+    yield relay
+    executor.shutdown(wait=True)
+
+
+def _plugin(storage=None):
+    return omf.OmfTranslatorPlugin(_SendingProcess(storage or _Storage()))
+
+
+def _send(raw_data, storage=None):
+    return _plugin(storage)._send_in_memory_data_chunks(raw_data, _CATEGORY, _TYPE_ID)
+
+
+@pytest.allure.feature("unit")
+@pytest.allure.story("north")
+class TestSendInMemoryDataChunks:
+
+    def test_single_message(self, relay):
+        assert (True, 100, 100) == _send(_rows(100))
+        messages = relay.readings_messages()
+        assert 1 == len(messages)
+        assert list(range(1, 101)) == [values['x'] for values in messages[0][0]['values']]
+
+    @pytest.mark.parametrize("max_bytes", [300, 1000, 5000])
+    def test_split_to_max_bytes(self, relay, max_bytes):
+        omf._config['OMFMaxMessageBytes'] = max_bytes
+        assert (True, 100, 100) == _send(_rows(100))
+        messages = relay.readings_messages()
+        assert 1 < len(messages)
+        assert all(len(json.dumps(message)) <= max_bytes for message in messages)
+        # All the rows, once and in order
+        assert list(range(1, 101)) == [values['x'] for message in messages for values in message[0]['values']]
+
+    def test_resized_once(self, relay):
+        # The rows have the same size, the number of rows of a message is evaluated only from the first one
+        omf._config['OMFMaxMessageBytes'] = 2000
+        _send(_rows(100))
+        sizes = [len(message[0]['values']) for message in relay.readings_messages()]
+        assert len(set(sizes[:-1])) == 1
+        assert sizes[-1] <= sizes[0]
+
+    def test_row_larger_than_max_bytes(self, relay):
+        omf._config['OMFMaxMessageBytes'] = 10
+        assert (True, 3, 3) == _send(_rows(3))
+        assert [1, 1, 1] == [len(message[0]['values']) for message in relay.readings_messages()]
+
+    def test_failure_keeps_last_acknowledged_position(self, relay):
+        omf._config['OMFMaxMessageBytes'] = 1000
+        chunks = []
+
+        def fails(message_type, message):
+            # The third message of readings fails, however many times it is retried
+            if message_type != 'Data' or 'containerid' not in message[0]:
+                return False
+            if message not in chunks:
+                chunks.append(message)
+            return chunks.index(message) == 2
+
+        relay.fails = fails
+        is_data_sent, new_position, num_sent = _send(_rows(100))
+        sent = [values['x'] for message in chunks[:2] for values in message[0]['values']]
+        assert (True, sent[-1], len(sent)) == (is_data_sent, new_position, num_sent)
+        # The sending stops at the failed message
+        assert 3 == len(chunks)
+        assert chunks[2] == relay.readings_messages()[-1]
+
+    def test_failure_of_the_first_message(self, relay):
+        relay.fails = lambda message_type, message: message_type == 'Data' and 'containerid' in message[0]
+        with pytest.raises(Exception):
+            _send(_rows(100))
+
+
+def _type_of(asset_code):
+    """ True for the OMF Type message of asset_code """
+    return lambda message_type, message: \
+        message_type == 'Type' and message[0]['id'] == '{}_{}_typename_sensor'.format(_TYPE_ID, asset_code)
+
+
+@pytest.allure.feature("unit")
+@pytest.allure.story("north")
+class TestCreateOmfObjects:
+
+    def test_created_concurrently(self, relay):
+        # The Type messages of the 3 assets are all waiting at the same time, or the barrier breaks
+        barrier = threading.Barrier(3, timeout=5)
+
+        def fails(message_type, message):
+            if message_type == 'Type':
+                barrier.wait()
+            return False
+
+        relay.fails = fails
+        storage = _Storage()
+        _plugin(storage)._create_omf_objects(_rows(9, ('A', 'B', 'C')), _CATEGORY, _TYPE_ID)
+        assert ['A', 'B', 'C'] == sorted(storage.asset_codes)
+        # The Type, the Container, the static data and the links of every asset
+        assert {'Type': 3, 'Container': 3, 'Data': 6} == collections.Counter(m for m, _ in relay.messages)
+        # The Storage layer is updated only by the thread of the caller
+        assert {threading.current_thread()} == storage.inserting_threads
+
+    def test_error_of_an_asset(self, relay):
+        relay.fails = _type_of('B')
+        storage = _Storage()
+        with pytest.raises(plugin_exceptions.URLFetchError):
+            _plugin(storage)._create_omf_objects(_rows(9, ('A', 'B', 'C')), _CATEGORY, _TYPE_ID)
+        # The other assets are created and flagged
+        assert ['A', 'C'] == sorted(storage.asset_codes)
+        assert {(_TYPE_ID, 'A'), (_TYPE_ID, 'C')} == omf._omf_created_types
+
+        # Only the failed asset is created by the next block
+        relay.messages = []
+        relay.fails = None
+        _plugin(storage)._create_omf_objects(_rows(9, ('A', 'B', 'C')), _CATEGORY, _TYPE_ID)
+        assert [True] == [_type_of('B')(message_type, message) for message_type, message in relay.messages
+                          if message_type == 'Type']
+        assert ['A', 'B', 'C'] == sorted(storage.asset_codes)
+
+
+@pytest.allure.feature("unit")
+@pytest.allure.story("north")
+class TestSession:
+
+    @pytest.fixture
+    def plugin_data(self, relay, monkeypatch):
+        # plugin_init replaces the compression and the flag of the recreation of the objects
+        monkeypatch.setattr(omf, '_compression', omf._compression)
+        monkeypatch.setattr(omf, '_recreate_omf_objects', omf._recreate_omf_objects)
+        data = {key: {'value': item['default']} for key, item in omf._CONFIG_DEFAULT_OMF.items()}
+        data['OMFMaxConcurrency']['value'] = '3'
+        data.update({'stream_id': {'value': 1}, '_CONFIG_CATEGORY_NAME': _CATEGORY,
+                     'sending_process_instance': _SendingProcess(_Storage())})
+        return data
+
+    def test_shared_session(self, plugin_data):
+        omf.plugin_init(plugin_data)
+        session, executor = omf._session, omf._executor
+        assert isinstance(session, requests.Session)
+        # A connection for each concurrent request, kept alive across the requests
+        adapter = session.get_adapter('https://pi:5460/ingress/messages')
+        assert 3 == adapter._pool_maxsize
+        assert 3 == executor._max_workers
+
+        omf.plugin_shutdown(plugin_data)
+        assert (None, None) == (omf._session, omf._executor)
+        with pytest.raises(RuntimeError):
+            executor.submit(lambda: None)
+
+
+@pytest.allure.feature("unit")
+@pytest.allure.story("north")
+class TestOmfTypesCache:
+
+    def test_created_types_skipped(self, relay):
+        storage = _Storage(['A'])
+        _plugin(storage)._create_omf_objects(_rows(10, ('A', 'B')), _CATEGORY, _TYPE_ID)
+        # Only the asset not yet created
+        assert [True] == [_type_of('B')(message_type, message) for message_type, message in relay.messages
+                          if message_type == 'Type']
+        assert {(_TYPE_ID, 'A'), (_TYPE_ID, 'B')} == omf._omf_created_types
+
+        relay.messages = []
+        _plugin(storage)._create_omf_objects(_rows(10, ('A', 'B')), _CATEGORY, _TYPE_ID)
+        assert [] == relay.messages
+        # The cache is loaded from the Storage layer once
+        assert 1 == storage.queries
+
+    def test_reloaded_for_another_type_id(self, relay):
+        storage = _Storage(['A'])
+        plugin = _plugin(storage)
+        assert {(_TYPE_ID, 'A')} == plugin._omf_types_already_created(_CATEGORY, _TYPE_ID)
+        assert {('0002', 'A')} == plugin._omf_types_already_created(_CATEGORY, '0002')
+        assert 2 == storage.queries
+
+    def test_cleared_on_recreation(self, relay):
+        storage = _Storage(['A'])
+        plugin = _plugin(storage)
+        plugin._omf_types_already_created(_CATEGORY, _TYPE_ID)
+        plugin._deleted_omf_types_already_created(_CATEGORY, _TYPE_ID)
+        plugin._create_omf_objects(_rows(1, ('A',)), _CATEGORY, _TYPE_ID)
+        assert [True] == [_type_of('A')(message_type, message) for message_type, message in relay.messages
+                          if message_type == 'Type']
+
+
+@pytest.allure.feature("unit")
+@pytest.allure.story("north")
+class TestDataGrouping:
+
+    def test_grouped_per_container(self, relay):
+        _send(_rows(9, ('A', 'B', 'C')))
+        message = relay.readings_messages()[0]
+        # A container per asset, with its readings in order
+        assert ['measurement_B', 'measurement_C', 'measurement_A'] == [data['containerid'] for data in message]
+        assert [[1, 4, 7], [2, 5, 8], [3, 6, 9]] == [[values['x'] for values in data['values']] for data in message]
+        assert '2017-11-01T10:00:01.000000Z' == message[0]['values'][0]['Time']
+
+    def test_not_grouped(self, relay):
+        omf._config['OMFDataGrouped'] = False
+        _send(_rows(9, ('A', 'B', 'C')))
+        message = relay.readings_messages()[0]
+        # A container for every reading
+        assert list(range(1, 10)) == [data['values'][0]['x'] for data in message]
+        assert all(1 == len(data['values']) for data in message)
@@ -3,7 +3,10 @@
 # FOGLAMP_BEGIN
 # See: http://foglamp.readthedocs.io/
 # FOGLAMP_END
+import csv
+import io
 import random
+import re
 import json
 
 import asyncpg
@@ -63,6 +66,13 @@ async def add_master_data(rows=0):
         await conn.execute("""INSERT INTO foglamp.readings(asset_code,read_key,reading,user_ts,ts)
                            VALUES($1, $2, $3, $4, $5);""", test_data_asset_code, uid,
                            json.dumps({sensor_code_1: x, sensor_code_2: y}), ts, datetime.now(tz=timezone.utc))
+    # The readings are not appended by the storage, their summary is written here
+    await conn.execute("""INSERT INTO foglamp.asset_summary(asset_code,readings,first_ts,last_ts,last_id,last_reading)
+                       SELECT asset_code, count(*) OVER (), min(user_ts) OVER (), user_ts, id, reading
+                       FROM foglamp.readings WHERE asset_code = $1 ORDER BY user_ts DESC, id DESC LIMIT 1
+                       ON CONFLICT (asset_code) DO UPDATE SET readings = EXCLUDED.readings,
+                       first_ts = EXCLUDED.first_ts, last_ts = EXCLUDED.last_ts, last_id = EXCLUDED.last_id,
+                       last_reading = EXCLUDED.last_reading;""", test_data_asset_code)
     await conn.close()
     return uid_list, x_list, y_list, ts_list
 
@@ -70,6 +80,7 @@ async def add_master_data(rows=0):
 async def delete_master_data():
     conn = await asyncpg.connect(database=__DB_NAME)
     await conn.execute('''DELETE from foglamp.readings WHERE asset_code IN ($1)''', test_data_asset_code)
+    await conn.execute('''DELETE from foglamp.asset_summary WHERE asset_code IN ($1)''', test_data_asset_code)
     await conn.close()
 
 
@@ -653,3 +664,117 @@ class TestBrowseAssets:
         assert retval[-1]["max"] == self.test_data_x_val_list[-1]
         assert retval[-1]["min"] == self.test_data_x_val_list[-1]
         assert retval[-1]["time"] == grouped_ts[-1]
+
+    """
+    Tests for the most recent reading, the pages of readings, the export and the downsampled series
+    """
+    async def test_get_asset_latest(self):
+        """
+        Verify that the most recent reading is returned from the summary of the asset
+        http://localhost:8082/foglamp/latest/TESTAPI
+        """
+        conn = http.client.HTTPConnection(BASE_URL)
+        conn.request("GET", '/foglamp/latest/{}'.format(test_data_asset_code))
+        r = conn.getresponse()
+        assert 200 == r.status
+        r = r.read().decode()
+        conn.close()
+        retval = json.loads(r)
+
+        assert retval['reading'][sensor_code_1] == self.test_data_x_val_list[-1]
+        assert retval['reading'][sensor_code_2] == self.test_data_y_val_list[-1]
+        assert retval['timestamp'] == self.test_data_ts_list[-1]
+
+    async def test_get_asset_latest_unknown_asset(self):
+        """
+        Verify that an asset without readings is not found
+        http://localhost:8082/foglamp/latest/TESTAPI_UNKNOWN
+        """
+        conn = http.client.HTTPConnection(BASE_URL)
+        conn.request("GET", '/foglamp/latest/{}_UNKNOWN'.format(test_data_asset_code))
+        r = conn.getresponse()
+        conn.close()
+        assert 404 == r.status
+
+    async def test_get_asset_readings_pages(self):
+        """
+        Verify that the pages linked by the Link header return every reading once, the most recent first
+        http://localhost:8082/foglamp/asset/TESTAPI?limit=8
+        """
+        path = '/foglamp/asset/{}?limit={}'.format(test_data_asset_code, 8)
+        x_values = []
+        while path:
+            conn = http.client.HTTPConnection(BASE_URL)
+            conn.request("GET", path)
+            r = conn.getresponse()
+            assert 200 == r.status
+            links = dict((rel, url) for url, rel in re.findall(r'<([^>]*)>; rel="(\w+)"', r.getheader('Link', '')))
+            retval = json.loads(r.read().decode())
+            conn.close()
+            x_values += [elements['reading'][sensor_code_1] for elements in retval]
+            path = links.get('next')
+
+        assert list(reversed(self.test_data_x_val_list)) == x_values
+
+    async def test_get_asset_export(self):
+        """
+        Verify that all the readings are exported as newline delimited JSON, the oldest first
+        http://localhost:8082/foglamp/export/TESTAPI
+        """
+        conn = http.client.HTTPConnection(BASE_URL)
+        conn.request("GET", '/foglamp/export/{}'.format(test_data_asset_code))
+        r = conn.getresponse()
+        assert 200 == r.status
+        assert r.getheader('Content-Type').startswith('application/x-ndjson')
+        r = r.read().decode()
+        conn.close()
+        lines = [json.loads(line) for line in r.splitlines()]
+
+        assert self.test_data_x_val_list == [line['reading'][sensor_code_1] for line in lines]
+        assert [line['timestamp'] for line in lines] == sorted(line['timestamp'] for line in lines)
+
+    async def test_get_asset_export_csv(self):
+        """
+        Verify that all the readings are exported as CSV, a column per datapoint
+        http://localhost:8082/foglamp/export/TESTAPI?format=csv
+        """
+        conn = http.client.HTTPConnection(BASE_URL)
+        conn.request("GET", '/foglamp/export/{}?format=csv'.format(test_data_asset_code))
+        r = conn.getresponse()
+        assert 200 == r.status
+        assert 'attachment; filename="{}.csv"'.format(test_data_asset_code) == r.getheader('Content-Disposition')
+        r = r.read().decode()
+        conn.close()
+        rows = list(csv.reader(io.StringIO(r)))
+
+        assert ['id', 'timestamp', sensor_code_1, sensor_code_2, 'other_datapoints'] == rows[0]
+        assert [str(x) for x in self.test_data_x_val_list] == [row[2] for row in rows[1:]]
+
+    async def test_get_asset_sensor_readings_points(self):
+        """
+        Verify that the series has at most points values and keeps the min and max of the readings
+        http://localhost:8082/foglamp/asset/TESTAPI/x/series?points=5
+        """
+        conn = http.client.HTTPConnection(BASE_URL)
+        conn.request("GET", '/foglamp/asset/{}/{}/series?points={}'.format(test_data_asset_code, sensor_code_1, 5))
+        r = conn.getresponse()
+        assert 200 == r.status
+        r = r.read().decode()
+        conn.close()
+        retval = json.loads(r)
+
+        assert 1 <= len(retval) <= 5
+        assert [elements['timestamp'] for elements in retval] == sorted(elements['timestamp'] for elements in retval)
+        assert max(self.test_data_x_val_list) == max(float(elements['max']) for elements in retval)
+        assert min(self.test_data_x_val_list) == min(float(elements['min']) for elements in retval)
+
+    async def test_get_asset_sensor_readings_points_bad_request(self):
+        """
+        Verify that the number of points is checked
+        http://localhost:8082/foglamp/asset/TESTAPI/x/series?points=1
+        """
+        conn = http.client.HTTPConnection(BASE_URL)
+        conn.request("GET", '/foglamp/asset/{}/{}/series?points={}'.format(test_data_asset_code, sensor_code_1, 1))
+        r = conn.getresponse()
+        conn.close()
+        assert 400 == r.status
@@ -4,10 +4,14 @@
 # See: http://foglamp.readthedocs.io/
 # FOGLAMP_END
 
+import time
+
 import asyncpg
 import requests
 import pytest
 
+from foglamp.services.core.response_cache import ResponseCache
+
 __author__ = "Praveen Garg"
 __copyright__ = "Copyright (c) 2017 OSIsoft, LLC"
 __license__ = "Apache 2.0"
@@ -38,6 +42,12 @@ async def update_statistics(val):
     await conn.close()
 
 
+@pytest.fixture(autouse=True)
+def expire_response_cache():
+    """ The tests change the table directly, the responses cached by the server expire before every test """
+    time.sleep(ResponseCache.ttl('/foglamp/statistics'))
+
+
 @pytest.allure.feature("api")
 @pytest.allure.story("statistics")
 class TestStatistics:
@@ -6,7 +6,7 @@
 
 import asyncpg
 import asyncio
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import requests
 import pytest
 
@@ -146,3 +146,45 @@ class TestStatisticsHistory:
         r = requests.get(BASE_URL + '/statistics/history?limit=x')
         res = r.json()
         assert 400 == res['error']['code']
+
+    async def test_get_statistics_history_keys(self):
+        """ Verify that the sets have the statistics of the keys given only
+        """
+        r = requests.get(BASE_URL + '/statistics/history', params={'keys': 'READINGS,PURGED', 'limit': 2})
+        res = r.json()
+        assert 200 == r.status_code
+
+        assert len(res['statistics']) <= 2
+        for statistics in res['statistics']:
+            assert {'history_ts', 'READINGS', 'PURGED'} == set(statistics)
+
+    async def test_get_statistics_history_interval(self):
+        """ Verify that the statistics summed per hour are the sums of the sets of the hour
+        """
+        # The last complete hour, in UTC as the intervals
+        end = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+        start = end - timedelta(hours=1)
+        to = end.strftime('%Y-%m-%d %H:%M:%S+00')
+
+        r = requests.get(BASE_URL + '/statistics/history',
+                         params={'keys': 'READINGS', 'interval': 3600, 'limit': 1, 'to': to})
+        res = r.json()
+        assert 200 == r.status_code
+        assert 3600 == res['interval']
+
+        r2 = requests.get(BASE_URL + '/statistics/history',
+                          params={'keys': 'READINGS', 'from': start.strftime('%Y-%m-%d %H:%M:%S+00'), 'to': to})
+        res2 = r2.json()
+        assert 200 == r2.status_code
+
+        if not res2['statistics']:
+            assert [] == res['statistics']
+        else:
+            assert 1 == len(res['statistics'])
+            assert sum(statistics['READINGS'] for statistics in res2['statistics']) == \
+                res['statistics'][0]['READINGS']
+
+    async def test_get_statistics_history_interval_with_bad_data(self):
+        r = requests.get(BASE_URL + '/statistics/history?interval=0')
+        res = r.json()
+        assert 400 == res['error']['code']
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+
+# FOGLAMP_BEGIN
+# See: http://foglamp.readthedocs.io/
+# FOGLAMP_END
+
+""" Tests of the asset browser calls served from the asset summary table, the storage server is
+simulated by the fake storage keeping the rows of the summary.
+
+pytest -s tests/unit-tests/python/foglamp_test/services/core/test_browser_latest.py
+"""
+
+import asyncio
+import json
+
+import pytest
+from aiohttp.test_utils import make_mocked_request
+
+from foglamp.services.core import connect
+from foglamp.services.core.api import browser
+from foglamp.services.core.single_flight import SingleFlight
+from foglamp_test.fake_storage import Storage
+
+__copyright__ = "Copyright (c) 2017 OSIsoft, LLC"
+__license__ = "Apache 2.0"
+__version__ = "${VERSION}"
+
+
+@pytest.fixture
+def storage(monkeypatch):
+    SingleFlight.reset()
+    storage = Storage(asset_summary=[{'asset_code': 'TI', 'readings': 21, 'last_ts': '2017-11-01 10:00:10.000',
+                                      'last_reading': {'x': 21}},
+                                     {'asset_code': 'HUMIDITY', 'readings': 3, 'last_ts': '2017-11-01 09:00:00.000',
+                                      'last_reading': {'humidity': 30}}])
+    monkeypatch.setattr(connect, 'get_storage', lambda: storage)
+    return storage
+
+
+def _get(handler, path, **match_info):
+    request = make_mocked_request('GET', path, match_info=match_info)
+    response = asyncio.get_event_loop().run_until_complete(handler(request))
+    return json.loads(response.body.decode())
+
+
+@pytest.allure.feature("unit")
+@pytest.allure.story("api")
+class TestBrowserLatest:
+
+    def test_asset_counts(self, storage):
+        assert [{'asset_code': 'HUMIDITY', 'count': 3}, {'asset_code': 'TI', 'count': 21}] == \
+               _get(browser.asset_counts, '/foglamp/asset')
+        # The readings are not counted
+        assert ['asset_summary'] == [tbl_name for tbl_name, _ in storage.queries]
+
+    def test_latest(self, storage):
+        assert {'timestamp': '2017-11-01 10:00:10.000', 'reading': {'x': 21}} == \
+               _get(browser.asset_latest, '/foglamp/latest/TI', asset_code='TI')
+        tbl_name, payload = storage.queries[0]
+        assert 'asset_summary' == tbl_name
+        assert {'column': 'asset_code', 'condition': '=', 'value': 'TI'} == payload['where']
+
+    def test_latest_unknown_asset(self, storage):
+        with pytest.raises(browser.web.HTTPNotFound):
+            _get(browser.asset_latest, '/foglamp/latest/PRESSURE', asset_code='PRESSURE')
+
+    def test_datapoint_named_latest(self, storage):
+        app = browser.web.Application()
+        browser.setup(app)
+        request = make_mocked_request('GET', '/foglamp/asset/TI/latest', app=app)
+        match_info = asyncio.get_event_loop().run_until_complete(app.router.resolve(request))
+        assert browser.asset_reading == match_info.handler
+        assert {'asset_code': 'TI', 'reading': 'latest'} == dict(match_info)
@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+
+# FOGLAMP_BEGIN
+# See: http://foglamp.readthedocs.io/
+# FOGLAMP_END
+
+""" Tests of the keyset pagination and of the export of the asset browser, the storage server
+is simulated by the fake storage, evaluating the queries on a list of readings.
+
+pytest -s tests/unit-tests/python/foglamp_test/services/core/test_browser_pagination.py
+"""
+
+import asyncio
+import csv
+import io
+import json
+import re
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer, make_mocked_request
+
+from foglamp.services.core import connect
+from foglamp.services.core.api import browser
+from foglamp_test.fake_storage import Storage, conditions
+
+__copyright__ = "Copyright (c) 2017 OSIsoft, LLC"
+__license__ = "Apache 2.0"
+__version__ = "${VERSION}"
+
+
+class _Storage(Storage):
+    """Readings table, the asset summary is the one of the readings"""
+
+    def query(self, tbl_name, payload):
+        if tbl_name == 'asset_summary':
+            # The most recent reading of the asset
+            assert ['last_reading'] == payload['return']
+            rows = self.select('readings', payload['where'])
+            return [{'last_reading': rows[-1]['reading']}] if rows else []
+        return super().query(tbl_name, payload)
+
+
+@pytest.fixture
+def storage(monkeypatch):
+    # Pairs of readings with the same timestamp
+    readings = [{'id': i, 'asset_code': 'TI', 'user_ts': '2017-11-01 10:00:{:02d}.000000+00'.format(i // 2),
+                 'reading': {'x': i}} for i in range(1, 22)]
+    readings.append({'id': 22, 'asset_code': 'OTHER', 'user_ts': '2017-11-01 10:00:30.000000+00',
+                     'reading': {'x': 22}})
+    storage = _Storage(readings=readings)
+    monkeypatch.setattr(connect, 'get_storage', lambda: storage)
+    return storage
+
+
+def _get(path, handler=browser.asset, reading=None):
+    match_info = {'asset_code': 'TI'}
+    if reading is not None:
+        match_info['reading'] = reading
+    request = make_mocked_request('GET', path, match_info=match_info)
+    response = asyncio.get_event_loop().run_until_complete(handler(request))
+    links = dict((rel, url) for url, rel in re.findall(r'<([^>]*)>; rel="(\w+)"', response.headers.get('Link', '')))
+    return json.loads(response.body.decode()), links
+
+
+@pytest.allure.feature("unit")
+@pytest.allure.story("api")
+class TestBrowserPagination:
+
+    def test_walk_forward_and_back(self, storage):
+        path = '/foglamp/asset/TI?limit=4'
+        pages = []
+        while path:
+            rows, links = _get(path)
+            pages.append([row['reading']['x'] for row in rows])
+            path = links.get('next')
+        # The readings of the same timestamp are split across the pages without being skipped
+        assert [[21, 20, 19, 18], [17, 16, 15, 14], [13, 12, 11, 10], [9, 8, 7, 6], [5, 4, 3, 2], [1]] == pages
+
+        rows, links = _get('/foglamp/asset/TI?limit=4')
+        rows, links = _get(links['next'])
+        rows, links = _get(links['next'])
+        assert [13, 12, 11, 10] == [row['reading']['x'] for row in rows]
+        rows, links = _get(links['prev'])
+        assert [17, 16, 15, 14] == [row['reading']['x'] for row in rows]
+        # The cursors are not returned with the readings
+        assert ['reading', 'timestamp'] == sorted(rows[0].keys())
+
+    def test_constant_cost(self, storage):
+        rows, links = _get('/foglamp/asset/TI?limit=4')
+        storage.queries = []
+        _get(links['next'])
+        # No offset, the queries start at the cursor
+        assert all('skip' not in payload for _, payload in storage.queries)
+        assert [[('asset_code', '='), ('user_ts', '='), ('id', '<')], [('asset_code', '='), ('user_ts', '<')]] == \
+            [conditions(payload['where']) for _, payload in storage.queries]
+
+    def test_not_shifted_by_inserts(self, storage):
+        rows, links = _get('/foglamp/asset/TI?limit=5')
+        storage.tables['readings'].append({'id': 23, 'asset_code': 'TI',
+                                           'user_ts': '2017-11-01 10:00:40.000000+00', 'reading': {'x': 23}})
+        rows, links = _get(links['next'])
+        assert [16, 15, 14, 13, 12] == [row['reading']['x'] for row in rows]
+
+    def test_asset_reading(self, storage):
+        rows, links = _get('/foglamp/asset/TI/x?limit=3', handler=browser.asset_reading, reading='x')
+        assert [21, 20, 19] == [row['x'] for row in rows]
+        rows, links = _get(links['next'], handler=browser.asset_reading, reading='x')
+        assert [18, 17, 16] == [row['x'] for row in rows]
+
+    def test_skip(self, storage):
+        rows, links = _get('/foglamp/asset/TI?limit=4&skip=4')
+        assert [17, 16, 15, 14] == [row['reading']['x'] for row in rows]
+        assert 'skip' not in links['next']
+
+    @pytest.mark.parametrize("query", ['after=notacursor', 'after=WyJ4Il0=&before=WyJ4Il0=', 'skip=2&after=WyJ4Il0=',
+                                       # ["2017-11-01' OR '1'='1", 1]
+                                       'after=WyIyMDE3LTExLTAxJyBPUiAnMSc9JzEiLCAxXQ=='])
+    def test_bad_request(self, storage, query):
+        with pytest.raises(browser.web.HTTPBadRequest):
+            _get('/foglamp/asset/TI?' + query)
+
+
+def _export(query):
+    app = web.Application()
+    browser.setup(app)
+
+    async def export():
+        client = TestClient(TestServer(app))
+        await client.start_server()
+        try:
+            response = await client.get('/foglamp/export/TI' + query)
+            return response.status, response.headers, await response.text()
+        finally:
+            await client.close()
+    return asyncio.get_event_loop().run_until_complete(export())
+
+
+@pytest.allure.feature("unit")
+@pytest.allure.story("api")
+class TestBrowserExport:
+
+    def test_ndjson(self, storage, monkeypatch):
+        monkeypatch.setattr(browser, '__EXPORT_PAGE_SIZE', 4)
+        status, headers, text = _export('')
+        assert 200 == status
+        assert headers['Content-Type'].startswith('application/x-ndjson')
+        lines = [json.loads(line) for line in text.splitlines()]
+        # Oldest first, across the pages
+        assert list(range(1, 22)) == [line['id'] for line in lines]
+        assert {'id': 1, 'timestamp': '2017-11-01 10:00:00.000000+00', 'reading': {'x': 1}} == lines[0]
+        # Every page is read from the position of the previous one
+        assert all('skip' not in payload for _, payload in storage.queries)
+
+    def test_csv_time_range(self, storage):
+        storage.tables['readings'][4]['reading'] = {'x': 5, 'y': {'z': 1}}
+        status, headers, text = _export('?format=csv&from=2017-11-01 10:00:02&to=2017-11-01 10:00:04')
+        assert 200 == status
+        assert 'attachment; filename="TI.csv"' == headers['Content-Disposition']
+        rows = list(csv.reader(io.StringIO(text)))
+        assert ['id', 'timestamp', 'x', 'y', 'other_datapoints'] == rows[0]
+        assert [['4', '2017-11-01 10:00:02.000000+00', '4', '', ''],
+                ['5', '2017-11-01 10:00:02.000000+00', '5', '{"z": 1}', ''],
+                ['6', '2017-11-01 10:00:03.000000+00', '6', '', ''],
+                ['7', '2017-11-01 10:00:03.000000+00', '7', '', '']] == rows[1:]
+
+    def test_csv_datapoints(self, storage, monkeypatch):
+        monkeypatch.setattr(browser, '__EXPORT_PAGE_SIZE', 4)
+        storage.tables['readings'][20]['reading'] = {'x': 21, 'w': 'last'}
+        storage.tables['readings'][10]['reading'] = {'x': 11, 'v': [1, 2]}
+        status, headers, text = _export('?format=csv')
+        assert 200 == status
+        rows = list(csv.reader(io.StringIO(text)))
+        # The datapoints of the most recent reading are columns, the ones found in the next pages are not
+        assert ['id', 'timestamp', 'w', 'x', 'other_datapoints'] == rows[0]
+        assert ['11', '2017-11-01 10:00:05.000000+00', '', '11', '{"v": [1, 2]}'] == rows[11]
+        assert ['21', '2017-11-01 10:00:10.000000+00', 'last', '21', ''] == rows[-1]
+        assert 22 == len(rows)
+
+    @pytest.mark.parametrize("query", ['?format=xml', "?from=2017-11-01' OR '1'='1"])
+    def test_bad_request(self, storage, query):
+        status, _, _ = _export(query)
+        assert 400 == status
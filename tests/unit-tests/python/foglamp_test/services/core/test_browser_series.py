@@ -0,0 +1,272 @@
+# -*- coding: utf-8 -*-
+
+# FOGLAMP_BEGIN
+# See: http://foglamp.readthedocs.io/
+# FOGLAMP_END
+
+""" Tests of the downsampled series of the asset browser, the storage server is simulated
+by the fake storage, evaluating the time bucket aggregates on a list of readings.
+
+pytest -s tests/unit-tests/python/foglamp_test/services/core/test_browser_series.py
+"""
+
+import asyncio
+import calendar
+import datetime
+import json
+import math
+from collections import OrderedDict
+
+import pytest
+from aiohttp.test_utils import make_mocked_request
+
+from foglamp.services.core import connect
+from foglamp.services.core.api import browser
+from foglamp_test.fake_storage import OPERATORS, START, Storage, clauses, conditions, timestamp
+
+__copyright__ = "Copyright (c) 2017 OSIsoft, LLC"
+__license__ = "Apache 2.0"
+__version__ = "${VERSION}"
+
+_NOW = START + 86400.5
+_ROLLED_UP = _NOW - 90
+_ROLLUP_TABLES = {'readings_minute': 60, 'readings_hour': 3600}
+_FORMATS = {'YYYY-MM-DD HH24:MI:SS': '%Y-%m-%d %H:%M:%S', 'YYYY-MM-DD HH24:MI': '%Y-%m-%d %H:%M',
+            'YYYY-MM-DD HH24': '%Y-%m-%d %H'}
+
+
+def _selection(where):
+    """ The function telling if a reading or rollup, by its epoch, meets the time conditions of a where clause """
+    bounds = []
+    for column, condition, value in clauses(where):
+        if column in ('user_ts', 'bucket_ts'):
+            if condition == 'newer':
+                bounds.append(('>', _NOW - value))
+            else:
+                value = calendar.timegm(datetime.datetime.strptime(value[:19], '%Y-%m-%d %H:%M:%S').timetuple())
+                bounds.append((condition, value))
+    return lambda epoch: all(OPERATORS[condition](epoch, value) for condition, value in bounds)
+
+
+def _aggregates(payload, rows):
+    """ The aggregates of the payload on (epoch, value) rows, grouped as the storage does, not sorted """
+    groups = OrderedDict()
+    if 'timebucket' in payload:
+        size = int(payload['timebucket']['size'])
+        for epoch, value in rows:
+            groups.setdefault(timestamp(size * math.floor(epoch / size)), []).append(value)
+    elif 'group' in payload:
+        fmt = _FORMATS[payload['group']['format']]
+        for epoch, value in rows:
+            groups.setdefault(timestamp(epoch, fmt), []).append(value)
+    else:
+        groups[None] = [value for _, value in rows]
+    operations = {'min': lambda values: str(min(values)) if values else '',
+                  'max': lambda values: str(max(values)) if values else '',
+                  'avg': lambda values: str(sum(values) / len(values)) if values else '',
+                  'sum': lambda values: str(sum(values)) if values else '',
+                  'count': len}
+    result = []
+    for group, values in reversed(list(groups.items())):
+        row = {aggregate['alias']: operations[aggregate['operation']](values) for aggregate in payload['aggregate']}
+        if group is not None:
+            row['timestamp'] = group
+        result.append(row)
+    return result
+
+
+class _Storage(Storage):
+    """Readings of one asset, one per second, as (epoch, value), and their rollups"""
+
+    def __init__(self, readings):
+        super().__init__(rollups=[])
+        self.readings = readings
+
+    @property
+    def readings_queries(self):
+        return [payload for tbl_name, payload in self.queries if tbl_name == 'readings']
+
+    @property
+    def rollup_queries(self):
+        return [(tbl_name, payload) for tbl_name, payload in self.queries if tbl_name in _ROLLUP_TABLES]
+
+    def query(self, tbl_name, payload):
+        if tbl_name == 'rollups':
+            return self.tables[tbl_name]
+        if tbl_name in _ROLLUP_TABLES:
+            return self._rollup_rows(_ROLLUP_TABLES[tbl_name], payload)
+        if payload['aggregate'][0].get('column') == 'user_ts':
+            if not self.readings:
+                return [{'first': '', 'last': ''}]
+            return [{'first': timestamp(self.readings[0][0]) + '.250000+00',
+                     'last': timestamp(self.readings[-1][0]) + '.750000+00'}]
+        selected = _selection(payload['where'])
+        return _aggregates(payload, [(epoch, value) for epoch, value in self.readings if selected(epoch)])
+
+    def _rollup_rows(self, resolution, payload):
+        rollups = dict()
+        for epoch, value in self.readings:
+            bucket = rollups.setdefault(resolution * math.floor(epoch / resolution), [value, value, 0, 0])
+            bucket[:] = [min(bucket[0], value), max(bucket[1], value), bucket[2] + value, bucket[3] + 1]
+        selected = _selection(payload['where'])
+        rollups = {epoch: bucket for epoch, bucket in rollups.items() if selected(epoch)}
+
+        if 'return' in payload:
+            # A row per rollup, the most recent first
+            fmt = _FORMATS[payload['return'][0]['format']]
+            return [{'timestamp': timestamp(epoch, fmt), 'min': str(bucket[0]), 'max': str(bucket[1]),
+                     'total': str(bucket[2]), 'readings': bucket[3]}
+                    for epoch, bucket in sorted(rollups.items(), reverse=True)][:payload['limit']]
+
+        size = int(payload['timebucket']['size']) if 'timebucket' in payload else 0
+        buckets = dict()
+        for epoch, bucket in rollups.items():
+            grouped = buckets.setdefault(size * math.floor(epoch / size) if size else 0, [])
+            grouped.append(bucket)
+        # The sums are numeric values, returned as strings
+        rows = [{'min': str(min(b[0] for b in grouped)), 'max': str(max(b[1] for b in grouped)),
+                 'total': str(sum(b[2] for b in grouped)), 'readings': str(sum(b[3] for b in grouped))}
+                for grouped in buckets.values()]
+        if size:
+            for row, epoch in zip(rows, buckets):
+                row['timestamp'] = timestamp(epoch)
+        return rows or [{'min': '', 'max': '', 'total': '', 'readings': ''}]
+
+
+def _expected(readings, size=0):
+    """ The min, max and average of the readings per interval of size seconds, the most recent first """
+    intervals = OrderedDict()
+    for epoch, value in readings:
+        intervals.setdefault(size * math.floor(epoch / size) if size else None, []).append(value)
+    return [(min(values), max(values), sum(values) / len(values)) for values in reversed(list(intervals.values()))]
+
+
+def _values(rows):
+    return [(float(row['min']), float(row['max']), float(row['average'])) for row in rows]
+
+
+@pytest.fixture
+def readings(monkeypatch):
+    # A day of readings, one per second, with a peak and a trough after the last rollup
+    readings = [(START + i, 1000 if i == 50000 else -5 if i == 86390 else i % 10) for i in range(86400)]
+    storage = _Storage(readings)
+    monkeypatch.setattr(connect, 'get_storage', lambda: storage)
+    monkeypatch.setattr(browser.time, 'time', lambda: _NOW)
+    return storage
+
+
+def _series(query, handler=browser.asset_averages, path='series'):
+    request = make_mocked_request('GET', '/foglamp/asset/TI/x/{}{}'.format(path, query),
+                                  match_info={'asset_code': 'TI', 'reading': 'x'})
+    response = asyncio.get_event_loop().run_until_complete(handler(request))
+    return json.loads(response.body.decode())
+
+
+@pytest.allure.feature("unit")
+@pytest.allure.story("api")
+class TestBrowserSeries:
+
+    @pytest.mark.parametrize("points", [2, 100, 500, 1000])
+    def test_points(self, readings, points):
+        rows = _series('?points={}'.format(points))
+        assert len(rows) <= points
+        # The peak is preserved
+        assert '1000' in [row['max'] for row in rows]
+        assert [row['timestamp'] for row in rows] == sorted(row['timestamp'] for row in rows)
+        assert readings.readings_queries[-1]['timebucket']['size'] == str(math.ceil(86399.5 / (points - 1)))
+
+    def test_time_window(self, readings):
+        _series('?points=61&hours=1')
+        # The range of the readings is not read
+        assert 1 == len(readings.readings_queries)
+        assert '60' == readings.readings_queries[0]['timebucket']['size']
+        assert 'newer' == readings.readings_queries[0]['where']['and']['condition']
+
+    def test_no_readings(self, monkeypatch):
+        monkeypatch.setattr(connect, 'get_storage', lambda: _Storage([]))
+        assert [] == _series('?points=10')
+
+    @pytest.mark.parametrize("points", ['x', '1', '100000'])
+    def test_bad_request(self, readings, points):
+        with pytest.raises(browser.web.HTTPBadRequest):
+            _series('?points=' + points)
+
+    @pytest.mark.parametrize("timestamp, epoch", [
+        ('2017-11-01 10:00:00+00', START),
+        ('2017-11-01 10:00:00.5+00', START + 0.5),
+        ('2017-11-01 15:30:00+05:30', START),
+        ('2017-11-01 05:00:00-05', START),
+    ])
+    def test_epoch(self, timestamp, epoch):
+        assert epoch == browser._epoch(timestamp)
+
+
+@pytest.allure.feature("unit")
+@pytest.allure.story("api")
+class TestBrowserRollups:
+
+    @pytest.fixture
+    def rollups(self, readings):
+        readings.tables['rollups'].append({'ts': timestamp(_ROLLED_UP) + '.5+00'})
+        return readings
+
+    @pytest.mark.parametrize("points, table, size", [(100, 'readings_minute', 900), (10, 'readings_hour', 10800)])
+    def test_points(self, rollups, points, table, size):
+        rows = _series('?points={}'.format(points))
+        assert len(rows) <= points
+        assert [row['timestamp'] for row in rows] == sorted(row['timestamp'] for row in rows)
+        assert [table] == [tbl_name for tbl_name, _ in rollups.rollup_queries]
+        payload = rollups.rollup_queries[0][1]
+        assert str(size) == payload['timebucket']['size']
+        assert 'bucket_ts' == payload['timebucket']['timestamp']
+        assert [('asset_code', '='), ('datapoint', '='), ('bucket_ts', '>='), ('bucket_ts', '<')] == \
+            conditions(payload['where'])
+        # The time range, and the readings before and after the rollups
+        assert 3 == len(rollups.readings_queries)
+        # The intervals at the edges merge the rollups and the readings, weighted by their number
+        assert _expected(rollups.readings, size)[::-1] == _values(rows)
+
+    def test_seconds_from_readings(self, rollups):
+        # Intervals shorter than a minute
+        _series('?points=2000')
+        assert [] == rollups.rollup_queries
+        assert 'user_ts' == rollups.readings_queries[-1]['timebucket']['timestamp']
+
+    def test_group(self, rollups):
+        rows = _series('?group=minutes&limit=3&hours=1')
+        assert ['2017-11-02 09:59', '2017-11-02 09:58', '2017-11-02 09:57'] == [row['timestamp'] for row in rows]
+        assert {'timestamp': '2017-11-02 09:57', 'min': '0', 'max': '9', 'average': '4.5'} == rows[2]
+        # The minutes after the last rollup are read from the readings
+        assert ('-5', '9') == (rows[0]['min'], rows[0]['max'])
+        tbl_name, payload = rollups.rollup_queries[0]
+        assert 'readings_minute' == tbl_name
+        assert {'column': 'bucket_ts', 'condition': '<', 'value': '2017-11-02 09:58:00+00'} == \
+            payload['where']['and']['and']['and']
+        assert 2 == len(rollups.readings_queries)
+
+    @pytest.mark.parametrize("query, seconds, table", [
+        ('?hours=24', 86400, 'readings_hour'),
+        ('?hours=5', 18000, 'readings_hour'),
+        # An hour of readings is not rolled up per hour
+        ('?hours=1', 3600, 'readings_minute'),
+        ('?minutes=90', 5400, 'readings_minute'),
+        ('?seconds=600', 600, 'readings_minute'),
+    ])
+    def test_summary(self, rollups, query, seconds, table):
+        rows = _series(query, handler=browser.asset_summary, path='summary')['x']
+        assert [table] == [tbl_name for tbl_name, _ in rollups.rollup_queries]
+        # The readings at the edges of the time limit are read, the summary is the one of the readings
+        assert _expected([(epoch, value) for epoch, value in rollups.readings if epoch > _NOW - seconds]) == \
+            _values(rows)
+
+    def test_summary_in_seconds(self, rollups):
+        # The time limit does not span enough minutes
+        _series('?seconds=120', handler=browser.asset_summary, path='summary')
+        assert [] == rollups.rollup_queries
+        assert 1 == len(rollups.readings_queries)
+
+    def test_not_available(self, readings):
+        _series('?group=hours')
+        _series('?hours=1', handler=browser.asset_summary, path='summary')
+        assert [] == readings.rollup_queries
+        assert 2 == len(readings.readings_queries)
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+
+# FOGLAMP_BEGIN
+# See: http://foglamp.readthedocs.io/
+# FOGLAMP_END
+
+""" Tests of the notification of new readings, waited for (long-poll) by the north sending processes.
+
+pytest -s tests/unit-tests/python/foglamp_test/services/core/test_readings_notification.py
+"""
+
+import asyncio
+import time
+
+import pytest
+
+from foglamp.services.core.readings_notification import ReadingsNotification
+
+__copyright__ = "Copyright (c) 2017 OSIsoft, LLC"
+__license__ = "Apache 2.0"
+__version__ = "${VERSION}"
+
+
+def _run(coroutine):
+    return asyncio.get_event_loop().run_until_complete(coroutine)
+
+
+@pytest.allure.feature("unit")
+@pytest.allure.story("core")
+class TestReadingsNotification:
+
+    def test_notify_releases_the_waiters(self):
+        generation, readings = _run(ReadingsNotification.wait(timeout=0))
+
+        async def notify_later():
+            await asyncio.sleep(0.05)
+            return ReadingsNotification.notify(10)
+
+        start = time.time()
+        waiters = asyncio.gather(ReadingsNotification.wait(timeout=5), ReadingsNotification.wait(timeout=5),
+                                 notify_later())
+        first, second, notified = _run(waiters)
+        assert time.time() - start < 1
+        assert (generation + 1, readings + 10) == first == second
+        assert generation + 1 == notified
+
+    def test_already_notified(self):
+        generation, _ = _run(ReadingsNotification.wait(timeout=0))
+        ReadingsNotification.notify(1)
+        start = time.time()
+        # The readings notified after the generation handled are returned at once
+        assert generation + 1 == _run(ReadingsNotification.wait(generation, timeout=5))[0]
+        assert time.time() - start < 1
+
+    def test_timeout(self):
+        generation, readings = _run(ReadingsNotification.wait(timeout=0))
+        assert (generation, readings) == _run(ReadingsNotification.wait(generation, timeout=0.05))
@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+
+# FOGLAMP_BEGIN
+# See: http://foglamp.readthedocs.io/
+# FOGLAMP_END
+
+""" Tests of the response cache of the REST API, the handlers are simulated
+by a function that counts the requests it receives.
+
+pytest -s tests/unit-tests/python/foglamp_test/services/core/test_response_cache.py
+"""
+
+import asyncio
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import make_mocked_request
+
+from foglamp.services.core.readings_notification import ReadingsNotification
+from foglamp.services.core.response_cache import ResponseCache, cache_middleware
+
+__copyright__ = "Copyright (c) 2017 OSIsoft, LLC"
+__license__ = "Apache 2.0"
+__version__ = "${VERSION}"
+
+
+class _Handler(object):
+    """Returns the number of requests received"""
+
+    def __init__(self, status=200):
+        self.requests = 0
+        self.status = status
+
+    async def __call__(self, request):
+        self.requests += 1
+        return web.json_response({"requests": self.requests}, status=self.status)
+
+
+@pytest.fixture
+def handler():
+    ResponseCache.clear()
+    yield _Handler()
+    ResponseCache.clear()
+
+
+def _get(handler, path, method='GET', **headers):
+    async def get():
+        middleware_handler = await cache_middleware(None, handler)
+        return await middleware_handler(make_mocked_request(method, path, headers=headers))
+    return asyncio.get_event_loop().run_until_complete(get())
+
+
+@pytest.allure.feature("unit")
+@pytest.allure.story("api")
+class TestResponseCache:
+
+    def test_cached(self, handler):
+        first = _get(handler, '/foglamp/statistics')
+        second = _get(handler, '/foglamp/statistics')
+        assert 1 == handler.requests
+        assert first.body == second.body
+        assert first.headers['ETag'] == second.headers['ETag']
+        assert 'application/json' == second.content_type
+        assert (1, 1) == (ResponseCache.hits, ResponseCache.misses)
+
+        # Another query string is another response
+        _get(handler, '/foglamp/statistics?limit=1')
+        assert 2 == handler.requests
+
+    def test_not_cached(self, handler):
+        _get(handler, '/foglamp/audit')
+        _get(handler, '/foglamp/audit')
+        _get(handler, '/foglamp/asset', method='POST')
+        _get(handler, '/foglamp/asset', method='POST')
+        assert 4 == handler.requests
+        assert 'ETag' not in _get(handler, '/foglamp/audit').headers
+
+    def test_errors_not_cached(self):
+        ResponseCache.clear()
+        handler = _Handler(status=404)
+        _get(handler, '/foglamp/asset/unknown')
+        _get(handler, '/foglamp/asset/unknown')
+        assert 2 == handler.requests
+
+    def test_not_modified(self, handler):
+        etag = _get(handler, '/foglamp/audit/logcode').headers['ETag']
+        response = _get(handler, '/foglamp/audit/logcode', **{'If-None-Match': etag})
+        assert 304 == response.status
+        assert etag == response.headers['ETag']
+        assert 200 == _get(handler, '/foglamp/audit/logcode', **{'If-None-Match': '"other"'}).status
+
+    def test_expired(self, handler, monkeypatch):
+        monkeypatch.setitem(ResponseCache.ROUTE_TTLS, '/foglamp/statistics', 0)
+        etag = _get(handler, '/foglamp/statistics').headers['ETag']
+        response = _get(handler, '/foglamp/statistics', **{'If-None-Match': etag})
+        assert 2 == handler.requests
+        # The body changed, so the ETag
+        assert 200 == response.status
+        assert etag != response.headers['ETag']
+
+    def test_no_cache(self, handler):
+        _get(handler, '/foglamp/statistics')
+        _get(handler, '/foglamp/statistics', **{'Cache-Control': 'no-cache'})
+        assert 2 == handler.requests
+        # The response is cached again
+        _get(handler, '/foglamp/statistics')
+        assert 2 == handler.requests
+
+    def test_invalidate(self, handler):
+        for path in ('/foglamp/category/PURGE', '/foglamp/category/PURGE/age', '/foglamp/statistics'):
+            _get(handler, path)
+        ResponseCache.invalidate('/foglamp/category/PURGE')
+        for path in ('/foglamp/category/PURGE', '/foglamp/category/PURGE/age', '/foglamp/statistics'):
+            _get(handler, path)
+        assert 5 == handler.requests
+
+        ResponseCache.invalidate()
+        _get(handler, '/foglamp/statistics')
+        assert 6 == handler.requests
+
+    def test_not_invalidated_by_new_readings(self, handler):
+        for path in ('/foglamp/asset', '/foglamp/asset/sensor', '/foglamp/statistics'):
+            _get(handler, path)
+        ReadingsNotification.notify(10)
+        for path in ('/foglamp/asset', '/foglamp/asset/sensor', '/foglamp/statistics'):
+            _get(handler, path)
+        assert 3 == handler.requests
+
+    def test_cached_while_readings_notified(self, handler):
+        async def notifying_handler(request):
+            ReadingsNotification.notify(10)
+            return await handler(request)
+
+        _get(notifying_handler, '/foglamp/statistics')
+        _get(handler, '/foglamp/statistics')
+        assert 1 == handler.requests
+
+    def test_invalidated_while_computed(self, handler):
+        async def invalidating_handler(request):
+            ResponseCache.invalidate('/foglamp/statistics')
+            return await handler(request)
+
+        _get(invalidating_handler, '/foglamp/statistics')
+        _get(handler, '/foglamp/statistics')
+        assert 2 == handler.requests
+
+    def test_max_entries(self, handler, monkeypatch):
+        monkeypatch.setattr(ResponseCache, 'MAX_ENTRIES', 2)
+        for path in ('/foglamp/asset/a', '/foglamp/asset/b', '/foglamp/asset/a', '/foglamp/asset/c'):
+            _get(handler, path)
+        # b is the least recently used
+        _get(handler, '/foglamp/asset/a')
+        _get(handler, '/foglamp/asset/b')
+        assert 4 == handler.requests
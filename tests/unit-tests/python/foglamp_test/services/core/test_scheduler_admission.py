@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+
+# FOGLAMP_BEGIN
+# See: http://foglamp.readthedocs.io/
+# FOGLAMP_END
+
+""" Tests of the admission control of the scheduler, no storage is needed:
+the task processes are simulated.
+
+pytest -s tests/unit-tests/python/foglamp_test/services/core/test_scheduler_admission.py
+"""
+
+import asyncio
+import datetime
+import logging
+import time
+import uuid
+
+import pytest
+
+from foglamp.services.core.scheduler import resources
+from foglamp.services.core.scheduler.scheduler import Scheduler
+from foglamp.services.core.scheduler.entities import Schedule
+
+__copyright__ = "Copyright (c) 2017 OSIsoft, LLC"
+__license__ = "Apache 2.0"
+__version__ = "${VERSION}"
+
+
+class _Process(object):
+    """Simulated task process, it terminates when finish() is called"""
+
+    def __init__(self, pid):
+        self.pid = pid
+        self._exit_code = asyncio.get_event_loop().create_future()
+
+    async def wait(self):
+        return await self._exit_code
+
+    def finish(self):
+        self._exit_code.set_result(0)
+
+
+class _Journal(object):
+    def insert(self, task_id, **values):
+        pass
+
+    def update(self, task_id, **values):
+        pass
+
+
+def _scheduler(start_time):
+    scheduler = Scheduler()
+    scheduler._logger.setLevel(logging.WARNING)
+    scheduler._start_time = start_time
+    scheduler.current_time = start_time
+    scheduler._max_running_tasks = 10
+    scheduler._ready = True
+    scheduler._task_journal = _Journal()
+    scheduler._process_scripts = {"purge": ["tasks/purge"], "backup": ["tasks/backup_postgres"],
+                                  "sending process": ["tasks/north"], "south": ["services/south"]}
+
+    async def start_task(schedule):
+        task_process = scheduler._TaskProcess()
+        task_process.task_id = uuid.uuid4()
+        task_process.schedule = schedule
+        task_process.start_time = scheduler.current_time
+        task_process.process = _Process(len(scheduler._task_processes) + 1)
+        task_process.resources = resources.TaskResources(task_process.process.pid)
+        scheduler._task_processes[task_process.task_id] = task_process
+        scheduler._schedule_executions[schedule.id].task_processes[task_process.task_id] = task_process
+        asyncio.ensure_future(scheduler._wait_for_task_completion(task_process))
+
+    scheduler._start_task = start_task
+    return scheduler
+
+
+def _add_schedule(scheduler, process_name, schedule_type=Schedule.Type.INTERVAL, repeat_seconds=10, exclusive=True):
+    schedule = Scheduler._ScheduleRow(id=uuid.uuid4(),
+                                      name=process_name,
+                                      type=schedule_type,
+                                      time=None,
+                                      day=None,
+                                      repeat=datetime.timedelta(seconds=repeat_seconds),
+                                      repeat_seconds=repeat_seconds,
+                                      exclusive=exclusive,
+                                      process_name=process_name)
+    scheduler._schedules[schedule.id] = schedule
+    scheduler._schedule_first_task(schedule, scheduler._start_time)
+    return schedule
+
+
+def _check(scheduler, at):
+    scheduler.current_time = at
+    return asyncio.get_event_loop().run_until_complete(scheduler._check_schedules())
+
+
+def _running(scheduler):
+    return sorted(task_process.schedule.process_name for task_process in scheduler._task_processes.values())
+
+
+def _finish(scheduler, process_name):
+    for task_process in list(scheduler._task_processes.values()):
+        if task_process.schedule.process_name == process_name:
+            task_process.process.finish()
+    # Runs _wait_for_task_completion
+    asyncio.get_event_loop().run_until_complete(asyncio.sleep(0.01))
+
+
+def _deferred(scheduler):
+    return asyncio.get_event_loop().run_until_complete(scheduler.get_deferred_tasks())
+
+
+@pytest.allure.feature("unit")
+@pytest.allure.story("scheduler")
+class TestAdmission:
+
+    def test_no_limits(self):
+        start_time = time.time()
+        scheduler = _scheduler(start_time)
+        _add_schedule(scheduler, "purge")
+        _add_schedule(scheduler, "purge")
+        _add_schedule(scheduler, "backup")
+        _check(scheduler, start_time + 10)
+        assert ["backup", "purge", "purge"] == _running(scheduler)
+        assert [] == _deferred(scheduler)
+
+    def test_process_concurrency(self):
+        start_time = time.time()
+        scheduler = _scheduler(start_time)
+        scheduler._process_concurrency = {"purge": 1}
+        first = _add_schedule(scheduler, "purge", exclusive=False)
+        second = _add_schedule(scheduler, "purge", exclusive=False)
+        _check(scheduler, start_time + 10)
+        assert ["purge"] == _running(scheduler)
+
+        deferred = _deferred(scheduler)
+        assert [second.id] == [task["schedule_id"] for task in deferred]
+        assert "1 'purge' tasks running, the maximum" == deferred[0]["reason"]
+        assert second.id in scheduler._deferred_executions
+
+        _finish(scheduler, "purge")
+        # The deferred task starts first, the one of the first schedule is due again later
+        _check(scheduler, start_time + 11)
+        assert ["purge"] == _running(scheduler)
+        assert [] == _deferred(scheduler)
+        running_schedule_ids = [task_process.schedule.id for task_process in scheduler._task_processes.values()]
+        assert [second.id] == running_schedule_ids
+        assert scheduler._schedule_executions[first.id].next_start_time == start_time + 20
+
+    def test_exclusion_group(self):
+        start_time = time.time()
+        scheduler = _scheduler(start_time)
+        scheduler._exclusion_groups = [{"purge", "backup"}]
+        _add_schedule(scheduler, "purge")
+        _add_schedule(scheduler, "backup", repeat_seconds=15)
+        _add_schedule(scheduler, "sending process", exclusive=False)
+        _check(scheduler, start_time + 10)
+        assert ["purge", "sending process"] == _running(scheduler)
+        _check(scheduler, start_time + 15)
+        assert ["purge", "sending process"] == _running(scheduler)
+        assert ["'purge' excludes 'backup'"] == [task["reason"] for task in _deferred(scheduler)]
+
+        _finish(scheduler, "purge")
+        _check(scheduler, start_time + 16)
+        assert ["backup", "sending process"] == _running(scheduler)
+
+    def test_load_average(self, monkeypatch):
+        start_time = time.time()
+        scheduler = _scheduler(start_time)
+        scheduler._max_load_average = 2.0
+        scheduler._admission_exempt_processes = {"sending process"}
+        _add_schedule(scheduler, "purge", repeat_seconds=3600)
+        _add_schedule(scheduler, "sending process", repeat_seconds=3600)
+        _add_schedule(scheduler, "south", schedule_type=Schedule.Type.STARTUP)
+
+        monkeypatch.setattr("os.getloadavg", lambda: (4.0, 4.0, 4.0))
+        # Checked again soon as the load changes without notification
+        assert start_time + 3600 + Scheduler._ADMISSION_RETRY_SECONDS == _check(scheduler, start_time + 3600)
+        assert ["sending process", "south"] == _running(scheduler)
+        assert ["load average 4.00 above 2.0"] == [task["reason"] for task in _deferred(scheduler)]
+
+        monkeypatch.setattr("os.getloadavg", lambda: (1.0, 1.0, 1.0))
+        _check(scheduler, start_time + 3605)
+        assert ["purge", "sending process", "south"] == _running(scheduler)
+        assert [] == _deferred(scheduler)
+
+    def test_deleted_deferred_schedule(self):
+        start_time = time.time()
+        scheduler = _scheduler(start_time)
+        scheduler._process_concurrency = {"purge": 1}
+        _add_schedule(scheduler, "purge")
+        deleted = _add_schedule(scheduler, "purge")
+        _check(scheduler, start_time + 10)
+        assert 1 == len(_deferred(scheduler))
+
+        del scheduler._schedules[deleted.id]
+        _check(scheduler, start_time + 11)
+        assert [] == _deferred(scheduler)
+        assert deleted.id not in scheduler._schedule_executions
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+
+# FOGLAMP_BEGIN
+# See: http://foglamp.readthedocs.io/
+# FOGLAMP_END
+
+""" Tests and benchmark of the schedule index of the scheduler, no storage is needed:
+the tasks are not started, their start is only recorded.
+
+pytest -s tests/unit-tests/python/foglamp_test/services/core/test_scheduler_index.py
+"""
+
+import asyncio
+import datetime
+import logging
+import random
+import time
+import uuid
+
+import pytest
+
+from foglamp.services.core.scheduler.scheduler import Scheduler
+from foglamp.services.core.scheduler.entities import Schedule
+
+__copyright__ = "Copyright (c) 2017 OSIsoft, LLC"
+__license__ = "Apache 2.0"
+__version__ = "${VERSION}"
+
+
+def _scheduler(start_time):
+    scheduler = Scheduler()
+    scheduler._logger.setLevel(logging.WARNING)
+    scheduler._start_time = start_time
+    scheduler.current_time = start_time
+    scheduler._max_running_tasks = 10 ** 6
+    scheduler.started = []
+
+    async def start_task(schedule):
+        scheduler.started.append((scheduler.current_time, schedule.id))
+
+    scheduler._start_task = start_task
+    return scheduler
+
+
+def _add_schedule(scheduler, schedule_type, repeat_seconds, schedule_time=None, exclusive=False):
+    schedule = Scheduler._ScheduleRow(id=uuid.uuid4(),
+                                      name="schedule",
+                                      type=schedule_type,
+                                      time=schedule_time,
+                                      day=None,
+                                      repeat=datetime.timedelta(seconds=repeat_seconds),
+                                      repeat_seconds=repeat_seconds,
+                                      exclusive=exclusive,
+                                      process_name="sleep1")
+    scheduler._schedules[schedule.id] = schedule
+    scheduler._schedule_first_task(schedule, scheduler._start_time)
+    return schedule
+
+
+def _run(scheduler, until):
+    """ Wakes up the scheduler as _scheduler_loop does, until the simulated time reaches until """
+    loop = asyncio.get_event_loop()
+    wakeups = 0
+    while True:
+        next_start_time = loop.run_until_complete(scheduler._check_schedules())
+        wakeups += 1
+        if next_start_time is None or next_start_time > until:
+            scheduler.current_time = until
+            return wakeups
+        assert next_start_time >= scheduler.current_time
+        scheduler.current_time = next_start_time
+
+
+@pytest.allure.feature("unit")
+@pytest.allure.story("scheduler")
+class TestScheduleIndex:
+
+    def test_interval_schedules(self):
+        start_time = time.time()
+        scheduler = _scheduler(start_time)
+        fast = _add_schedule(scheduler, Schedule.Type.INTERVAL, 10)
+        slow = _add_schedule(scheduler, Schedule.Type.INTERVAL, 25)
+        _run(scheduler, start_time + 60)
+        assert [start_time + t for t in (10, 20, 30, 40, 50, 60)] == \
+               [t for t, schedule_id in scheduler.started if schedule_id == fast.id]
+        assert [start_time + t for t in (25, 50)] == \
+               [t for t, schedule_id in scheduler.started if schedule_id == slow.id]
+
+    def test_modified_and_deleted_schedules(self):
+        start_time = time.time()
+        scheduler = _scheduler(start_time)
+        modified = _add_schedule(scheduler, Schedule.Type.INTERVAL, 10)
+        deleted = _add_schedule(scheduler, Schedule.Type.INTERVAL, 10)
+        _run(scheduler, start_time + 5)
+        # The previous next start time of the modified schedule becomes obsolete
+        modified = modified._replace(repeat_seconds=30)
+        scheduler._schedules[modified.id] = modified
+        scheduler._schedule_first_task(modified, scheduler.current_time)
+        del scheduler._schedules[deleted.id]
+        _run(scheduler, start_time + 60)
+        assert [start_time + 30, start_time + 60] == \
+               [t for t, schedule_id in scheduler.started if schedule_id == modified.id]
+        assert [] == [t for t, schedule_id in scheduler.started if schedule_id == deleted.id]
+        assert deleted.id not in scheduler._schedule_executions
+        assert 1 == len(scheduler._schedule_index)
+
+    def test_queued_task(self):
+        start_time = time.time()
+        scheduler = _scheduler(start_time)
+        scheduler._ready = True
+        schedule = _add_schedule(scheduler, Schedule.Type.INTERVAL, 3600)
+        _run(scheduler, start_time + 10)
+        asyncio.get_event_loop().run_until_complete(scheduler.queue_task(schedule.id))
+        _run(scheduler, start_time + 10)
+        assert [start_time + 10] == [t for t, _ in scheduler.started]
+        # Manual start - next_start_time is not changed
+        assert start_time + 3600 == scheduler._schedule_executions[schedule.id].next_start_time
+
+    def test_many_schedules(self):
+        """ Simulates one hour of thousands of interval and timed schedules """
+        random.seed(1)
+        start_time = time.time()
+        scheduler = _scheduler(start_time)
+        for _ in range(3000):
+            _add_schedule(scheduler, Schedule.Type.INTERVAL, random.randint(5, 600))
+        for _ in range(2000):
+            _add_schedule(scheduler, Schedule.Type.TIMED, 3600,
+                          datetime.time(minute=random.randint(0, 59), second=random.randint(0, 59)))
+
+        _run(scheduler, start_time + 3600)
+
+        assert len(scheduler.started) > 3000
+        assert 5000 == len(scheduler._schedule_index)
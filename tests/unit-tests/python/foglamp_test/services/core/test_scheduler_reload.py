@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+
+# FOGLAMP_BEGIN
+# See: http://foglamp.readthedocs.io/
+# FOGLAMP_END
+
+""" Tests of the incremental reload of the schedules, the storage server is simulated
+by a class that stores the rows of the schedules and scheduled_processes tables.
+
+pytest -s tests/unit-tests/python/foglamp_test/services/core/test_scheduler_reload.py
+"""
+
+import asyncio
+import datetime
+import itertools
+import json
+import logging
+import time
+import uuid
+
+import pytest
+
+from foglamp.services.core.scheduler import scheduler as scheduler_module
+from foglamp.services.core.scheduler.entities import IntervalSchedule
+from foglamp.services.core.scheduler.scheduler import Scheduler
+
+__copyright__ = "Copyright (c) 2017 OSIsoft, LLC"
+__license__ = "Apache 2.0"
+__version__ = "${VERSION}"
+
+
+class _Storage(object):
+    """Rows of the tables, as returned by the storage server, and the queries received"""
+
+    def __init__(self):
+        self._versions = itertools.count(1)
+        self.schedules = dict()
+        self.queries = []
+
+    def save(self, schedule_id, name="schedule", interval="00:00:10", exclusive="t", process_name="purge"):
+        self.schedules[schedule_id] = {"id": str(schedule_id), "schedule_name": name, "schedule_type": "3",
+                                       "schedule_interval": interval, "schedule_time": "", "schedule_day": "",
+                                       "exclusive": exclusive, "process_name": process_name,
+                                       "version": next(self._versions)}
+
+    def query_tbl(self, table):
+        self.queries.append((table, None))
+        if table == "scheduled_processes":
+            return {"rows": [{"name": "purge", "script": ["tasks/purge"]}]}
+        return {"rows": list(self.schedules.values())}
+
+    def query_tbl_with_payload(self, table, payload):
+        payload = json.loads(payload)
+        self.queries.append((table, payload))
+        rows = list(self.schedules.values())
+        if "where" in payload:
+            assert ["version", ">"] == [payload["where"]["column"], payload["where"]["condition"]]
+            return {"rows": [row for row in rows if row["version"] > payload["where"]["value"]]}
+        if "aggregate" in payload:
+            return {"rows": [{"count_id": str(len(rows))}]}
+        return {"rows": [{"id": row["id"]} for row in rows]}
+
+    def insert_into_tbl(self, table, payload):
+        assert "schedules" == table
+        row = json.loads(payload)
+        self.save(uuid.UUID(row["id"]), row["schedule_name"], row["schedule_interval"], row["exclusive"],
+                  row["process_name"])
+        return {"rows_affected": 1}
+
+    def delete_from_tbl(self, table, payload):
+        assert "schedules" == table
+        del self.schedules[uuid.UUID(json.loads(payload)["where"]["value"])]
+        return {"rows_affected": 1}
+
+
+def _scheduler(storage):
+    scheduler = Scheduler()
+    scheduler._logger.setLevel(logging.WARNING)
+    scheduler._storage = storage
+    scheduler._start_time = time.time()
+    scheduler._ready = True
+    asyncio.get_event_loop().run_until_complete(scheduler._read_storage())
+    storage.queries = []
+    return scheduler
+
+
+def _reload(scheduler):
+    asyncio.get_event_loop().run_until_complete(scheduler.reload_schedules())
+
+
+@pytest.allure.feature("unit")
+@pytest.allure.story("scheduler")
+class TestReloadSchedules:
+
+    def test_no_change(self):
+        storage = _Storage()
+        for _ in range(1000):
+            storage.save(uuid.uuid4())
+        scheduler = _scheduler(storage)
+        assert 1000 == scheduler._schedules_version
+
+        _reload(scheduler)
+        # The rows are not read again, only the ones changed and the number of rows
+        schedule_queries = [payload for (table, payload) in storage.queries if table == "schedules"]
+        assert [{"where": {"column": "version", "condition": ">", "value": 1000}},
+                {"aggregate": {"operation": "count", "column": "id"}}] == schedule_queries
+        assert 1000 == len(scheduler._schedules)
+
+    def test_inserted_updated_deleted(self):
+        storage = _Storage()
+        updated_id, timing_id, deleted_id = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+        for schedule_id in (updated_id, timing_id, deleted_id):
+            storage.save(schedule_id)
+        scheduler = _scheduler(storage)
+        timing_next_start_time = scheduler._schedule_executions[timing_id].next_start_time
+        updated_next_start_time = scheduler._schedule_executions[updated_id].next_start_time
+
+        inserted_id = uuid.uuid4()
+        storage.save(inserted_id)
+        storage.save(updated_id, name="renamed")
+        scheduler.current_time = scheduler._start_time + 5
+        storage.save(timing_id, interval="00:01:00")
+        del storage.schedules[deleted_id]
+
+        _reload(scheduler)
+        assert {updated_id, timing_id, inserted_id} == set(scheduler._schedules.keys())
+        assert "renamed" == scheduler._schedules[updated_id].name
+        # Rescheduled only when the timing changes
+        assert updated_next_start_time == scheduler._schedule_executions[updated_id].next_start_time
+        assert timing_next_start_time != scheduler._schedule_executions[timing_id].next_start_time
+        assert inserted_id in scheduler._schedule_executions
+        assert 6 == scheduler._schedules_version
+
+    def test_saved_by_the_scheduler(self):
+        storage = _Storage()
+        schedule_id = uuid.uuid4()
+        storage.save(schedule_id)
+        scheduler = _scheduler(storage)
+        next_start_time = scheduler._schedule_executions[schedule_id].next_start_time
+
+        # Row written by save_schedule(), read again with the same timing
+        storage.save(schedule_id, exclusive="t")
+        _reload(scheduler)
+        assert next_start_time == scheduler._schedule_executions[schedule_id].next_start_time
+        assert 2 == scheduler._schedules_version
+
+    def test_save_and_delete_schedule(self):
+        storage = _Storage()
+        storage.save(uuid.uuid4())
+        scheduler = _scheduler(storage)
+
+        schedule = IntervalSchedule()
+        schedule.name = "inserted"
+        schedule.process_name = "purge"
+        schedule.repeat = datetime.timedelta(seconds=30)
+        schedule.exclusive = True
+        asyncio.get_event_loop().run_until_complete(scheduler.save_schedule(schedule))
+        # The version stamped by storage is read, the row is not read again by the next reload
+        assert 2 == scheduler._schedules_version
+        storage.queries = []
+        _reload(scheduler)
+        assert [{"where": {"column": "version", "condition": ">", "value": 2}},
+                {"aggregate": {"operation": "count", "column": "id"}}] == \
+            [payload for (table, payload) in storage.queries if table == "schedules"]
+
+        asyncio.get_event_loop().run_until_complete(scheduler.delete_schedule(schedule.schedule_id))
+        assert schedule.schedule_id not in scheduler._schedules
+        storage.queries = []
+        _reload(scheduler)
+        # The ids are not read, the number of rows matches
+        assert 2 == len([table for (table, _) in storage.queries if table == "schedules"])
+
+
+@pytest.allure.feature("unit")
+@pytest.allure.story("scheduler")
+class TestReloadConfig:
+
+    @staticmethod
+    def _config(use_zygote, task_sample_seconds):
+        return {"max_running_tasks": {"value": "50"}, "max_completed_task_age_days": {"value": "30"},
+                "use_zygote": {"value": use_zygote}, "task_sample_seconds": {"value": str(task_sample_seconds)},
+                "process_concurrency": {"value": "{}"}, "exclusion_groups": {"value": "[]"},
+                "admission_exempt_processes": {"value": "[]"}, "max_load_average": {"value": "0"},
+                "min_available_memory_mb": {"value": "0"}}
+
+    def test_zygote_and_sampler(self, monkeypatch):
+        loop = asyncio.get_event_loop()
+        scheduler = _scheduler(_Storage())
+        scheduler._apply_config(self._config("false", 0))
+
+        started = []
+
+        async def start_zygote():
+            started.append(scheduler._use_zygote)
+            scheduler._zygote = zygote
+
+        class _Zygote(object):
+            stop_timeout = 0
+
+            async def stop(self, timeout=5):
+                self.stop_timeout = timeout
+
+        zygote = _Zygote()
+        monkeypatch.setattr(scheduler, "_start_zygote", start_zygote)
+
+        config = self._config("true", 5)
+
+        class _ConfigurationManager(object):
+            def __init__(self, storage):
+                pass
+
+            async def get_category_all_items(self, category_name):
+                assert "SCHEDULER" == category_name
+                return config
+
+        monkeypatch.setattr(scheduler_module, "ConfigurationManager", _ConfigurationManager)
+
+        loop.run_until_complete(scheduler.reload_config())
+        assert [True] == started
+        sample_tasks_task = scheduler._sample_tasks_task
+        assert sample_tasks_task is not None
+
+        config = self._config("false", 0)
+        loop.run_until_complete(scheduler.reload_config())
+        assert scheduler._zygote is None
+        assert scheduler._sample_tasks_task is None
+        loop.run_until_complete(asyncio.sleep(0))
+        assert sample_tasks_task.cancelled()
+        # The zygote stops when the tasks it started have terminated
+        loop.run_until_complete(asyncio.gather(*scheduler._retired_zygote_tasks))
+        assert zygote.stop_timeout is None
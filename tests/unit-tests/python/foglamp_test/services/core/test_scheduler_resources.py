@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+
+# FOGLAMP_BEGIN
+# See: http://foglamp.readthedocs.io/
+# FOGLAMP_END
+
+""" Tests of the sampling of the resources used by the tasks, the tasks are
+processes started by the tests.
+
+pytest -s tests/unit-tests/python/foglamp_test/services/core/test_scheduler_resources.py
+"""
+
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+from foglamp.services.core.scheduler import resources
+from foglamp.services.core.scheduler.entities import Task
+from foglamp.services.core.scheduler.scheduler import Scheduler
+
+__copyright__ = "Copyright (c) 2017 OSIsoft, LLC"
+__license__ = "Apache 2.0"
+__version__ = "${VERSION}"
+
+_BUSY_LOOP = "import time\nend = time.time() + 0.3\nwhile time.time() < end: pass\ntime.sleep(30)"
+
+pytestmark = pytest.mark.skipif(not os.path.isdir("/proc/self"), reason="/proc is not available")
+
+
+@pytest.fixture
+def shell_task():
+    """A shell starting a Python interpreter that uses the cpu, as the task scripts do"""
+    process = subprocess.Popen(["/bin/sh", "-c", "{} -c '{}'; exit 0".format(sys.executable, _BUSY_LOOP)])
+    time.sleep(0.6)
+    yield process
+    process.kill()
+    process.wait()
+
+
+@pytest.allure.feature("unit")
+@pytest.allure.story("scheduler")
+class TestTaskResources:
+
+    def test_sample_descendants(self, shell_task):
+        task_resources = resources.TaskResources(shell_task.pid)
+        resources.sample([task_resources])
+        # The cpu time of the interpreter is counted
+        assert task_resources.cpu_time >= 0.2
+        assert task_resources.max_rss > 0
+        assert task_resources.context_switches > 0
+        assert 2 == len(task_resources._processes)
+        assert sorted(resources.COLUMNS) == sorted(task_resources.columns().keys())
+
+    def test_sample_with_parents(self, shell_task):
+        task_resources = resources.TaskResources(shell_task.pid)
+        task_resources.sample(resources.read_parents())
+        assert task_resources.cpu_time >= 0.2
+
+    def test_terminated(self):
+        process = subprocess.Popen([sys.executable, "-c", "pass"])
+        process.wait()
+        task_resources = resources.TaskResources(process.pid)
+        task_resources.sample()
+        assert {} == task_resources.columns()
+
+    def test_add_rusage(self):
+        task_resources = resources.TaskResources(os.getpid())
+        task_resources.sample()
+        cpu_time = task_resources.cpu_time
+        task_resources.add_rusage({"cpu_time": cpu_time + 10, "max_rss": 1, "read_bytes": None})
+        assert cpu_time + 10 == task_resources.cpu_time
+        assert task_resources.max_rss > 1
+
+    def test_children_usage(self):
+        """ Final sample of a task terminated before the first sampling """
+        usage = resources.ChildrenUsage()
+        process = subprocess.Popen([sys.executable, "-c", _BUSY_LOOP.replace("time.sleep(30)", "")])
+        process.wait()
+        values = usage.collect(1)
+        assert values["cpu_time"] >= 0.2
+        assert values["context_switches"] > 0
+        assert "max_rss" not in values
+
+        task_resources = resources.TaskResources(process.pid)
+        task_resources.add_rusage(values)
+        assert values["cpu_time"] == task_resources.cpu_time
+
+    def test_children_usage_not_attributable(self):
+        """ The resources of two tasks terminated at the same time are not attributed """
+        usage = resources.ChildrenUsage()
+        for _ in range(2):
+            subprocess.Popen([sys.executable, "-c", "pass"]).wait()
+        assert usage.collect(2) is None
+        assert usage.collect(1) is None
+        assert usage.collect(1) is not None
+
+    @pytest.mark.parametrize("row, expected", [
+        ({"cpu_time": "1.5", "max_rss": 20480, "read_bytes": "0", "write_bytes": 4096, "context_switches": 12},
+         (1.5, 20480, 0, 4096, 12)),
+        ({"cpu_time": "", "max_rss": 0, "read_bytes": 0, "write_bytes": 0, "context_switches": 0},
+         (None, None, None, None, None)),
+        ({}, (None, None, None, None, None)),
+    ])
+    def test_task_row(self, row, expected):
+        task = Task()
+        Scheduler._set_task_resources(task, row)
+        assert expected == tuple(getattr(task, column) for column in resources.COLUMNS)
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+
+# FOGLAMP_BEGIN
+# See: http://foglamp.readthedocs.io/
+# FOGLAMP_END
+
+import asyncio
+import json
+import logging
+import uuid
+
+import pytest
+
+from foglamp.services.core.scheduler.scheduler import Scheduler
+from foglamp.services.core.scheduler.entities import Schedule
+
+__copyright__ = "Copyright (c) 2017 OSIsoft, LLC"
+__license__ = "Apache 2.0"
+__version__ = "${VERSION}"
+
+
+class _Storage(object):
+    """ Records the requests sent to the storage server """
+
+    def __init__(self):
+        self.requests = []
+
+    def insert_into_tbl(self, tbl_name, data):
+        self.requests.append(("insert", tbl_name, json.loads(data)))
+
+    def update_tbl(self, tbl_name, data):
+        self.requests.append(("update", tbl_name, json.loads(data)))
+
+
+@pytest.allure.feature("unit")
+@pytest.allure.story("scheduler")
+class TestTaskJournal:
+
+    def test_batched_writes(self):
+        loop = asyncio.get_event_loop()
+        storage = _Storage()
+        journal = Scheduler._TaskJournal(storage, logging.getLogger(__name__))
+        task_ids = [uuid.uuid4() for _ in range(3)]
+        for task_id in task_ids:
+            journal.insert(task_id, pid=1, process_name="sleep1", state=1, start_time="2017-10-11 15:10:51")
+        # Terminated before its row is written
+        journal.update(task_ids[0], state=2, exit_code=0, end_time="2017-10-11 15:10:52")
+        assert [] == storage.requests
+
+        loop.run_until_complete(journal.flush())
+        assert 2 == len(storage.requests)
+        assert [("insert", "tasks")] * 2 == [request[:2] for request in storage.requests]
+        rows = storage.requests[0][2] + storage.requests[1][2]
+        assert sorted(str(task_id) for task_id in task_ids) == sorted(row["id"] for row in rows)
+        assert [1, 1, 2] == sorted(row["state"] for row in rows)
+
+        journal.update(task_ids[1], state=3, exit_code=-15, end_time="2017-10-11 15:10:53")
+        loop.run_until_complete(journal.flush())
+        assert "update" == storage.requests[2][0]
+        assert {"state": 3, "exit_code": -15, "end_time": "2017-10-11 15:10:53"} == storage.requests[2][2]["values"]
+
+    def test_delayed_flush(self):
+        loop = asyncio.get_event_loop()
+        storage = _Storage()
+        journal = Scheduler._TaskJournal(storage, logging.getLogger(__name__))
+        journal.insert(uuid.uuid4(), pid=1, process_name="sleep1", state=1, start_time="2017-10-11 15:10:51")
+        loop.run_until_complete(asyncio.sleep(Scheduler._TaskJournal._FLUSH_SECONDS + 0.5))
+        assert 1 == len(storage.requests)
+        loop.run_until_complete(journal.flush())
+        assert 1 == len(storage.requests)
+
+    def test_flush_on_stop_timeout(self):
+        """ The rows are written when stop() gives up waiting for the running tasks """
+        class _Process(object):
+            pid = 1
+
+            def terminate(self):
+                pass
+
+        storage = _Storage()
+        scheduler = Scheduler()
+        scheduler._start_time = 1
+        scheduler._paused = True
+        scheduler._STOP_WAIT_SECONDS = 0
+        scheduler._task_journal = Scheduler._TaskJournal(storage, logging.getLogger(__name__))
+        scheduler._task_journal.update(uuid.uuid4(), state=2, exit_code=0, end_time="2017-10-11 15:10:52")
+        schedule = Scheduler._ScheduleRow(id=uuid.uuid4(), name="schedule", type=Schedule.Type.INTERVAL, time=None,
+                                          day=None, repeat=None, repeat_seconds=None, exclusive=True,
+                                          process_name="sleep1")
+        scheduler._process_scripts = {"sleep1": ["sleep", "1"]}
+        running = Scheduler._TaskProcess()
+        running.process = _Process()
+        running.schedule = schedule
+        scheduler._task_processes = {uuid.uuid4(): running}
+
+        with pytest.raises(TimeoutError):
+            asyncio.get_event_loop().run_until_complete(scheduler.stop())
+        assert ["update"] == [request[0] for request in storage.requests]
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+
+# FOGLAMP_BEGIN
+# See: http://foglamp.readthedocs.io/
+# FOGLAMP_END
+
+""" Tests of the zygote used by the scheduler to start the built-in Python tasks,
+the tasks are small modules written in a temporary directory.
+
+pytest -s tests/unit-tests/python/foglamp_test/services/core/test_scheduler_zygote.py
+"""
+
+import asyncio
+import logging
+import os
+import signal
+import sys
+import time
+
+import pytest
+
+from foglamp.services.core.scheduler.zygote import Zygote
+
+__copyright__ = "Copyright (c) 2017 OSIsoft, LLC"
+__license__ = "Apache 2.0"
+__version__ = "${VERSION}"
+
+_TASK = """
+import os
+import sys
+import time
+
+if __name__ == "__main__":
+    with open(sys.argv[1], "w") as output:
+        output.write(" ".join([str(os.getppid())] + sys.argv[2:]))
+    if sys.argv[2] == "sleep":
+        time.sleep(30)
+    sys.exit(int(sys.argv[2]))
+"""
+
+
+@pytest.fixture
+def zygote(tmpdir, monkeypatch):
+    tmpdir.join("zygote_test_task.py").write(_TASK)
+    monkeypatch.setenv("PYTHONPATH", os.pathsep.join([str(tmpdir)] + sys.path))
+    loop = asyncio.get_event_loop()
+    zygote = Zygote(logging.getLogger(__name__), preload=["zygote_test_task"])
+    loop.run_until_complete(zygote.start())
+    yield zygote
+    loop.run_until_complete(zygote.stop())
+
+
+def _launch_and_wait(zygote, args):
+    async def launch_and_wait():
+        process = await zygote.launch("zygote_test_task", args)
+        return process, await process.wait()
+    return asyncio.get_event_loop().run_until_complete(launch_and_wait())
+
+
+@pytest.allure.feature("unit")
+@pytest.allure.story("scheduler")
+class TestZygote:
+
+    def test_exit_code(self, zygote, tmpdir):
+        output = str(tmpdir.join("output"))
+        process, exit_code = _launch_and_wait(zygote, [output, "3", "--name=test"])
+        assert 3 == exit_code
+        assert 3 == process.returncode
+        assert process.rusage["max_rss"] > 0
+        assert process.rusage["cpu_time"] >= 0
+        with open(output) as f:
+            parent_pid, *args = f.read().split(" ")
+        # Forked by the zygote, not started by the test
+        assert os.getpid() != int(parent_pid)
+        assert ["3", "--name=test"] == args
+        with pytest.raises(ProcessLookupError):
+            process.terminate()
+
+    def test_error(self, zygote, tmpdir):
+        _, exit_code = _launch_and_wait(zygote, [str(tmpdir.join("output")), "not an integer"])
+        assert 1 == exit_code
+
+    def test_terminate(self, zygote, tmpdir):
+        output = tmpdir.join("output")
+
+        async def launch_and_terminate():
+            process = await zygote.launch("zygote_test_task", [str(output), "sleep"])
+            while not output.check():
+                await asyncio.sleep(0.01)
+            process.terminate()
+            return await process.wait()
+
+        assert -signal.SIGTERM == asyncio.get_event_loop().run_until_complete(launch_and_terminate())
+
+    def test_concurrent_tasks(self, zygote, tmpdir):
+        async def launch_and_wait(i):
+            process = await zygote.launch("zygote_test_task", [str(tmpdir.join("output{}".format(i))), str(i)])
+            return await process.wait()
+
+        exit_codes = asyncio.get_event_loop().run_until_complete(
+            asyncio.gather(*[launch_and_wait(i) for i in range(10)]))
+        assert list(range(10)) == exit_codes
+
+    def test_not_running(self):
+        zygote = Zygote(logging.getLogger(__name__), preload=[])
+        with pytest.raises(EnvironmentError):
+            asyncio.get_event_loop().run_until_complete(zygote.launch("zygote_test_task", []))
+
+    def test_benchmark(self, zygote, tmpdir):
+        """ Start time of a task forked by the zygote and of a new interpreter """
+        output = str(tmpdir.join("output"))
+        count = 10
+
+        start = time.time()
+        for _ in range(count):
+            _launch_and_wait(zygote, [output, "0"])
+        zygote_time = (time.time() - start) / count
+
+        async def start_interpreter():
+            process = await asyncio.create_subprocess_exec(sys.executable, "-m", "zygote_test_task", output, "0")
+            return await process.wait()
+
+        start = time.time()
+        for _ in range(count):
+            assert 0 == asyncio.get_event_loop().run_until_complete(start_interpreter())
+        interpreter_time = (time.time() - start) / count
+
+        assert zygote_time < interpreter_time
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+
+# FOGLAMP_BEGIN
+# See: http://foglamp.readthedocs.io/
+# FOGLAMP_END
+
+""" Tests of the coalescing of the identical storage queries, the storage client is
+simulated by a class whose queries block until they are released.
+
+pytest -s tests/unit-tests/python/foglamp_test/services/core/test_single_flight.py
+"""
+
+import asyncio
+import threading
+
+import pytest
+
+from foglamp.services.core.single_flight import SingleFlight
+
+__copyright__ = "Copyright (c) 2017 OSIsoft, LLC"
+__license__ = "Apache 2.0"
+__version__ = "${VERSION}"
+
+
+class _Storage(object):
+    """Storage client whose queries return once release is set"""
+
+    def __init__(self):
+        self.queries = []
+        self.release = threading.Event()
+
+    def query_tbl_with_payload(self, tbl_name, query_payload):
+        self.queries.append((tbl_name, query_payload))
+        self.release.wait(5)
+        if query_payload == 'error':
+            raise RuntimeError('query failed')
+        return {'rows': [{'table': tbl_name, 'payload': query_payload}]}
+
+    def query_tbl(self, tbl_name, query=None):
+        return self.query_tbl_with_payload(tbl_name, query)
+
+
+@pytest.fixture
+def storage():
+    SingleFlight.reset()
+    storage = _Storage()
+    yield storage
+    storage.release.set()
+
+
+def _gather(storage, queries):
+    async def gather():
+        futures = [asyncio.ensure_future(SingleFlight.query_tbl_with_payload(storage, tbl_name, payload))
+                   for tbl_name, payload in queries]
+        # All the requests are received before the first query completes
+        await asyncio.sleep(0.05)
+        storage.release.set()
+        return await asyncio.gather(*futures, return_exceptions=True)
+    return asyncio.get_event_loop().run_until_complete(gather())
+
+
+@pytest.allure.feature("unit")
+@pytest.allure.story("api")
+class TestSingleFlight:
+
+    def test_coalesced(self, storage):
+        results = _gather(storage, [('readings', 'count')] * 10 + [('readings', 'summary'), ('log', 'count')])
+        assert 3 == len(storage.queries)
+        assert all(result is results[0] for result in results[:10])
+        assert {'rows': [{'table': 'log', 'payload': 'count'}]} == results[-1]
+        assert {'executed': 3, 'coalesced': 9, 'inFlight': 0} == SingleFlight.stats()
+
+    def test_not_in_flight(self, storage):
+        storage.release.set()
+        loop = asyncio.get_event_loop()
+        for _ in range(2):
+            loop.run_until_complete(SingleFlight.query_tbl(storage, 'log_codes'))
+        assert 2 == len(storage.queries)
+        assert 0 == SingleFlight.coalesced
+
+    def test_error(self, storage):
+        results = _gather(storage, [('readings', 'error')] * 3)
+        assert 1 == len(storage.queries)
+        assert all(isinstance(result, RuntimeError) for result in results)
+        assert 0 == SingleFlight.stats()['inFlight']
+
+    def test_cancelled(self, storage):
+        async def cancel_first():
+            first = asyncio.ensure_future(SingleFlight.query_tbl_with_payload(storage, 'readings', 'count'))
+            second = asyncio.ensure_future(SingleFlight.query_tbl_with_payload(storage, 'readings', 'count'))
+            await asyncio.sleep(0.05)
+            first.cancel()
+            storage.release.set()
+            return await second
+
+        result = asyncio.get_event_loop().run_until_complete(cancel_first())
+        assert {'rows': [{'table': 'readings', 'payload': 'count'}]} == result
@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+
+# FOGLAMP_BEGIN
+# See: http://foglamp.readthedocs.io/
+# FOGLAMP_END
+
+""" Tests of the statistics history API, the storage server is simulated by the fake storage,
+evaluating the queries on a list of statistics.
+
+pytest -s tests/unit-tests/python/foglamp_test/services/core/test_statistics_history_pivot.py
+"""
+
+import asyncio
+import json
+import math
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import make_mocked_request
+
+from foglamp.services.core import connect
+from foglamp.services.core.api import statistics
+from foglamp.services.core.single_flight import SingleFlight
+from foglamp_test.fake_storage import OPERATORS, START, Storage, conditions, timestamp
+
+__copyright__ = "Copyright (c) 2017 OSIsoft, LLC"
+__license__ = "Apache 2.0"
+__version__ = "${VERSION}"
+
+_KEYS = ['READINGS', 'PURGED', 'SENT_1']
+# The layout of history_ts in the where clauses
+_TS_FMT = '%Y-%m-%d %H:%M:%S.%f+00'
+
+
+class _Storage(Storage):
+    """Statistics history, collected every 15 seconds for two hours"""
+
+    def __init__(self):
+        super().__init__(schedules=[{'schedule_interval': '00:00:15'}],
+                         statistics_history=[{'key': key, 'epoch': START + 15 * run + 0.25, 'value': run * 10 + index}
+                                             for run in range(480) for index, key in enumerate(_KEYS)])
+
+    def compare(self, tbl_name, row, column, condition, value):
+        if condition == 'newer':
+            # The history is older than the current time, the condition is checked by the tests
+            return True
+        if column == 'history_ts':
+            return OPERATORS[condition](timestamp(row['epoch'], _TS_FMT), value)
+        return super().compare(tbl_name, row, column, condition, value)
+
+    def query(self, tbl_name, payload):
+        if tbl_name == 'schedules':
+            return self.tables[tbl_name]
+        assert 'statistics_history' == tbl_name
+        rows = self.select(tbl_name, payload.get('where'))
+
+        if payload.get('modifier') == 'distinct':
+            timestamps = sorted(set(timestamp(row['epoch'], _TS_FMT) for row in rows), reverse=True)
+            return [{'history_ts': ts} for ts in timestamps[:payload['limit']]]
+        if 'timebucket' in payload:
+            size = int(payload['timebucket']['size'])
+            sums = dict()
+            for row in rows:
+                bucket = (row['key'], size * math.floor(row['epoch'] / size))
+                sums[bucket] = sums.get(bucket, 0) + row['value']
+            # The sums are numeric values, returned as strings
+            return [{'key': key, 'history_ts': timestamp(epoch), 'value': str(value)}
+                    for (key, epoch), value in sums.items()]
+        return [{'key': row['key'], 'history_ts': timestamp(row['epoch']), 'value': row['value']}
+                for row in reversed(rows)]
+
+
+@pytest.fixture
+def storage(monkeypatch):
+    SingleFlight.reset()
+    storage = _Storage()
+    monkeypatch.setattr(connect, 'get_storage', lambda: storage)
+    return storage
+
+
+def _history(query=''):
+    request = make_mocked_request('GET', '/foglamp/statistics/history' + query)
+    response = asyncio.get_event_loop().run_until_complete(statistics.get_statistics_history(request))
+    return json.loads(response.body.decode())
+
+
+@pytest.allure.feature("unit")
+@pytest.allure.story("api")
+class TestStatisticsHistory:
+
+    def test_all(self, storage):
+        result = _history()
+        assert 15 == result['interval']
+        assert 480 == len(result['statistics'])
+        assert {'history_ts': '2017-11-01 10:00:15', 'READINGS': 10, 'PURGED': 11, 'SENT_1': 12} == \
+            result['statistics'][1]
+        assert [set['history_ts'] for set in result['statistics']] == \
+            sorted(set['history_ts'] for set in result['statistics'])
+
+    def test_limit(self, storage):
+        result = _history('?limit=2')
+        assert ['2017-11-01 11:59:30', '2017-11-01 11:59:45'] == [set['history_ts'] for set in result['statistics']]
+        assert {'READINGS', 'PURGED', 'SENT_1', 'history_ts'} == set(result['statistics'][0])
+        # The range starts at the second last run, the number of keys is not needed
+        tables = [tbl_name for tbl_name, _ in storage.queries]
+        assert 'statistics' not in tables
+        distinct = storage.queries[0][1]
+        assert {'history_ts': 'desc'} == {distinct['sort']['column']: distinct['sort']['direction']}
+        assert 2 == distinct['limit']
+        history = [payload for tbl_name, payload in storage.queries[1:] if tbl_name == 'statistics_history']
+        assert [[('history_ts', '>=')]] == [conditions(payload['where']) for payload in history]
+        assert all('limit' not in payload for payload in history)
+
+    def test_keys_and_range(self, storage):
+        result = _history('?keys=READINGS,SENT_1&from=2017-11-01 11:00:00&to=2017-11-01 11:01:00')
+        assert ['2017-11-01 11:00:{:02d}'.format(second) for second in (0, 15, 30, 45)] == \
+            [set['history_ts'] for set in result['statistics']]
+        assert {'history_ts': '2017-11-01 11:00:00', 'READINGS': 2400, 'SENT_1': 2402} == result['statistics'][0]
+        # One query per key, on the primary key
+        history = [payload for tbl_name, payload in storage.queries if tbl_name == 'statistics_history']
+        assert [[('key', '='), ('history_ts', '>='), ('history_ts', '<')]] * 2 == \
+            [conditions(payload['where']) for payload in history]
+
+    def test_interval(self, storage):
+        result = _history('?interval=3600&keys=READINGS')
+        assert 3600 == result['interval']
+        assert [{'history_ts': '2017-11-01 10:00:00', 'READINGS': sum(run * 10 for run in range(240))},
+                {'history_ts': '2017-11-01 11:00:00', 'READINGS': sum(run * 10 for run in range(240, 480))}] == \
+            result['statistics']
+        # The interval of the collector is not read
+        assert ['statistics_history'] == [tbl_name for tbl_name, _ in storage.queries]
+
+    def test_interval_limit(self, storage):
+        result = _history('?interval=1800&limit=2')
+        assert ['2017-11-01 11:00:00', '2017-11-01 11:30:00'] == [set['history_ts'] for set in result['statistics']]
+        assert ('history_ts', 'newer') in conditions(storage.queries[0][1]['where'])
+        assert 3600 == storage.queries[0][1]['where']['value']
+
+    @pytest.mark.parametrize("to", ['2017-11-01 11:00:00', '2017-11-01 10:45:00', '2017-11-01 10:30:00.5'])
+    def test_interval_limit_to(self, storage, to):
+        result = _history('?interval=1800&limit=2&keys=READINGS&to=' + to)
+        # The intervals before to, the range does not depend on the current time
+        assert ['2017-11-01 10:00:00', '2017-11-01 10:30:00'] == [set['history_ts'] for set in result['statistics']]
+        assert [('key', '='), ('history_ts', '<'), ('history_ts', '>=')] == conditions(storage.queries[0][1]['where'])
+        assert '2017-11-01 10:00:00' == storage.queries[0][1]['where']['and']['and']['value']
+
+    def test_interval_limit_to_time_zone(self):
+        assert '2017-11-01 10:00:00+05:30' == statistics._intervals_start('2017-11-01 11:00:00+05:30', 3600, 1)
+        assert '2017-10-31 23:00:00Z' == statistics._intervals_start('2017-11-01Z', 3600, 1)
+        assert '2017-11-01 10:00:00' == statistics._intervals_start('2017-11-01T10:00:01', 60, 1)
+
+    def test_limit_zero(self, storage):
+        assert {'interval': 15, 'statistics': []} == _history('?limit=0')
+
+    @pytest.mark.parametrize("query", ['?limit=x', '?interval=0', '?interval=-5', "?from=2017-11-01' OR '1'='1",
+                                       "?keys=READINGS,x' OR '1'='1"])
+    def test_bad_request(self, storage, query):
+        with pytest.raises(web.HTTPBadRequest):
+            _history(query)
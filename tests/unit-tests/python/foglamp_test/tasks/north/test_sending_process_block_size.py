@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+
+# FOGLAMP_BEGIN
+# See: http://foglamp.readthedocs.io/
+# FOGLAMP_END
+
+import json
+
+import pytest
+
+from foglamp.tasks.north.sending_process import AdaptiveBlockSize, SendingProcess
+
+__copyright__ = "Copyright (c) 2017 OSIsoft, LLC"
+__license__ = "Apache 2.0"
+__version__ = "${VERSION}"
+
+
+def _rows(num_rows, value=1.5):
+    return [{"id": i, "asset_code": "fogbench/temperature", "reading": {"x": value},
+             "user_ts": "2017-09-21 15:00:09.025655+00"} for i in range(num_rows)]
+
+
+class _Storage(object):
+    """The streams table, with a single stream"""
+
+    def __init__(self, object_block):
+        self.object_block = object_block
+        self.updates = []
+
+    def query_tbl(self, tbl_name, where):
+        assert ('streams', 'id=1') == (tbl_name, where)
+        return {'rows': [{'id': 1, 'last_object': 0, 'object_block': self.object_block}]}
+
+    def update_tbl(self, tbl_name, payload):
+        self.updates.append(json.loads(payload)['values'])
+
+
+def _sending_process(object_block, adaptive=True):
+    sending_process = SendingProcess()
+    sending_process._storage = _Storage(object_block)
+    sending_process._config['blockSizeAdaptive'] = adaptive
+    return sending_process
+
+
+@pytest.allure.feature("unit")
+@pytest.allure.story("sending_process")
+class TestAdaptiveBlockSize:
+
+    def test_initial_value_clamped(self):
+        block_size = AdaptiveBlockSize(10, 100, 1000, 4194304, 10)
+        assert 100 == block_size.rows
+        block_size = AdaptiveBlockSize(5000, 100, 1000, 4194304, 10)
+        assert 1000 == block_size.rows
+
+    def test_disabled_keeps_fixed_value(self):
+        block_size = AdaptiveBlockSize(5000, 100, 1000, 10, 10, enabled=False)
+        data, _ = block_size.fit(_rows(5000))
+        block_size.success(True, 1000, 0.1, 0.1)
+        block_size.failure()
+        assert 5000 == len(data)
+        assert 5000 == block_size.rows
+
+    def test_grows_on_full_blocks(self):
+        block_size = AdaptiveBlockSize(1000, 100, 50000, 4194304, 10)
+        data, block_bytes = block_size.fit(_rows(1000))
+        block_size.success(True, block_bytes, 0.1, 0.1)
+        assert 1250 == block_size.rows
+
+    def test_partial_block_does_not_grow(self):
+        block_size = AdaptiveBlockSize(1000, 100, 50000, 4194304, 10)
+        data, block_bytes = block_size.fit(_rows(10))
+        block_size.success(False, block_bytes, 0.1, 0.1)
+        assert 1000 == block_size.rows
+
+    def test_shrinks_on_lower_throughput(self):
+        block_size = AdaptiveBlockSize(1000, 100, 50000, 4194304, 10)
+        block_size.success(True, 100000, 0.5, 0.5)
+        block_size.success(True, 100000, 1.0, 1.0)
+        assert 1125 == block_size.rows
+
+    def test_shrinks_on_slow_send(self):
+        block_size = AdaptiveBlockSize(1000, 100, 50000, 4194304, 10)
+        block_size.success(True, 100000, 1, 19)
+        assert 500 == block_size.rows
+
+    def test_halves_on_error(self):
+        block_size = AdaptiveBlockSize(1000, 100, 50000, 4194304, 10)
+        block_size.failure()
+        assert 500 == block_size.rows
+        for _ in range(10):
+            block_size.failure()
+        assert 100 == block_size.rows
+
+    def test_fit_trims_to_max_bytes(self):
+        block_size = AdaptiveBlockSize(1000, 1, 50000, 10000, 10)
+        data, block_bytes = block_size.fit(_rows(1000, value="x" * 1000))
+        assert len(data) < 1000
+        assert block_bytes <= 10000
+        assert len(data) == block_size.rows
+
+
+@pytest.allure.feature("unit")
+@pytest.allure.story("sending_process")
+class TestBlockSizeOfTheStream:
+
+    def test_starts_from_previous_execution(self):
+        sending_process = _sending_process({'blockSize': 12000, 'blockSizeConfigured': 5000})
+        block_size = sending_process._create_block_size(sending_process._block_size_read(1))
+        assert 12000 == block_size.rows
+
+    @pytest.mark.parametrize("object_block, adaptive", [
+        ({}, True),
+        # blockSize was changed since the previous execution
+        ({'blockSize': 12000, 'blockSizeConfigured': 1000}, True),
+        ({'blockSize': 12000, 'blockSizeConfigured': 5000}, False),
+    ])
+    def test_starts_from_configuration(self, object_block, adaptive):
+        sending_process = _sending_process(object_block, adaptive)
+        block_size = sending_process._create_block_size(sending_process._block_size_read(1))
+        assert 5000 == block_size.rows
+
+    def test_saved_with_position(self):
+        sending_process = _sending_process({'blockSize': 12000, 'blockSizeConfigured': 5000, 'other': 1})
+        sending_process._block_size = sending_process._create_block_size(sending_process._block_size_read(1))
+        sending_process._block_size.failure()
+        sending_process._last_object_id_update(10, 1)
+        assert [{'last_object': 10, 'ts': 'now()',
+                 'object_block': {'blockSize': 6000, 'blockSizeConfigured': 5000, 'other': 1}}] == \
+            sending_process._storage.updates
+
+    def test_not_saved_if_disabled(self):
+        sending_process = _sending_process({}, adaptive=False)
+        sending_process._last_object_id_update(10, 1)
+        assert [{'last_object': 10, 'ts': 'now()'}] == sending_process._storage.updates
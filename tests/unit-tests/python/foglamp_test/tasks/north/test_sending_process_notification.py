@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+
+# FOGLAMP_BEGIN
+# See: http://foglamp.readthedocs.io/
+# FOGLAMP_END
+
+""" Tests of the wait for the notification of new readings of the sending process, the management
+API of the core is simulated by a connection that answers with the status selected by the test.
+
+pytest -s tests/unit-tests/python/foglamp_test/tasks/north/test_sending_process_notification.py
+"""
+
+import json
+
+import pytest
+
+from foglamp.tasks.north import sending_process as sending_process_module
+from foglamp.tasks.north.sending_process import SendingProcess
+
+__copyright__ = "Copyright (c) 2017 OSIsoft, LLC"
+__license__ = "Apache 2.0"
+__version__ = "${VERSION}"
+
+
+class _Connection(object):
+    """Connection to the management API of the core, the notification of new readings fails if status is not 200"""
+
+    status = 503
+
+    def __init__(self, host, timeout):
+        self.url = None
+
+    def request(self, method, url):
+        self.url = url
+
+    def getresponse(self):
+        return self
+
+    @property
+    def reason(self):
+        return 'Unavailable'
+
+    def read(self):
+        return json.dumps({'generation': 7, 'readings': 100}).encode()
+
+    def close(self):
+        pass
+
+
+@pytest.allure.feature("unit")
+@pytest.allure.story("sending_process")
+class TestReadingsNotificationBackoff:
+
+    @pytest.fixture
+    def sending_process(self, monkeypatch):
+        monkeypatch.setattr(sending_process_module.http.client, 'HTTPConnection', _Connection)
+        monkeypatch.setattr(_Connection, 'status', 503)
+        sending_process = SendingProcess()
+        sending_process._mgt_address, sending_process._mgt_port = 'localhost', 8082
+        return sending_process
+
+    def test_backoff_capped(self, sending_process):
+        backoffs = []
+        for _ in range(10):
+            with pytest.raises(RuntimeError):
+                sending_process._wait_readings_notification(0)
+            backoffs.append(sending_process._readings_notification_backoff)
+        # Doubled from sleepInterval at every failure, up to the maximum
+        assert [5, 10, 20, 40, 80, 160, 300, 300, 300, 300] == backoffs
+        assert SendingProcess._MAX_NOTIFICATION_BACKOFF == backoffs[-1]
+        # The storage is polled until the retry
+        assert not sending_process._readings_notification_available()
+
+    def test_backoff_reset(self, sending_process):
+        with pytest.raises(RuntimeError):
+            sending_process._wait_readings_notification(0)
+        _Connection.status = 200
+        sending_process._wait_readings_notification(0)
+        assert (0, 7) == (sending_process._readings_notification_backoff, sending_process._readings_generation)
@@ -46,6 +46,7 @@ class TestPurge:
         yield
         # Delete all test data from readings and logs
         cls._storage_client.delete_from_tbl("readings", {})
+        cls._storage_client.delete_from_tbl("asset_summary", {})
         cls._storage_client.delete_from_tbl("log", {})
 
         # Update statistics
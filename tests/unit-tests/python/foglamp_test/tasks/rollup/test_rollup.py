@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+
+# FOGLAMP_BEGIN
+# See: http://foglamp.readthedocs.io/
+# FOGLAMP_END
+
+""" Tests of the rollup of the readings per minute and per hour, the storage server is simulated
+by the fake storage keeping the tables in lists of rows.
+
+pytest -s tests/unit-tests/python/foglamp_test/tasks/rollup/test_rollup.py
+"""
+
+import json
+
+import pytest
+
+from foglamp.tasks.rollup import rollup
+from foglamp.tasks.rollup.rollup import Rollup
+from foglamp_test.fake_storage import Storage
+
+__copyright__ = "Copyright (c) 2017 OSIsoft, LLC"
+__license__ = "Apache 2.0"
+__version__ = "${VERSION}"
+
+_CONFIG = {'blockSize': {'value': '3'}, 'minuteRetention': {'value': '168'}, 'hourRetention': {'value': '8760'}}
+
+
+class _Storage(Storage):
+    """Readings and rollup tables, the timestamps of the rollup tables are all UTC ones, they compare as strings"""
+
+    def __init__(self):
+        super().__init__(rollups=[{'name': 'readings', 'last_object': 0}], readings_minute=[], readings_hour=[])
+        self.readings = []
+        self.deleted = []
+
+    @property
+    def last_object(self):
+        return self.tables['rollups'][0]['last_object']
+
+    def append(self, asset_code, user_ts, reading):
+        self.readings.append({'id': len(self.readings) + 1, 'asset_code': asset_code, 'read_key': None,
+                              'reading': reading, 'user_ts': user_ts})
+
+    def fetch(self, reading_id, count, iso_timestamps=False):
+        assert iso_timestamps
+        rows = [reading for reading in self.readings if reading['id'] >= reading_id][:count]
+        return {'count': len(rows), 'rows': rows}
+
+    def query(self, tbl_name, payload):
+        rows = super().query(tbl_name, payload)
+        # The double precision columns are returned as strings
+        return [dict((column, str(value) if column in ('min', 'max', 'total') else value)
+                     for column, value in row.items()) for row in rows]
+
+    def update_tbl(self, tbl_name, data):
+        if tbl_name != 'rollups':
+            assert 1 == len(self.select(tbl_name, json.loads(data)['where']))
+        return super().update_tbl(tbl_name, data)
+
+    def insert_into_tbl(self, tbl_name, data):
+        for row in json.loads(data):
+            assert not self.select(tbl_name, {'column': 'asset_code', 'value': row['asset_code'], 'and': {
+                'column': 'datapoint', 'value': row['datapoint'], 'and': {
+                    'column': 'bucket_ts', 'value': row['bucket_ts']}}})
+        return super().insert_into_tbl(tbl_name, data)
+
+    def delete_from_tbl(self, tbl_name, condition=None):
+        self.deleted.append((tbl_name, json.loads(condition)))
+        return {'response': 'deleted'}
+
+
+@pytest.fixture
+def storage():
+    return _Storage()
+
+
+@pytest.fixture
+def task(storage):
+    # The connection to the core is not needed
+    task = Rollup.__new__(Rollup)
+    task._storage = storage
+    task._readings_storage = storage
+    return task
+
+
+def _rows(storage, tbl_name):
+    return sorted((row['asset_code'], row['datapoint'], row['bucket_ts'], row['min'], row['max'], row['total'],
+                   row['readings']) for row in storage.tables[tbl_name])
+
+
+@pytest.allure.feature("unit")
+@pytest.allure.story("rollup")
+class TestRollup:
+
+    def test_aggregate(self):
+        readings = [{'id': 1, 'asset_code': 'TI', 'user_ts': '2017-11-01T10:00:59.900000Z',
+                     'reading': {'x': 1, 'y': 'a'}},
+                    {'id': 2, 'asset_code': 'TI', 'user_ts': '2017-11-01T10:00:01.000000Z',
+                     'reading': {'x': 3.5, 'z': True}},
+                    {'id': 3, 'asset_code': 'TI', 'user_ts': '2017-11-01T10:01:00.000000Z', 'reading': {'x': -2}},
+                    {'id': 4, 'asset_code': 'HUMIDITY', 'user_ts': '2017-11-01T10:00:30.000000Z', 'reading': {'h': 30}},
+                    {'id': 5, 'asset_code': 'TEXT', 'user_ts': '2017-11-01T10:00:30.000000Z', 'reading': {'t': 'on'}}]
+        assert {('TI', '2017-11-01 10:00:00+00'): {'x': (1, 3.5, 4.5, 2, 2)},
+                ('TI', '2017-11-01 10:01:00+00'): {'x': (-2, -2, -2, 1, 3)},
+                ('HUMIDITY', '2017-11-01 10:00:00+00'): {'h': (30, 30, 30, 1, 4)}} == rollup.aggregate(readings, 60)
+        assert {('TI', '2017-11-01 10:00:00+00'): {'x': (-2, 3.5, 2.5, 3, 3)},
+                ('HUMIDITY', '2017-11-01 10:00:00+00'): {'h': (30, 30, 30, 1, 4)}} == rollup.aggregate(readings, 3600)
+
+        # The readings already merged into a stored bucket are skipped
+        merged = {('TI', '2017-11-01 10:00:00+00', 'x'): rollup._Bucket(1, 1, 1, 1, 2)}
+        assert {('TI', '2017-11-01 10:01:00+00'): {'x': (-2, -2, -2, 1, 3)},
+                ('HUMIDITY', '2017-11-01 10:00:00+00'): {'h': (30, 30, 30, 1, 4)}} == \
+            rollup.aggregate(readings, 60, merged)
+
+    @pytest.mark.parametrize("timestamp, epoch", [('2017-11-01 10:00:00+00', 1509530400),
+                                                  ('2017-11-01 11:30:00+01:30', 1509530400),
+                                                  ('2017-11-01 05:00:00-05', 1509530400),
+                                                  ('2017-11-01 10:00:00.250000+00', 1509530400)])
+    def test_epoch(self, timestamp, epoch):
+        assert epoch == rollup._epoch(timestamp)
+
+    def test_incremental(self, storage, task):
+        for second, value in [(0, 1), (10, 5), (20, 3), (70, 2), (3610, 7)]:
+            storage.append('TI', '2017-11-01T10:{:02d}:{:02d}.000000Z'.format(second // 60 % 60, second % 60)
+                           if second < 3600 else '2017-11-01T11:00:10.000000Z', {'x': value})
+        assert 5 == task.rollup_readings(_CONFIG)
+        assert 5 == storage.last_object
+
+        # Merged with the buckets already rolled up
+        storage.append('TI', '2017-11-01T10:00:30.000000Z', {'x': 9})
+        storage.append('TI', '2017-11-01T10:02:00.000000Z', {'x': 0})
+        assert 2 == task.rollup_readings(_CONFIG)
+        assert 7 == storage.last_object
+        assert 0 == task.rollup_readings(_CONFIG)
+
+        assert [('TI', 'x', '2017-11-01 10:00:00+00', 1, 9, 18, 4),
+                ('TI', 'x', '2017-11-01 10:01:00+00', 2, 2, 2, 1),
+                ('TI', 'x', '2017-11-01 10:02:00+00', 0, 0, 0, 1),
+                ('TI', 'x', '2017-11-01 11:00:00+00', 7, 7, 7, 1)] == _rows(storage, 'readings_minute')
+        assert [('TI', 'x', '2017-11-01 10:00:00+00', 0, 9, 20, 6),
+                ('TI', 'x', '2017-11-01 11:00:00+00', 7, 7, 7, 1)] == _rows(storage, 'readings_hour')
+
+    def test_interrupted_before_saving_the_position(self, storage, task, monkeypatch):
+        for second, value in [(0, 1), (10, 5), (20, 3), (70, 2)]:
+            storage.append('TI', '2017-11-01T10:{:02d}:{:02d}.000000Z'.format(second // 60, second % 60), {'x': value})
+        assert 4 == task.rollup_readings(_CONFIG)
+
+        storage.append('TI', '2017-11-01T10:00:30.000000Z', {'x': 9})
+        storage.append('TI', '2017-11-01T10:01:30.000000Z', {'x': 4})
+        update_position = task._update_position
+
+        def fail(last_object):
+            raise RuntimeError('storage unavailable')
+
+        # The block is merged into both the tables, the position is not saved
+        monkeypatch.setattr(task, '_update_position', fail)
+        with pytest.raises(RuntimeError):
+            task.rollup_readings(_CONFIG)
+        assert 4 == storage.last_object
+
+        # The block is read again, it is not merged twice
+        monkeypatch.setattr(task, '_update_position', update_position)
+        storage.append('TI', '2017-11-01T10:00:40.000000Z', {'x': 0})
+        assert 3 == task.rollup_readings(_CONFIG)
+        assert 7 == storage.last_object
+        assert [('TI', 'x', '2017-11-01 10:00:00+00', 0, 9, 18, 5),
+                ('TI', 'x', '2017-11-01 10:01:00+00', 2, 4, 6, 2)] == _rows(storage, 'readings_minute')
+        assert [('TI', 'x', '2017-11-01 10:00:00+00', 0, 9, 24, 7)] == _rows(storage, 'readings_hour')
+
+    def test_one_query_per_block(self, storage, task):
+        for minute in range(6):
+            storage.append('TI', '2017-11-01T10:{:02d}:00.000000Z'.format(minute), {'x': minute, 'y': minute})
+        assert 6 == task.rollup_readings(_CONFIG)
+        # The position, then two blocks of three readings
+        assert ['rollups'] + ['readings_minute', 'readings_hour'] * 2 == [tbl_name for tbl_name, _ in storage.queries]
+
+    def test_purge_rollups(self, storage, task):
+        task.purge_rollups(_CONFIG)
+        assert [('readings_minute', {'where': {'column': 'bucket_ts', 'condition': 'older', 'value': 604800}}),
+                ('readings_hour', {'where': {'column': 'bucket_ts', 'condition': 'older', 'value': 31536000}})] == \
+            storage.deleted